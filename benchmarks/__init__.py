@@ -0,0 +1,25 @@
+"""
+Benchmarks for generator startup and the `create_jpg` pipeline.
+
+The suite runs entirely offline: local font families use the TrueType fonts bundled
+with ReportLab, and Google Fonts is stood in for by respx, serving those same fonts.
+Every group of stages runs in a fresh process, so that cold startups are actually
+cold and peak memory is measured in isolation.
+
+```sh
+$ python -m benchmarks --save benchmarks/baseline.json
+$ python -m benchmarks --compare benchmarks/baseline.json
+```
+
+Poppler is benchmarked both piping documents to it in memory and round tripping them
+through a temporary directory, which `--tmpdir` places on a tmpfs or a real disk:
+
+```sh
+$ python -m benchmarks --backend poppler --backend poppler-in-memory --tmpdir /dev/shm
+$ python -m benchmarks --backend poppler --tmpdir /var/tmp
+```
+
+A comparison run exits unsuccessfully if any stage is slower, or peaks at more memory,
+than its baseline by more than the given tolerances. Baselines are only comparable on
+the machine they were recorded on.
+"""
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import TYPE_CHECKING
+
+from .suite import BACKENDS, compare, load, run, save
+
+if TYPE_CHECKING:
+    from typing import Dict, List, Optional
+
+    from .suite import Measurement, Regression
+
+
+def _format(metric: str, value: float) -> str:
+    if metric == "seconds":
+        return f"{value * 1000:.1f}ms"
+    return f"{value / 1024 / 1024:.1f}MiB"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(prog="benchmarks")
+    parser.add_argument(
+        "--quick", action="store_true", help="skip prose longer than a page"
+    )
+    parser.add_argument(
+        "--backend",
+        action="append",
+        choices=BACKENDS,
+        help="only benchmark the given rasterization backend (repeatable)",
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=3,
+        help="the number of times short renderings are repeated (default: 3)",
+    )
+    parser.add_argument(
+        "--tmpdir",
+        type=Path,
+        default=None,
+        help="the directory poppler round trips documents through, such as a tmpfs"
+        " or a real disk (default: the system's temporary directory)",
+    )
+    parser.add_argument(
+        "--cjk-font",
+        type=Path,
+        default=None,
+        help="a CJK TrueType font, such as IPAexGothic or Noto Sans CJK, to also"
+        " measure startup with cold and cached parsed fonts using",
+    )
+    parser.add_argument(
+        "--save", type=Path, default=None, help="save the results as a baseline"
+    )
+    parser.add_argument(
+        "--compare",
+        type=Path,
+        default=None,
+        help="fail if any stage regressed relative to the given baseline",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="the relative slowdown tolerated by --compare (default: 0.25)",
+    )
+    parser.add_argument(
+        "--rss-tolerance",
+        type=float,
+        default=0.1,
+        help="the relative peak memory increase tolerated by --compare (default: 0.1)",
+    )
+
+    args: argparse.Namespace = parser.parse_args(argv)
+    baseline: Dict[str, Measurement] = load(args.compare) if args.compare else {}
+
+    with TemporaryDirectory() as workdir:
+        results: Dict[str, Measurement] = run(
+            Path(workdir),
+            quick=args.quick,
+            backends=args.backend,
+            repeats=args.repeats,
+            tmpdir=args.tmpdir,
+            cjk_font=args.cjk_font,
+            log=lambda message: print(message, file=sys.stderr),
+        )
+
+    width: int = max(len(name) for name in results)
+    for name, measurement in sorted(results.items()):
+        line: str = (
+            f"{name:<{width}}  {_format('seconds', measurement.seconds):>10}"
+            f"  {_format('peak_rss', measurement.peak_rss):>10}"
+        )
+        previous: Optional[Measurement] = baseline.get(name)
+        if previous:
+            line += f"  ({measurement.seconds / previous.seconds - 1:+.0%})"
+        print(line)
+
+    if args.save:
+        save(results, args.save)
+        print(f"saved baseline to {args.save}", file=sys.stderr)
+
+    if args.compare:
+        regressions: List[Regression] = compare(
+            results, baseline, args.tolerance, args.rss_tolerance
+        )
+        for regression in regressions:
+            print(
+                f"regressed: {regression.stage} {regression.metric}"
+                f" {_format(regression.metric, regression.baseline)}"
+                f" -> {_format(regression.metric, regression.current)}",
+                file=sys.stderr,
+            )
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,454 @@
+from __future__ import annotations
+
+import gc
+import json
+import os
+import shutil
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import get_context
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+from urllib.parse import quote_plus
+
+if TYPE_CHECKING:
+    from typing import Any, Callable, Dict, List, Optional, Tuple
+
+    from styled_prose import StyledProseGenerator
+
+# the fonts bundled with ReportLab, which local and "remote" families both use
+VERA: Tuple[str, ...] = ("Vera.ttf", "VeraBd.ttf", "VeraIt.ttf", "VeraBI.ttf")
+REMOTE_FAMILY: str = "Bench Sans"
+REMOTE_URL: str = "https://fonts.bench.invalid/{}"
+CJK_FAMILY: str = "Bench CJK"
+
+STYLESHEET: Dict[str, Any] = {
+    "fonts": [
+        {
+            "font_name": "Vera",
+            "regular": VERA[0],
+            "bold": VERA[1],
+            "italicized": VERA[2],
+            "bold_italicized": VERA[3],
+        },
+        {"font_name": REMOTE_FAMILY, "from_google_fonts": True},
+    ],
+    "styles": [
+        {"name": "default", "font_name": "Vera", "font_size": 12},
+        {
+            "name": "display",
+            "font_name": "Vera",
+            "font_size": 28,
+            "line_height": 34,
+            "alignment": "justify",
+            "font_color": "#222222",
+        },
+        {
+            "name": "remote",
+            "font_name": REMOTE_FAMILY,
+            "font_size": 10,
+            "font_color": "#aa0000",
+        },
+    ],
+}
+
+# the lengths of prose measured in words, and those measured in LETTER pages of the
+# style they're rendered in
+WORD_LENGTHS: Dict[str, int] = {"line": 12, "paragraph": 120}
+PAGE_LENGTHS: Dict[str, int] = {"page": 1, "10-pages": 10, "50-pages": 50}
+LENGTHS: Tuple[str, ...] = (*WORD_LENGTHS, *PAGE_LENGTHS)
+# prose longer than this many pages takes long enough to lay out, and several GiB to
+# rotate, so it's only rendered in the default style and without an angle
+EXHAUSTIVE_PAGES: int = 10
+# roughly how many words of prose fit on a LETTER page in each style
+WORDS_PER_PAGE: Dict[str, int] = {"default": 820, "display": 160, "remote": 1300}
+# lengths only rendered when not running a quick benchmark
+LONG_LENGTHS: Tuple[str, ...] = ("10-pages", "50-pages")
+VARIANTS: Dict[str, Dict[str, Any]] = {
+    "plain": {},
+    "angle": {"angle": -2.5},
+    "thumbnail": {"thumbnail": (210, 210), "seed": 0},
+    "angle-thumbnail": {"angle": -2.5, "thumbnail": (210, 210), "seed": 0},
+}
+# poppler either round trips documents through a temporary directory, or has them
+# piped to it in memory
+BACKENDS: Tuple[str, ...] = ("poppler", "poppler-in-memory", "pdfium", "pillow")
+
+WORDS: Tuple[str, ...] = tuple(
+    "the quick brown fox jumps over a lazy dog while <i>sphinxes</i> of black quartz"
+    " judge my <b>vow</b> and five boxing wizards jump quickly".split()
+)
+
+
+class Measurement(NamedTuple):
+    """The wall time and peak memory of a single benchmark stage."""
+
+    seconds: float
+    peak_rss: int
+
+
+def prose(words: int) -> str:
+    """
+    Deterministic prose of the given number of words, in paragraphs of 120. They're
+    separated by single line breaks, since ReportLab can fail to split a paragraph
+    across pages at an empty line.
+    """
+    paragraphs: List[str] = []
+    for start in range(0, words, 120):
+        count: int = min(120, words - start)
+        paragraphs.append(
+            " ".join(WORDS[(start + i) % len(WORDS)] for i in range(count))
+        )
+
+    return "\n".join(paragraphs)
+
+
+def words(length: str, style: str) -> int:
+    """The number of words of prose of the given length in the given style."""
+    if length in WORD_LENGTHS:
+        return WORD_LENGTHS[length]
+
+    return PAGE_LENGTHS[length] * WORDS_PER_PAGE[style]
+
+
+def _reset_peak_rss() -> None:
+    """Reset the process' peak memory usage, where the platform allows it."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss() -> int:
+    """The process' peak memory usage since it was last reset, in bytes."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    # without procfs, this is the peak over the entire lifetime of the process
+    import resource
+
+    peak: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _time(
+    results: Dict[str, Measurement],
+    name: str,
+    stage: Callable[[], Any],
+    repeats: int = 1,
+) -> None:
+    """
+    Run and measure a stage, recording its median wall time across `repeats` runs and
+    the highest memory usage seen during any of them.
+    """
+    times: List[float] = []
+    peak: int = 0
+    for _ in range(repeats):
+        gc.collect()
+        _reset_peak_rss()
+        start: float = time.perf_counter()
+        output: Any = stage()
+        times.append(time.perf_counter() - start)
+        peak = max(peak, _peak_rss())
+        # release the output before the next repetition measures its own peak
+        del output
+
+    results[name] = Measurement(statistics.median(times), peak)
+
+
+def _mock_google_fonts(fonts: Path) -> Any:
+    """Stand in for Google Fonts, serving the bundled fonts as a remote family."""
+    import respx
+
+    router: Any = respx.mock(assert_all_called=False)
+    styles: Dict[str, str] = dict(
+        zip(("Regular", "Bold", "Italic", "BoldItalic"), VERA)
+    )
+    manifest: Dict[str, Any] = {
+        "manifest": {
+            "files": [{"filename": "LICENSE.txt", "contents": "Bitstream Vera"}],
+            "fileRefs": [
+                {
+                    "filename": f"static/BenchSans-{style}.ttf",
+                    "url": REMOTE_URL.format(file),
+                }
+                for style, file in styles.items()
+            ],
+        }
+    }
+
+    from styled_prose.fonts import GOOGLE_FONTS_URL
+
+    router.get(GOOGLE_FONTS_URL.format(quote_plus(REMOTE_FAMILY))).respond(
+        content=b")]}'\n" + json.dumps(manifest).encode()
+    )
+    for file in styles.values():
+        router.get(REMOTE_URL.format(file)).respond(content=(fonts / file).read_bytes())
+
+    return router
+
+
+def _generator(
+    fonts: Path,
+    font_cache: Path,
+    stylesheet: Optional[Dict[str, Any]] = None,
+    **options: Any,
+) -> StyledProseGenerator:
+    """Create a generator using the benchmark stylesheet, unless another is given."""
+    from styled_prose import StyledProseGenerator
+
+    return StyledProseGenerator.from_dict(
+        stylesheet or STYLESHEET, root=fonts, font_cache=font_cache, **options
+    )
+
+
+def _cjk_stylesheet(font: str) -> Dict[str, Any]:
+    """A stylesheet whose every style uses the given CJK font file."""
+    return {
+        "fonts": [{"font_name": CJK_FAMILY, "regular": font}],
+        "styles": [
+            {"name": "default", "font_name": CJK_FAMILY, "font_size": 12},
+            {
+                "name": "display",
+                "font_name": CJK_FAMILY,
+                "font_size": 28,
+                "line_height": 34,
+            },
+        ],
+    }
+
+
+def run_startup(
+    fonts: Path, font_cache: Path, cached: bool, cjk_font: Optional[str] = None
+) -> Dict[str, Measurement]:
+    """
+    Measure importing the library and creating generators, either with an empty font
+    cache (so every Google Fonts family is downloaded and every font parsed) or with
+    one populated by a previous process. If the name of a `cjk_font` among `fonts` is
+    given, creating a generator whose stylesheet only uses it is measured too.
+    """
+    results: Dict[str, Measurement] = {}
+    prefix: str = "startup/cached-fonts" if cached else "startup/cold"
+
+    _time(results, f"{prefix}/import", lambda: __import__("styled_prose.creation"))
+    with _mock_google_fonts(fonts):
+        _time(results, f"{prefix}/generator", lambda: _generator(fonts, font_cache))
+        _time(
+            results,
+            f"{prefix}/generator-warm",
+            lambda: _generator(fonts, font_cache),
+            repeats=5,
+        )
+
+    if cjk_font:
+        # registrations are shared within a process, so only the first one is measured
+        stylesheet: Dict[str, Any] = _cjk_stylesheet(cjk_font)
+        _time(
+            results,
+            f"{prefix}/cjk-generator",
+            lambda: _generator(fonts, font_cache, stylesheet),
+        )
+
+    return results
+
+
+def run_renders(
+    fonts: Path,
+    font_cache: Path,
+    backend: str,
+    lengths: List[str],
+    repeats: int,
+    tmpdir: Optional[Path] = None,
+) -> Dict[str, Measurement]:
+    """
+    Measure `create_jpg` for every style, length and variant using a backend. Poppler's
+    temporary directories are created in `tmpdir`, if provided, so that a tmpfs can be
+    compared with a real disk.
+    """
+    if tmpdir:
+        import tempfile
+
+        tempfile.tempdir = str(tmpdir)
+
+    options: Dict[str, Any] = {"offline": True}
+    if backend == "poppler-in-memory":
+        options["in_memory"] = True
+    elif backend == "pdfium":
+        from styled_prose import PdfiumRasterizer
+
+        options["rasterizer"] = PdfiumRasterizer()
+    elif backend == "pillow":
+        options["engine"] = "pillow"
+
+    generator: StyledProseGenerator = _generator(fonts, font_cache, **options)
+    # render once beforehand, so that deferred imports aren't attributed to a stage
+    generator.create_jpg(prose(1))
+
+    results: Dict[str, Measurement] = {}
+    for style in (s["name"] for s in STYLESHEET["styles"]):
+        for length in lengths:
+            text: str = prose(words(length, style))
+            # long prose is slow enough that repeating it only adds to the runtime
+            times: int = 1 if length in LONG_LENGTHS else repeats
+            for variant, arguments in VARIANTS.items():
+                if PAGE_LENGTHS.get(length, 0) > EXHAUSTIVE_PAGES and (
+                    style != "default" or "angle" in arguments
+                ):
+                    continue
+
+                _time(
+                    results,
+                    f"create_jpg/{backend}/{style}/{length}/{variant}",
+                    partial(generator.create_jpg, text, style, **arguments),
+                    times,
+                )
+
+    return results
+
+
+def available_backends() -> List[str]:
+    """The rasterization backends that can run in this environment."""
+    backends: List[str] = []
+    if shutil.which("pdftocairo"):
+        backends.extend(("poppler", "poppler-in-memory"))
+    try:
+        import pypdfium2  # noqa: F401
+
+        backends.append("pdfium")
+    except ImportError:
+        pass
+
+    backends.append("pillow")
+    return backends
+
+
+def run(
+    workdir: Path,
+    quick: bool = False,
+    backends: Optional[List[str]] = None,
+    repeats: int = 3,
+    log: Callable[[str], None] = print,
+    tmpdir: Optional[Path] = None,
+    cjk_font: Optional[Path] = None,
+) -> Dict[str, Measurement]:
+    """
+    Run the entire suite, each group of stages in a fresh process, using `workdir` for
+    the bundled fonts and the font cache, and `tmpdir` (by default, the system's) for
+    poppler's temporary directories. Startup is also measured using the given
+    `cjk_font`, if any, since large CJK fonts take the longest to parse.
+    """
+    import reportlab
+
+    fonts: Path = workdir / "fonts"
+    font_cache: Path = workdir / "font_cache"
+    fonts.mkdir(parents=True, exist_ok=True)
+    for file in VERA:
+        shutil.copy(Path(reportlab.__file__).parent / "fonts" / file, fonts)
+    if cjk_font:
+        shutil.copy(cjk_font, fonts)
+    else:
+        log("skipping CJK startup, since no CJK font was given")
+
+    lengths: List[str] = [
+        length for length in LENGTHS if not (quick and length in LONG_LENGTHS)
+    ]
+    cjk: Optional[str] = cjk_font.name if cjk_font else None
+    groups: List[Tuple[str, Callable[..., Dict[str, Measurement]], Tuple[Any, ...]]] = [
+        ("startup (cold)", run_startup, (fonts, font_cache, False, cjk)),
+        ("startup (cached fonts)", run_startup, (fonts, font_cache, True, cjk)),
+    ]
+    available: List[str] = available_backends()
+    for backend in backends or BACKENDS:
+        if backend not in available:
+            log(f"skipping create_jpg ({backend}), which isn't available")
+            continue
+
+        groups.append(
+            (
+                f"create_jpg ({backend})",
+                run_renders,
+                (fonts, font_cache, backend, lengths, repeats, tmpdir),
+            )
+        )
+
+    results: Dict[str, Measurement] = {}
+    for label, function, args in groups:
+        log(f"running {label}...")
+        # spawned rather than forked, so that nothing is inherited from this process
+        with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as pool:
+            results.update(pool.submit(function, *args).result())
+
+    return results
+
+
+def save(results: Dict[str, Measurement], path: Path) -> None:
+    """Save the results of a run as a baseline."""
+    baseline: Dict[str, Any] = {
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "cpus": os.cpu_count(),
+        "stages": {name: m._asdict() for name, m in sorted(results.items())},
+    }
+    path.write_text(json.dumps(baseline, indent=2) + "\n")
+
+
+def load(path: Path) -> Dict[str, Measurement]:
+    """Load a baseline saved by `save`."""
+    stages: Dict[str, Dict[str, Any]] = json.loads(path.read_text())["stages"]
+    return {name: Measurement(**stage) for name, stage in stages.items()}
+
+
+class Regression(NamedTuple):
+    """A stage that performed worse than its baseline."""
+
+    stage: str
+    metric: str
+    baseline: float
+    current: float
+
+
+def compare(
+    results: Dict[str, Measurement],
+    baseline: Dict[str, Measurement],
+    tolerance: float = 0.25,
+    rss_tolerance: float = 0.1,
+    min_seconds: float = 0.005,
+    min_rss: int = 8 * 1024 * 1024,
+) -> List[Regression]:
+    """
+    Find every stage that's slower than its baseline by more than `tolerance`, or
+    peaks at more memory by more than `rss_tolerance` (both relative). Differences
+    smaller than `min_seconds` or `min_rss` are considered noise. Stages without a
+    baseline are never regressions.
+    """
+    regressions: List[Regression] = []
+    for name, current in sorted(results.items()):
+        previous: Optional[Measurement] = baseline.get(name)
+        if not previous:
+            continue
+
+        if (
+            current.seconds > previous.seconds * (1 + tolerance)
+            and current.seconds - previous.seconds > min_seconds
+        ):
+            regressions.append(
+                Regression(name, "seconds", previous.seconds, current.seconds)
+            )
+        if (
+            current.peak_rss > previous.peak_rss * (1 + rss_tolerance)
+            and current.peak_rss - previous.peak_rss > min_rss
+        ):
+            regressions.append(
+                Regression(name, "peak_rss", previous.peak_rss, current.peak_rss)
+            )
+
+    return regressions
@@ -1,13 +1,74 @@
 """.. include:: ../README.md"""
 
-from .creation import StyledProseGenerator
-from .exceptions import BadConfigException, BadFontException, BadStyleException
-from .stylesheet import ParagraphStyle
+from __future__ import annotations
+
+from importlib import import_module
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Any, Dict, List
+
+    from .cache import RenderCache
+    from .creation import (
+        PdfiumRasterizer,
+        PopplerRasterizer,
+        Rasterizer,
+        RenderedProse,
+        RenderSpec,
+        StyledProseGenerator,
+        Variant,
+    )
+    from .exceptions import BadConfigException, BadFontException, BadStyleException
+    from .registry import FontRegistry
+    from .store import OutputStore
+    from .stylesheet import ParagraphStyle
 
 __all__ = [
     "ParagraphStyle",
     "StyledProseGenerator",
+    "RenderCache",
+    "FontRegistry",
+    "OutputStore",
+    "RenderSpec",
+    "RenderedProse",
+    "Variant",
+    "Rasterizer",
+    "PopplerRasterizer",
+    "PdfiumRasterizer",
     "BadConfigException",
     "BadStyleException",
     "BadFontException",
 ]
+
+# the public names are resolved from their submodules on first access, so that a
+# bare `import styled_prose` doesn't pay for reportlab, Pillow and pydantic upfront
+_SUBMODULES: Dict[str, str] = {
+    "ParagraphStyle": ".stylesheet",
+    "StyledProseGenerator": ".creation",
+    "RenderCache": ".cache",
+    "FontRegistry": ".registry",
+    "OutputStore": ".store",
+    "RenderSpec": ".creation",
+    "RenderedProse": ".creation",
+    "Variant": ".creation",
+    "Rasterizer": ".creation",
+    "PopplerRasterizer": ".creation",
+    "PdfiumRasterizer": ".creation",
+    "BadConfigException": ".exceptions",
+    "BadStyleException": ".exceptions",
+    "BadFontException": ".exceptions",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _SUBMODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value: Any = getattr(import_module(_SUBMODULES[name], __name__), name)
+    globals()[name] = value
+
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted({*globals(), *__all__})
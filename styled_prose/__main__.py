@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .exceptions import BadFontException
+from .fonts import FONT_CACHE, prefetch_fonts
+
+if TYPE_CHECKING:
+    from typing import List, Optional
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(prog="styled_prose")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    prefetch: argparse.ArgumentParser = commands.add_parser(
+        "prefetch",
+        help="download every Google Fonts family in a stylesheet into the font cache",
+    )
+    prefetch.add_argument("stylesheet", type=Path)
+    prefetch.add_argument(
+        "--font-cache",
+        type=Path,
+        default=None,
+        help=f"the directory to cache fonts in (default: {FONT_CACHE})",
+    )
+
+    args: argparse.Namespace = parser.parse_args(argv)
+
+    try:
+        directories: List[Path] = prefetch_fonts(args.stylesheet, args.font_cache)
+    except BadFontException as err:
+        print(err, file=sys.stderr)
+        return 1
+
+    for directory in directories:
+        print(f"cached {directory}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+from uuid import uuid4
+
+from PIL import Image, ImageFile, PngImagePlugin, UnidentifiedImageError
+
+if TYPE_CHECKING:
+    from typing import Any, BinaryIO, List, Optional, Tuple, Union
+
+
+class CacheStats(NamedTuple):
+    """A snapshot of a `RenderCache`'s counters."""
+
+    hits: int
+    """Lookups served from memory."""
+    disk_hits: int
+    """Lookups served from disk, after missing in memory."""
+    misses: int
+    """Lookups that missed in both tiers."""
+    evictions: int
+    """Entries evicted from memory to stay within `max_bytes`."""
+    disk_evictions: int
+    """Entries evicted from disk to stay within `max_disk_bytes`."""
+    bytes: int
+    """The number of bitmap bytes currently held in memory."""
+
+
+class RenderCache:
+    """
+    A two-tier cache of collated, untransformed prose renderings, to be shared with
+    `StyledProseGenerator`. When prose is rendered using the same style more than once,
+    only the rotation, trimming, and thumbnail steps run again.
+
+    Bitmaps are held in an in-process LRU bounded by `max_bytes`. If a `directory` is
+    provided, every entry is also written there as a PNG, evicting the least recently
+    used files once they exceed `max_disk_bytes`.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 256 * 1024 * 1024,
+        directory: Optional[Union[str, Path]] = None,
+        max_disk_bytes: int = 1024 * 1024 * 1024,
+    ) -> None:
+        self.max_bytes: int = max_bytes
+        self.directory: Optional[Path] = Path(directory) if directory else None
+        self.max_disk_bytes: int = max_disk_bytes
+
+        self._entries: OrderedDict[str, Tuple[Image.Image, Any]] = OrderedDict()
+        self._bytes: int = 0
+        self._lock: threading.Lock = threading.Lock()
+        self._hits: int = 0
+        self._disk_hits: int = 0
+        self._misses: int = 0
+        self._evictions: int = 0
+        self._disk_evictions: int = 0
+
+        self._disk_usage: Optional[_DiskUsage] = None
+        if self.directory:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._disk_usage = _DiskUsage(self.directory, "*.png", max_disk_bytes)
+
+    @property
+    def stats(self) -> CacheStats:
+        """The current hit, miss, and eviction counters."""
+        with self._lock:
+            return CacheStats(
+                self._hits,
+                self._disk_hits,
+                self._misses,
+                self._evictions,
+                self._disk_evictions,
+                self._bytes,
+            )
+
+    def get(self, key: str) -> Optional[Tuple[Image.Image, Any]]:
+        """
+        Retrieve the bitmap and its metadata cached under the given key. The returned
+        bitmap is shared, and must not be modified.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return self._entries[key]
+
+        entry: Optional[Tuple[Image.Image, Any]] = self._read(key)
+        with self._lock:
+            if entry:
+                self._disk_hits += 1
+                self._remember(key, entry)
+            else:
+                self._misses += 1
+
+        return entry
+
+    def put(self, key: str, image: Image.Image, metadata: Any = None) -> None:
+        """
+        Cache the given bitmap under the provided key, alongside any JSON-serializable
+        metadata.
+        """
+        with self._lock:
+            self._remember(key, (image, metadata))
+
+        if self.directory:
+            self._write(key, image, metadata)
+
+    def clear(self) -> None:
+        """Drop every in-memory entry. Entries on disk are left untouched."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remember(self, key: str, entry: Tuple[Image.Image, Any]) -> None:
+        """Add an entry to the in-memory LRU, evicting old ones as necessary."""
+        if key in self._entries:
+            self._bytes -= _size(self._entries.pop(key)[0])
+
+        size: int = _size(entry[0])
+        if size > self.max_bytes:
+            # it would never fit, so don't bother evicting everything else for it
+            return
+
+        self._entries[key] = entry
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self._bytes -= _size(evicted)
+            self._evictions += 1
+
+    def _read(self, key: str) -> Optional[Tuple[Image.Image, Any]]:
+        """Read an entry from the disk tier, if it exists."""
+        if not self.directory:
+            return None
+
+        file: Path = self.directory / f"{key}.png"
+        try:
+            image: Image.Image = _open(file, "PNG", self.max_disk_bytes)
+            metadata: Any = json.loads(image.info.get("metadata", "null"))
+            # mark the file as recently used
+            os.utime(file)
+            return image, metadata
+        except (OSError, ValueError, Image.DecompressionBombError):
+            # either the entry doesn't exist or it's corrupt; both count as a miss
+            return None
+
+    def _write(self, key: str, image: Image.Image, metadata: Any) -> None:
+        """Atomically write an entry to the disk tier, evicting old ones as needed."""
+        assert self.directory
+        info: PngImagePlugin.PngInfo = PngImagePlugin.PngInfo()
+        info.add_text("metadata", json.dumps(metadata))
+
+        # write to a temporary file first so that readers never see a partial entry
+        tmp: Path = self.directory / f".{key}.{uuid4()}.tmp"
+        image.save(tmp, "PNG", pnginfo=info, compress_level=1)
+        size: int = tmp.stat().st_size
+        os.replace(tmp, self.directory / f"{key}.png")
+
+        assert self._disk_usage
+        evicted: int = self._disk_usage.add(size)
+        with self._lock:
+            self._disk_evictions += evicted
+
+
+class _DiskUsage:
+    """
+    A running estimate of the bytes used by the files in a directory matching a
+    pattern, evicting the least recently used ones once they exceed `max_bytes`.
+    Writes are added to the estimate rather than scanning the directory every time,
+    which only happens every `rescan` writes (picking up changes made by other
+    processes) or whenever the estimate overflows.
+    """
+
+    def __init__(
+        self, directory: Path, pattern: str, max_bytes: int, rescan: int = 256
+    ) -> None:
+        self.directory: Path = directory
+        self.pattern: str = pattern
+        self.max_bytes: int = max_bytes
+        self.rescan: int = rescan
+
+        self._lock: threading.Lock = threading.Lock()
+        self._total: Optional[int] = None
+        self._writes: int = 0
+
+    def add(self, size: int) -> int:
+        """
+        Account for a file of the given size having been written, returning the
+        number of files evicted to make room for it.
+        """
+        with self._lock:
+            self._writes += 1
+            if self._total is not None and self._writes < self.rescan:
+                # overwritten files are counted twice, which only ever overestimates
+                self._total += size
+                if self._total <= self.max_bytes:
+                    return 0
+
+            evicted: int
+            evicted, self._total = _evict_files(
+                self.directory, self.pattern, self.max_bytes
+            )
+            self._writes = 0
+            return evicted
+
+
+def _evict_files(directory: Path, pattern: str, max_bytes: int) -> Tuple[int, int]:
+    """
+    Delete the least recently used files in the directory matching the given pattern
+    until they no longer exceed `max_bytes`, returning the number deleted and the
+    bytes used by the rest. Files are ordered by modification time, which readers
+    update whenever they use one.
+    """
+    files: List[Tuple[float, int, Path]] = []
+    for file in directory.glob(pattern):
+        try:
+            stat: os.stat_result = file.stat()
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, file))
+
+    evicted: int = 0
+    total: int = sum(size for _, size, _ in files)
+    for _, size, file in sorted(files):
+        if total <= max_bytes:
+            break
+
+        file.unlink(missing_ok=True)
+        total -= size
+        evicted += 1
+
+    return evicted, total
+
+
+def _open(file: Union[Path, BinaryIO], format: str, max_bytes: int) -> Image.Image:
+    """
+    Open and load an image this package wrote itself, in the given format. Pillow's
+    decompression bomb check is a global setting, so its plugin is used directly in
+    favour of a local check: no entry can decode to more than `max_bytes`, the most
+    the directory it came from may hold.
+    """
+    Image.init()
+    try:
+        image: ImageFile.ImageFile = Image.OPEN[format][0](file)
+    except (KeyError, SyntaxError) as error:
+        # either Pillow can't read the format, or the file isn't in it
+        raise UnidentifiedImageError(str(error)) from error
+
+    with image:
+        if _size(image) > max_bytes:
+            raise Image.DecompressionBombError(
+                f"Image size ({image.width}x{image.height} pixels) is larger than "
+                f"the directory it was read from may hold."
+            )
+
+        image.load()
+        copy: Image.Image = image.copy()
+        return copy
+
+
+def _size(image: Image.Image) -> int:
+    """Estimate the number of bytes a bitmap occupies in memory."""
+    return image.width * image.height * len(image.getbands())
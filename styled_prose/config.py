@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+import hashlib
+import json
 from functools import lru_cache
 from typing import TYPE_CHECKING
 
 from .exceptions import BadConfigException
+from .util import BoundedCache
 
 try:
     import tomllib
@@ -14,13 +17,45 @@ if TYPE_CHECKING:
     from pathlib import Path
     from typing import Any, Dict
 
+# the most configurations, stylesheets, and font registrations cached at once, whether
+# by path or by contents; older ones are evicted, and simply loaded again if needed
+CACHE_SIZE: int = 128
 
-@lru_cache(maxsize=None)
-def load_config(path: Path) -> Dict[str, Any]:
-    """Load the provided configuration file, caching for subsequent use."""
+# parsed in-memory configurations, keyed by the digest of their contents
+_parsed_configs: BoundedCache[Dict[str, Any]] = BoundedCache(CACHE_SIZE)
+
+
+def parse_config(data: bytes) -> Dict[str, Any]:
+    """Parse the contents of a configuration file, without caching them."""
     try:
-        with open(path, "rb") as f:
-            config: Dict[str, Any] = tomllib.load(f)
-            return config
-    except tomllib.TOMLDecodeError as err:
+        config: Dict[str, Any] = tomllib.loads(data.decode())
+        return config
+    except (tomllib.TOMLDecodeError, UnicodeDecodeError) as err:
         raise BadConfigException("Invalid config TOML!") from err
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def load_config(path: Path) -> Dict[str, Any]:
+    """Load the provided configuration file, caching for subsequent use."""
+    with open(path, "rb") as f:
+        return parse_config(f.read())
+
+
+def load_config_text(text: str) -> Dict[str, Any]:
+    """
+    Parse the provided TOML configuration, caching it by the digest of its contents so
+    that identical configurations share a single parsed copy.
+    """
+    data: bytes = text.encode()
+    return _parsed_configs.get(
+        hashlib.sha256(data).hexdigest(), lambda: parse_config(data)
+    )
+
+
+def config_digest(config: Any) -> str:
+    """
+    Digest a loaded configuration (or part of one) by its contents, such that equal
+    configurations always share a digest regardless of how they were loaded.
+    """
+    canonical: str = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
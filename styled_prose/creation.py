@@ -1,24 +1,1133 @@
 from __future__ import annotations
 
+import hashlib
+import itertools
+import math
 import os
+import random
+import subprocess
+import threading
+import warnings
+import weakref
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from functools import lru_cache
+from io import BytesIO
 from pathlib import Path
-from random import randint
 from tempfile import TemporaryDirectory
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, NamedTuple, Protocol, Tuple
 from uuid import uuid4
 
-from pdf2image.pdf2image import convert_from_path
-from PIL import Image, ImageChops, ImageFilter
+from PIL import Image, ImageFilter
+from reportlab.lib.fonts import tt2ps
 from reportlab.lib.pagesizes import LETTER
-from reportlab.platypus import Paragraph, SimpleDocTemplate
+from reportlab.pdfbase import pdfmetrics
 
-from .fonts import register_fonts
-from .stylesheet import load_stylesheet
+from . import config as spconfig
+from .cache import RenderCache
+from .fonts import (
+    load_font_families,
+    register_config_fonts,
+    register_families,
+    register_fonts,
+)
+from .registry import FontRegistry, _registered, _unregister
+from .store import OutputStore
+from .stylesheet import (
+    build_stylesheet,
+    compile_stylesheet,
+    load_stylesheet,
+    rename_fonts,
+)
+from .util import BoundedCache
 
+# asyncio, pdf2image, reportlab's layout engine, and the drawing engine are only
+# imported once they're needed, since importing them is comparatively slow
 if TYPE_CHECKING:
-    from typing import List, Optional, Tuple
+    import asyncio
+    from concurrent.futures import Future
+    from typing import (
+        Any,
+        AsyncIterator,
+        Callable,
+        Deque,
+        Dict,
+        Generator,
+        Iterable,
+        Iterator,
+        List,
+        Literal,
+        Optional,
+        Set,
+        Union,
+    )
 
+    from reportlab.lib.styles import ParagraphStyle as RLPStyle
     from reportlab.lib.styles import StyleSheet1 as StyleSheet
+    from reportlab.platypus import Paragraph
+
+    from .fonts import FontFamily
+
+DPI: int = 200
+THREAD_COUNT: int = min(4, os.cpu_count() or 1)
+# the padding reportlab adds around the frame that prose is laid out in
+FRAME_PADDING: float = 6
+# the number of rows scanned at once when looking for whitespace to trim
+TRIM_STRIP_HEIGHT: int = 64
+# pillow rotates using 16.16 fixed point arithmetic, so long as every coordinate it
+# samples fits; beyond that it accumulates floats, which can't be reproduced piecewise
+FIXED_POINT_LIMIT: float = 32767
+# the tallest page, in points, that can be rasterized in one go; cairo can't allocate
+# images more than 32767 pixels tall
+MAX_PAGE_HEIGHT: float = 32767 * 72 / DPI
+# the most rotated and trimmed bitmaps a `RenderedProse` keeps around for reuse
+MAX_DERIVED_BASES: int = 8
+# pdfium isn't thread-safe, so every in-process rasterization takes turns
+_PDFIUM_LOCK: threading.Lock = threading.Lock()
+
+
+class _PageRequest(NamedTuple):
+    """A request, made mid-rendering, for pages of a PDF to be rasterized."""
+
+    pdf: bytes
+    first_page: int
+    last_page: int
+    dpi: int
+    mode: Literal["RGB", "L"]
+
+    @property
+    def pages(self) -> int:
+        """The number of pages requested."""
+        return self.last_page - self.first_page + 1
+
+
+class RenderSpec(NamedTuple):
+    """
+    The arguments of a single rendering, as consumed by
+    `StyledProseGenerator.create_jpg_many`.
+    """
+
+    prose: str
+    style: str = "default"
+    angle: float = 0
+    thumbnail: Optional[Tuple[int, int]] = None
+    dpi: Union[int, Literal["auto"]] = DPI
+    mode: Literal["RGB", "L", "1"] = "RGB"
+    seed: Optional[int] = None
+
+
+# the generator owned by each batch rendering worker process
+_worker_generator: Optional[StyledProseGenerator] = None
+
+
+def _init_worker(
+    config: Dict[str, Any],
+    options: Dict[str, Any],
+    cache_options: Optional[Dict[str, Any]],
+) -> None:
+    """
+    Prepare a batch rendering worker, registering fonts and loading the stylesheet
+    exactly once for the lifetime of the process. Workers are given the parent
+    generator's loaded configuration, so that they match it even once reloaded.
+    """
+    global _worker_generator
+
+    # forked workers inherit the parent's random state; without reseeding, every
+    # worker would pick the same sequence of thumbnail windows
+    random.seed()
+
+    _worker_generator = StyledProseGenerator(
+        config,
+        cache=RenderCache(**cache_options) if cache_options else None,
+        **options,
+    )
+
+
+def _render_chunk(specs: List[RenderSpec]) -> List[Image.Image]:
+    """Render a chunk of specs within a batch rendering worker."""
+    assert _worker_generator
+    return [_worker_generator.create_jpg(**spec._asdict()) for spec in specs]
+
+
+class _Layout(NamedTuple):
+    """The geometry of a laid out document, in points, and its rasterized resolution."""
+
+    pages: int
+    page_size: Tuple[float, float]
+    # the (left, top, right, bottom) box containing the prose, measured from the top
+    # left corner of the first page as if every page were stacked vertically
+    content_box: Tuple[float, float, float, float]
+    dpi: int = DPI
+    # the (left, top, right, bottom) bounds of the laid out lines of prose, in the same
+    # coordinates as `content_box`, if they were measured
+    line_box: Optional[Tuple[float, float, float, float]] = None
+
+    def to_pixels(self, value: float) -> int:
+        """Convert a length in points into pixels, the same way poppler does."""
+        return math.ceil(value * self.dpi / 72)
+
+    @classmethod
+    def from_metadata(cls, metadata: Any) -> _Layout:
+        """Rebuild a layout cached alongside its rendering, as JSON."""
+        pages, page_size, content_box, dpi, line_box = metadata
+        return cls(
+            pages,
+            tuple(page_size),
+            tuple(content_box),
+            dpi,
+            tuple(line_box) if line_box else None,
+        )
+
+    def line_pixels(self) -> Optional[Tuple[int, int, int, int]]:
+        """The bounds of the laid out lines of prose in pixels, if they were measured."""
+        if not self.line_box:
+            return None
+
+        left, top, right, bottom = self.line_box
+        return (
+            max(0, math.floor(left * self.dpi / 72)),
+            max(0, math.floor(top * self.dpi / 72)),
+            min(self.to_pixels(self.page_size[0]), self.to_pixels(right)),
+            min(self.to_pixels(self.page_size[1]) * self.pages, self.to_pixels(bottom)),
+        )
+
+
+def _paragraph(prose: str, style: RLPStyle) -> Paragraph:
+    """Convert the provided prose into a paragraph flowable."""
+    from reportlab.platypus import Paragraph
+
+    raw_prose: str = prose.replace("\r", "").replace("\n", "<br />")
+    return Paragraph(raw_prose, style)
+
+
+def _build_document(
+    prose: str,
+    style: RLPStyle,
+    page_width: float = LETTER[0],
+    exact_height: bool = False,
+    dpi: int = DPI,
+) -> Tuple[bytes, _Layout]:
+    """
+    Lay out the provided prose as an in-memory PDF, returning it alongside the
+    geometry of the resulting document when rasterized at the given resolution.
+
+    By default, prose is paginated across LETTER-height pages. If `exact_height` is
+    enabled, it's instead measured ahead of time and laid out on a single page sized
+    to fit it exactly, unless that page would be too tall for poppler to rasterize.
+    """
+    from reportlab.platypus import SimpleDocTemplate
+
+    from .drawing import line_bounds
+
+    paragraph: Paragraph = _paragraph(prose, style)
+    page_height: float = LETTER[1]
+
+    if exact_height:
+        _, height = paragraph.wrap(page_width - 2 * FRAME_PADDING, page_height)
+        # pages never grow taller than they could be at the default resolution, so
+        # that the layout is the same regardless of any lower resolution picked later
+        page_height = min(
+            height + 2 * FRAME_PADDING, MAX_PAGE_HEIGHT * DPI / max(dpi, DPI)
+        )
+
+    buffer: BytesIO = BytesIO()
+    document: SimpleDocTemplate = SimpleDocTemplate(
+        buffer,
+        leftMargin=0,
+        topMargin=0,
+        rightMargin=0,
+        bottomMargin=0,
+        pagesize=(page_width, page_height),
+    )
+
+    line_box: Optional[Tuple[float, float, float, float]] = None
+
+    def measure(flowable: Any) -> None:
+        # measure the lines of each part of the prose as its page is drawn, the part
+        # having just been placed at the frame's current position
+        nonlocal line_box
+        if not hasattr(flowable, "blPara"):
+            # page breaks and the like, which draw nothing
+            return
+        bounds: Optional[Tuple[float, float, float, float]] = line_bounds(flowable)
+        if not bounds:
+            return
+
+        frame: Any = document.frame
+        x: float = frame._x + frame._leftExtraIndent
+        y: float = (document.page - 1) * page_height + (
+            page_height - (frame._y + flowable.getSpaceAfter() + flowable.height)
+        )
+        left, top, right, bottom = (
+            x + bounds[0],
+            y + bounds[1],
+            x + bounds[2],
+            y + bounds[3],
+        )
+        line_box = (
+            (min(line_box[0], left), line_box[1], max(line_box[2], right), bottom)
+            if line_box
+            else (left, top, right, bottom)
+        )
+
+    document.afterFlowable = measure
+    document.build([paragraph])
+
+    # the prose starts at the top of the first page's frame and flows down until it
+    # stops somewhere within the frame of the last page
+    pages: int = int(document.page)
+    frame = document.frame
+    content_box: Tuple[float, float, float, float] = (
+        frame._x1 + frame._leftPadding,
+        page_height - frame._y2 + frame._topPadding,
+        frame._x2 - frame._rightPadding,
+        # any space after the prose may push past the bottom of the frame
+        (pages - 1) * page_height
+        + (page_height - max(frame._y, frame._y1 + frame._bottomPadding)),
+    )
+
+    return buffer.getvalue(), _Layout(
+        pages, (page_width, page_height), content_box, dpi, line_box
+    )
+
+
+def _measure_document(
+    prose: str, style: RLPStyle, page_width: float = LETTER[0], dpi: int = DPI
+) -> Tuple[Paragraph, _Layout]:
+    """
+    Lay out the provided prose on a single page sized to fit it exactly, without
+    building a PDF. Returns the wrapped paragraph alongside the page's geometry when
+    drawn at the given resolution.
+    """
+    paragraph: Paragraph = _paragraph(prose, style)
+    _, height = paragraph.wrap(page_width - 2 * FRAME_PADDING, LETTER[1])
+    page_size: Tuple[float, float] = (page_width, height + 2 * FRAME_PADDING)
+    content_box: Tuple[float, float, float, float] = (
+        FRAME_PADDING,
+        FRAME_PADDING,
+        page_width - FRAME_PADDING,
+        page_size[1] - FRAME_PADDING,
+    )
+
+    return paragraph, _Layout(1, page_size, content_box, dpi)
+
+
+def _draw_document(
+    paragraph: Paragraph, layout: _Layout, mode: Literal["RGB", "L"] = "RGB"
+) -> Image.Image:
+    """
+    Draw a paragraph measured by `_measure_document` directly onto a bitmap at the
+    layout's resolution, bypassing PDF generation and poppler entirely.
+    """
+    from .drawing import draw_paragraph
+
+    return draw_paragraph(paragraph, layout.page_size, FRAME_PADDING, layout.dpi, mode)
+
+
+def _style_digest(style: RLPStyle, font_names: Optional[Dict[str, str]] = None) -> str:
+    """
+    Compute a digest of a resolved paragraph style, including the font files backing
+    each of its faces, such that any change to how it renders changes the digest.
+
+    Font families registered under other names, as mapped by `font_names`, are digested
+    by their configured names and the contents of their files, so that the digest is
+    the same wherever (and however many times) they're registered.
+    """
+    configured: Dict[str, str] = {
+        registered: name for name, registered in (font_names or {}).items()
+    }
+    # styles may inherit from the one they were renamed from, so their attributes are
+    # resolved rather than compared alongside their parents
+    attributes: Dict[str, Any] = {
+        attribute: getattr(style, attribute)
+        for attribute in {*style.defaults, *vars(style)} - {"parent"}
+    }
+    for attribute in ("fontName", "bulletFontName"):
+        attributes[attribute] = configured.get(
+            attributes[attribute], attributes[attribute]
+        )
+    parts: List[str] = [repr(sorted(attributes.items(), key=str))]
+
+    for family in sorted({style.fontName, style.bulletFontName}):
+        for bold, italic in ((0, 0), (1, 0), (0, 1), (1, 1)):
+            try:
+                face: Any = pdfmetrics.getFont(tt2ps(family, bold, italic)).face
+            except (KeyError, ValueError):
+                continue
+
+            filename: Optional[str] = getattr(face, "filename", None)
+            if filename and os.path.exists(filename):
+                stat: os.stat_result = os.stat(filename)
+                parts.append(
+                    _file_digest(str(filename), stat.st_size, stat.st_mtime_ns)
+                )
+                continue
+
+            # standard fonts have no file, but a stable name; TrueType faces name
+            # themselves in bytes, suffixed if their family was registered under
+            # another name
+            name: Union[str, bytes] = face.name
+            if isinstance(name, bytes):
+                name = name.decode("latin-1")
+            suffix: str = f"-{hashlib.sha256(family.encode()).hexdigest()[:8]}"
+            if family in configured and name.endswith(suffix):
+                name = name[: -len(suffix)]
+            parts.append(name)
+
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+@lru_cache(maxsize=spconfig.CACHE_SIZE)
+def _file_digest(filename: str, size: int, mtime_ns: int) -> str:
+    """
+    Digest the contents of a file, so that identical fonts share a digest wherever
+    they're installed. The file's size and modification time only serve to invalidate
+    the cached digest once it changes.
+    """
+    with open(filename, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _is_neutral(style: RLPStyle) -> bool:
+    """Determine whether the colors of a paragraph style are all neutral grays."""
+    # the configured `font_color` is kept alongside ReportLab's own text color
+    colors: List[Any] = [style.textColor, getattr(style, "fontColor", None)]
+    return all(len(set(color.rgb())) == 1 for color in colors if color is not None)
+
+
+def _pdftocairo_command(
+    page: int, dpi: int, mode: Literal["RGB", "L"] = "RGB"
+) -> List[str]:
+    """
+    Build the `pdftocairo` command that rasterizes a single page of a PDF piped over
+    stdin, writing the resulting JPEG (in color or grayscale) to stdout.
+    """
+    return [
+        "pdftocairo",
+        "-jpeg",
+        *(["-gray"] if mode == "L" else []),
+        "-r",
+        str(dpi),
+        "-f",
+        str(page),
+        "-l",
+        str(page),
+        "-singlefile",
+        "-",
+        "-",
+    ]
+
+
+def _decode_page(data: bytes) -> Image.Image:
+    """Decode a rasterized page written by poppler."""
+    image: Image.Image = Image.open(BytesIO(data))
+    image.load()
+    return image
+
+
+def _rasterize_pdf_bytes(
+    pdf: bytes,
+    first_page: int,
+    last_page: int,
+    dpi: int = DPI,
+    mode: Literal["RGB", "L"] = "RGB",
+) -> Iterator[Image.Image]:
+    """
+    Rasterize the requested pages of an in-memory PDF without touching the disk,
+    yielding each page in order as soon as it's ready. Each page is piped to its own
+    `pdftocairo` process over stdin and read back from stdout, with at most
+    `THREAD_COUNT` processes running (or pages waiting to be yielded) at once.
+    """
+    from pdf2image.exceptions import PopplerNotInstalledError
+
+    def rasterize_page(page: int) -> Image.Image:
+        try:
+            proc: subprocess.CompletedProcess[bytes] = subprocess.run(
+                _pdftocairo_command(page, dpi, mode),
+                input=pdf,
+                capture_output=True,
+                check=True,
+            )
+        except FileNotFoundError as err:
+            raise PopplerNotInstalledError(
+                "Unable to find pdftocairo. Is poppler installed and in PATH?"
+            ) from err
+
+        return _decode_page(proc.stdout)
+
+    pages: range = range(first_page, last_page + 1)
+    with ThreadPoolExecutor(max_workers=min(THREAD_COUNT, len(pages))) as pool:
+        pending: Deque[Future[Image.Image]] = deque()
+        for page in pages:
+            pending.append(pool.submit(rasterize_page, page))
+            if len(pending) >= THREAD_COUNT:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+
+async def _arasterize_pdf_bytes(
+    pdf: bytes,
+    first_page: int,
+    last_page: int,
+    dpi: int = DPI,
+    mode: Literal["RGB", "L"] = "RGB",
+) -> List[Image.Image]:
+    """
+    Asynchronously rasterize the requested pages of an in-memory PDF. This is the
+    asyncio equivalent of `_rasterize_pdf_bytes`, decoding pages in the default
+    executor so as not to block the event loop.
+    """
+    import asyncio
+
+    from pdf2image.exceptions import PopplerNotInstalledError
+
+    loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+    limit: asyncio.Semaphore = asyncio.Semaphore(THREAD_COUNT)
+
+    async def rasterize_page(page: int) -> Image.Image:
+        command: List[str] = _pdftocairo_command(page, dpi, mode)
+        async with limit:
+            try:
+                proc: asyncio.subprocess.Process = await asyncio.create_subprocess_exec(
+                    *command,
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                )
+            except FileNotFoundError as err:
+                raise PopplerNotInstalledError(
+                    "Unable to find pdftocairo. Is poppler installed and in PATH?"
+                ) from err
+
+            try:
+                stdout, stderr = await proc.communicate(pdf)
+            except asyncio.CancelledError:
+                # never leave poppler running once nothing will read its output
+                if proc.returncode is None:
+                    proc.kill()
+                    await proc.wait()
+                raise
+
+            if proc.returncode:
+                raise subprocess.CalledProcessError(
+                    proc.returncode, command, stdout, stderr
+                )
+
+        return await loop.run_in_executor(None, _decode_page, stdout)
+
+    return list(
+        await asyncio.gather(
+            *(rasterize_page(page) for page in range(first_page, last_page + 1))
+        )
+    )
+
+
+class Rasterizer(Protocol):
+    """
+    A means of rasterizing the pages of a PDF, which can be provided to
+    `StyledProseGenerator` in place of poppler.
+    """
+
+    def rasterize(
+        self,
+        pdf: bytes,
+        first_page: int,
+        last_page: int,
+        dpi: int = DPI,
+        mode: Literal["RGB", "L"] = "RGB",
+    ) -> Iterable[Image.Image]:
+        """
+        Rasterize the requested (1-indexed and inclusive) pages of the provided PDF at
+        the given resolution and in the given mode, returning the images in order.
+        Pages must be sized the way poppler sizes them, rounding up to whole pixels.
+        """
+        ...
+
+
+class PopplerRasterizer:
+    """
+    The default rasterizer, which rasterizes pages using poppler's `pdftocairo`.
+
+    If `in_memory` is enabled, documents are piped directly to `pdftocairo` processes
+    rather than round-tripping through a temporary directory via pdf2image.
+    """
+
+    def __init__(self, in_memory: bool = False) -> None:
+        self.in_memory: bool = in_memory
+
+    def rasterize(
+        self,
+        pdf: bytes,
+        first_page: int,
+        last_page: int,
+        dpi: int = DPI,
+        mode: Literal["RGB", "L"] = "RGB",
+    ) -> Iterator[Image.Image]:
+        """
+        Rasterize the requested pages of the provided PDF, lazily yielding each one in
+        order.
+        """
+        if self.in_memory:
+            yield from _rasterize_pdf_bytes(pdf, first_page, last_page, dpi, mode)
+            return
+
+        from pdf2image.pdf2image import convert_from_path
+
+        with TemporaryDirectory() as tmpdir:
+            filename: Path = Path(tmpdir) / f"{uuid4()}.pdf"
+            filename.write_bytes(pdf)
+
+            # convert the PDF to a series of image files, which are only decoded one
+            # at a time; pdf2image returns their paths, despite its annotations
+            paths: List[str] = convert_from_path(  # type: ignore[assignment]
+                filename,
+                dpi=dpi,
+                first_page=first_page,
+                last_page=last_page,
+                thread_count=THREAD_COUNT,
+                use_pdftocairo=True,
+                fmt="jpeg",
+                grayscale=mode == "L",
+                output_folder=tmpdir,
+                paths_only=True,
+            )
+            for path in paths:
+                yield _decode_page(Path(path).read_bytes())
+
+
+class PdfiumRasterizer:
+    """
+    An in-process rasterizer backed by pdfium, which avoids spawning a process for
+    every page. It requires the optional `pypdfium2` dependency, which is installed
+    by the `pdfium` extra.
+
+    Pages are rasterized losslessly rather than as JPEGs, and pdfium antialiases text
+    slightly differently than poppler, so renderings won't be pixel-identical to those
+    of `PopplerRasterizer`.
+    """
+
+    def __init__(self) -> None:
+        try:
+            import pypdfium2  # noqa: F401
+        except ImportError as err:
+            raise ImportError(
+                "PdfiumRasterizer requires pypdfium2. Is the styled-prose[pdfium] extra"
+                " installed?"
+            ) from err
+
+    def rasterize(
+        self,
+        pdf: bytes,
+        first_page: int,
+        last_page: int,
+        dpi: int = DPI,
+        mode: Literal["RGB", "L"] = "RGB",
+    ) -> Iterator[Image.Image]:
+        """
+        Rasterize the requested pages of the provided PDF, lazily yielding each one in
+        order.
+        """
+        import pypdfium2
+
+        with _PDFIUM_LOCK:
+            document: Any = pypdfium2.PdfDocument(pdf)
+
+        try:
+            for index in range(first_page - 1, last_page):
+                with _PDFIUM_LOCK:
+                    page: Any = document[index]
+                    image: Image.Image = page.render(
+                        scale=dpi / 72, grayscale=mode == "L"
+                    ).to_pil()
+                    page.close()
+
+                yield image
+        finally:
+            with _PDFIUM_LOCK:
+                document.close()
+
+
+def _advance(
+    steps: Generator[_PageRequest, Iterable[Image.Image], Image.Image],
+    images: Optional[Iterable[Image.Image]],
+) -> Tuple[Optional[_PageRequest], Optional[Image.Image]]:
+    """
+    Resume a rendering until it either requests pages to be rasterized or finishes,
+    returning whichever happened. `StopIteration` can't propagate through futures, so
+    it's unwrapped here instead.
+    """
+    try:
+        return steps.send(images), None  # type: ignore[arg-type]
+    except StopIteration as stop:
+        return None, stop.value
+
+
+def _rasterize_all(rasterizer: Rasterizer, request: _PageRequest) -> List[Image.Image]:
+    """Eagerly rasterize every page of a request, such as from within an executor."""
+    return list(rasterizer.rasterize(*request))
+
+
+def _chunked(
+    specs: Iterator[RenderSpec], size: int
+) -> Iterator[Tuple[int, List[RenderSpec]]]:
+    """Lazily group specs into chunks, alongside the index of each chunk's first spec."""
+    start: int = 0
+    while True:
+        chunk: List[RenderSpec] = list(itertools.islice(specs, size))
+        if not chunk:
+            return
+
+        yield start, chunk
+        start += len(chunk)
+
+
+def _collect(
+    futures: Dict[Future[List[Image.Image]], int], ordered: bool
+) -> Iterator[Tuple[int, Image.Image]]:
+    """
+    Wait for at least one in-flight chunk of renderings, yielding each alongside the
+    index of its spec. If ordered, the oldest chunk is always the one waited on.
+    """
+    done: Set[Future[List[Image.Image]]]
+    if ordered:
+        done = {next(iter(futures))}
+    else:
+        done, _ = wait(futures, return_when=FIRST_COMPLETED)
+
+    for future in done:
+        start: int = futures.pop(future)
+        for offset, image in enumerate(future.result()):
+            yield start + offset, image
+
+
+def _ink_bbox(image: Image.Image) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Find the bounding box of every non-white pixel in the image. Rather than diffing
+    the entire image against a white one, it's scanned in strips of
+    `TRIM_STRIP_HEIGHT` rows so that no additional full-size bitmaps are allocated.
+    """
+    # map every channel to 0 if white and 255 otherwise, so that only ink is non-zero
+    lut: List[int] = ([255] * 255 + [0]) * len(image.getbands())
+    width, height = image.size
+    left, top, right, bottom = width, height, 0, 0
+
+    for y in range(0, height, TRIM_STRIP_HEIGHT):
+        strip: Image.Image = image.crop(
+            (0, y, width, min(y + TRIM_STRIP_HEIGHT, height))
+        )
+        bbox: Optional[Tuple[int, int, int, int]] = strip.point(lut).getbbox()
+        if bbox:
+            left, right = min(left, bbox[0]), max(right, bbox[2])
+            top, bottom = min(top, y + bbox[1]), y + bbox[3]
+
+    return (left, top, right, bottom) if right else None
+
+
+def _crop(image: Image.Image, box: Tuple[int, int, int, int]) -> Image.Image:
+    """
+    Crop the (left, top, right, bottom) region out of an image. `Image.crop` refuses
+    regions larger than Pillow's decompression bomb limit, which long renderings of
+    our own easily exceed, so the region is pasted into a canvas allocated here.
+    """
+    left, top, right, bottom = box
+    output: Image.Image = Image.new(image.mode, (right - left, bottom - top))
+    output.paste(image, (-left, -top))
+    return output
+
+
+def _rotation(
+    size: Tuple[int, int], angle: float
+) -> Optional[Tuple[List[float], Tuple[int, int]]]:
+    """
+    Compute the (destination to source) affine matrix and expanded dimensions that
+    `Image.rotate` uses to rotate an image of the given size about its center. If Pillow
+    would rotate it in a way that can't be reproduced a region at a time, such as by
+    transposing it or using floating point arithmetic, None is returned instead.
+    """
+    if angle % 90 == 0:
+        return None
+
+    width, height = size
+    radians: float = -math.radians(angle % 360)
+    cos, sin = round(math.cos(radians), 15), round(math.sin(radians), 15)
+    matrix: List[float] = [cos, sin, 0, -sin, cos, 0]
+
+    def transform(x: float, y: float) -> Tuple[float, float]:
+        return (
+            matrix[0] * x + matrix[1] * y + matrix[2],
+            matrix[3] * x + matrix[4] * y + matrix[5],
+        )
+
+    # mirror Pillow's arithmetic exactly, rotating about the center and then
+    # translating to fit the expanded dimensions
+    matrix[2], matrix[5] = transform(-width / 2, -height / 2)
+    matrix[2] += width / 2
+    matrix[5] += height / 2
+    xs, ys = zip(*(transform(x, y) for x, y in ((0, 0), (width, 0), size, (0, height))))
+    expanded: Tuple[int, int] = (
+        math.ceil(max(xs)) - math.floor(min(xs)),
+        math.ceil(max(ys)) - math.floor(min(ys)),
+    )
+    matrix[2], matrix[5] = transform(
+        -(expanded[0] - width) / 2, -(expanded[1] - height) / 2
+    )
+
+    corners: Tuple[Tuple[int, int], ...] = (
+        (0, 0),
+        (expanded[0], 0),
+        expanded,
+        (0, expanded[1]),
+    )
+    if any(
+        abs(v) >= FIXED_POINT_LIMIT for corner in corners for v in transform(*corner)
+    ):
+        return None
+
+    return matrix, expanded
+
+
+def _rotate_region(
+    image: Image.Image, matrix: List[float], box: Tuple[int, int, int, int]
+) -> Image.Image:
+    """
+    Rotate only the (left, top, right, bottom) region of an image's expanded rotation,
+    given the matrix from `_rotation`. The matrix is offset so that every sampled
+    coordinate, in fixed point, is exactly what it'd be when rotating the whole image.
+    """
+
+    def fixed(v: float) -> int:
+        return math.floor(v * 65536 + 0.5)
+
+    a, b, c, d, e, f = matrix
+    x, y = box[:2]
+    # pillow samples the center of each pixel, starting from the top left one
+    a_half, d_half = a * 0.5 + b * 0.5, d * 0.5 + e * 0.5
+    c = (fixed(a_half + c) + x * fixed(a) + y * fixed(b)) / 65536 - a_half
+    f = (fixed(d_half + f) + x * fixed(d) + y * fixed(e)) / 65536 - d_half
+
+    return image.transform(
+        (box[2] - x, box[3] - y),
+        Image.Transform.AFFINE,
+        (a, b, c, d, e, f),
+        resample=Image.Resampling.NEAREST,
+        fillcolor="white",
+    )
+
+
+def _rotated_ink_bbox(
+    image: Image.Image, matrix: List[float], size: Tuple[int, int]
+) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Find the bounding box of every non-white pixel in an image's expanded rotation,
+    given the matrix and dimensions from `_rotation`, without rotating all of it. The
+    rotated bounds of the unrotated ink narrow the search, after which strips are
+    rotated inward from each of its edges until they contain ink.
+    """
+    ink: Optional[Tuple[int, int, int, int]] = _ink_bbox(image)
+    if not ink:
+        return None
+
+    # the rotation is orthonormal, so its transpose maps source points back
+    a, b, c, d, e, f = matrix
+    corners: List[Tuple[float, float]] = [
+        (a * (x - c) + d * (y - f), b * (x - c) + e * (y - f))
+        for x in (ink[0], ink[2])
+        for y in (ink[1], ink[3])
+    ]
+    xs, ys = zip(*corners)
+    # pad for pixel centers and fixed point error
+    left: int = max(0, math.floor(min(xs)) - 2)
+    top: int = max(0, math.floor(min(ys)) - 2)
+    right: int = min(size[0], math.ceil(max(xs)) + 2)
+    bottom: int = min(size[1], math.ceil(max(ys)) + 2)
+
+    def scan(
+        boxes: Iterator[Tuple[int, int, int, int]],
+    ) -> Optional[Tuple[int, int, int, int]]:
+        for box in boxes:
+            found: Optional[Tuple[int, int, int, int]] = _ink_bbox(
+                _rotate_region(image, matrix, box)
+            )
+            if found:
+                # translate the strip's bounds back into the rotation's
+                return (
+                    box[0] + found[0],
+                    box[1] + found[1],
+                    box[0] + found[2],
+                    box[1] + found[3],
+                )
+        return None
+
+    step: int = TRIM_STRIP_HEIGHT
+    found: Optional[Tuple[int, int, int, int]] = scan(
+        (left, y, right, min(y + step, bottom)) for y in range(top, bottom, step)
+    )
+    if not found:
+        # nearest neighbor sampling can skip over slivers of ink entirely
+        return None
+    top = found[1]
+
+    # now that there's known to be ink, every other edge is bound to find some
+    found = scan(
+        (left, max(y - step, top), right, y) for y in range(bottom, top, -step)
+    )
+    assert found
+    bottom = found[3]
+    found = scan(
+        (x, top, min(x + step, right), bottom) for x in range(left, right, step)
+    )
+    assert found
+    left = found[0]
+    found = scan(
+        (max(x - step, left), top, x, bottom) for x in range(right, left, -step)
+    )
+    assert found
+    right = found[2]
+
+    return left, top, right, bottom
+
+
+def _collate(
+    images: Iterable[Image.Image], pages: int, mode: Literal["RGB", "L"] = "RGB"
+) -> Image.Image:
+    """
+    Collate the provided page images into a single long one of the given mode. Pages
+    are consumed one at a time and written into an output preallocated for all of
+    them, so a lazy iterable never needs more than a page in memory besides it.
+    """
+    output: Optional[Image.Image] = None
+    height: int = 0
+    top: int = 0
+
+    # pages are counted by hand; enumerate would keep the previous one alive until
+    # the next is produced
+    for im in images:
+        if im.mode != mode:
+            im = im.convert(mode)
+
+        if pages == 1:
+            # nothing to stitch together
+            return im
+
+        if output is None:
+            height = im.size[1]
+            output = Image.new(mode, (im.size[0], height * pages))
+
+        output.paste(im, (0, top))
+        top += height
+        # release each page as soon as it's been written
+        del im
+
+    assert output
+    return output
+
+
+def _finish(
+    image: Image.Image,
+    thumbnail: Optional[Tuple[int, int]],
+    mode: Literal["RGB", "L", "1"],
+) -> Image.Image:
+    """
+    Apply the final steps of a rendering: scaling a prescaled thumbnail window back to
+    the `thumbnail` dimensions, if provided, and thresholding bilevel images.
+    """
+    if thumbnail:
+        # if we scaled it before cropping, we need to scale it back to the dimensions
+        # that were requested
+        image = image.filter(ImageFilter.SHARPEN)
+        image = image.resize(
+            thumbnail, resample=Image.Resampling.LANCZOS, reducing_gap=2.0
+        )
+
+    if mode == "1" and image.mode == "L":
+        # threshold rather than dither, so that text stays crisp
+        image = image.convert("1", dither=Image.Dither.NONE)
+
+    return image
+
+
+def _watch_config(
+    generator: weakref.ReferenceType[StyledProseGenerator],
+    config: Path,
+    stop: threading.Event,
+    interval: float,
+) -> None:
+    """
+    Reload the configuration of a watched generator whenever its modification time or
+    size changes, until stopped or the generator is garbage collected. Changes are
+    only reloaded once they've settled for an interval, so that files caught halfway
+    through being written aren't.
+    """
+    seen: Optional[Tuple[int, int]] = None
+    loaded: Optional[Tuple[int, int]] = None
+
+    while True:
+        watched: Optional[StyledProseGenerator] = generator()
+        if not watched:
+            return
+
+        try:
+            stat: os.stat_result = os.stat(config)
+            current: Tuple[int, int] = (stat.st_mtime_ns, stat.st_size)
+            if current == seen and current != loaded:
+                loaded = current
+                watched.reload()
+            seen = current
+        except (OSError, ValueError) as err:
+            warnings.warn(
+                f"Failed to reload the stylesheet {config}: {err}",
+                RuntimeWarning,
+                stacklevel=1,
+            )
+
+        # don't keep the generator alive while waiting
+        del watched
+        if stop.wait(interval):
+            return
+
+
+class Variant(NamedTuple):
+    """
+    The arguments of a single image derived from prose rendered once, as consumed by
+    `RenderedProse.variants`.
+    """
+
+    angle: float = 0
+    thumbnail: Optional[Tuple[int, int]] = None
+    prescale_thumbnail: bool = True
+    comparative_font_size: float = 6.0
+
+
+class RenderedProse:
+    """
+    Prose rendered once by `StyledProseGenerator.render`, from which any number of
+    rotated images and thumbnails can be derived without laying out or rasterizing the
+    prose again.
+
+    Every image derived at the same angle shares a single rotated and trimmed bitmap;
+    the last `MAX_DERIVED_BASES` of them are kept around for reuse. If the pixel
+    `lines` bounding multi-page prose are given, unrotated thumbnails are cropped from
+    within them instead, like `create_jpg` does.
+    """
+
+    def __init__(
+        self,
+        generator: StyledProseGenerator,
+        collated: Image.Image,
+        style: RLPStyle,
+        dpi: int = DPI,
+        mode: Literal["RGB", "L", "1"] = "RGB",
+        lines: Optional[Tuple[int, int, int, int]] = None,
+    ) -> None:
+        self.generator: StyledProseGenerator = generator
+        self.style: RLPStyle = style
+        self.dpi: int = dpi
+        self.mode: Literal["RGB", "L", "1"] = mode
+        # the untrimmed rendering, which may be shared with a `RenderCache`
+        self._collated: Image.Image = collated
+        self._lines: Optional[Tuple[int, int, int, int]] = lines
+        self._bases: BoundedCache[Image.Image] = BoundedCache(MAX_DERIVED_BASES)
+
+    def _base(self, angle: float) -> Image.Image:
+        """
+        The rendering rotated by the given angle and trimmed, which is shared by every
+        image derived from it and must not be modified.
+        """
+        angle = angle % 360
+
+        def create() -> Image.Image:
+            output: Image.Image = self._collated
+            if angle:
+                output = output.rotate(
+                    angle,
+                    resample=Image.Resampling.NEAREST,
+                    fillcolor="white",
+                    expand=True,
+                )
+
+            bbox: Optional[Tuple[int, int, int, int]] = _ink_bbox(output)
+            return _crop(output, bbox) if bbox else output.copy()
+
+        return self._bases.get(repr(float(angle)), create)
+
+    def rotated(self, angle: float = 0) -> Image.Image:
+        """
+        The rendering rotated by the given angle, expanding its dimensions to
+        accommodate, with the whitespace around it trimmed; equivalent to `create_jpg`
+        given the same angle and no thumbnail.
+        """
+        return _finish(self._base(angle).copy(), None, self.mode)
+
+    def thumbnail(
+        self,
+        size: Tuple[int, int],
+        angle: float = 0,
+        prescale_thumbnail: bool = True,
+        comparative_font_size: float = 6.0,
+        rng: Optional[random.Random] = None,
+    ) -> Image.Image:
+        """
+        A thumbnail of the given size, cropped from a random window of the rendering
+        rotated by `angle`. The window is picked using `rng` if provided, or the global
+        random number generator otherwise. The remaining arguments behave like they do
+        for `create_jpg`.
+        """
+        base: Image.Image
+        left, top = 0, 0
+        if self._lines and not angle % 360:
+            base = self._collated
+            left, top, right, bottom = self._lines
+            dimensions: Tuple[int, int] = (right - left, bottom - top)
+        else:
+            base = self._base(angle)
+            dimensions = base.size
+
+        x, y, w, h = self.generator._thumbnail_window(
+            dimensions,
+            self.style,
+            size,
+            prescale_thumbnail,
+            comparative_font_size,
+            self.dpi,
+            rng,
+        )
+        x, y = x + left, y + top
+        output: Image.Image = _crop(base, (x, y, x + w, y + h))
+
+        return _finish(output, size if prescale_thumbnail else None, self.mode)
+
+    def variants(
+        self, variants: Iterable[Variant], rng: Optional[random.Random] = None
+    ) -> List[Image.Image]:
+        """
+        Derive an image for each of the given variants, in order. Variants are derived
+        grouped by angle, so that each angle is only ever rotated and trimmed once;
+        thumbnail windows are picked using `rng` in that order, too.
+        """
+        specs: List[Variant] = list(variants)
+        outputs: List[Optional[Image.Image]] = [None] * len(specs)
+
+        for index in sorted(range(len(specs)), key=lambda i: specs[i].angle % 360):
+            spec: Variant = specs[index]
+            if spec.thumbnail:
+                outputs[index] = self.thumbnail(
+                    spec.thumbnail,
+                    spec.angle,
+                    spec.prescale_thumbnail,
+                    spec.comparative_font_size,
+                    rng,
+                )
+            else:
+                outputs[index] = self.rotated(spec.angle)
+
+        return [output for output in outputs if output is not None]
 
 
 class StyledProseGenerator:
@@ -27,11 +1136,414 @@ class StyledProseGenerator:
     Font and style validation and registration happens during initialization; as such,
     if using this library as a part of an application, it is recommended to create a
     single instance of this class during startup.
+
+    If `in_memory` is enabled, documents are built into an in-memory buffer and piped
+    directly to poppler rather than round-tripping through a temporary directory.
+    Alternatively, a different `Rasterizer`, such as the in-process
+    `PdfiumRasterizer`, can replace poppler entirely.
+
+    If a `RenderCache` is provided, the collated rendering of every prose and style
+    combination is cached, so that subsequent calls with only a different angle or
+    thumbnail skip building and rasterizing the document entirely.
+
+    `max_concurrency` caps the number of renderings the asynchronous APIs run at once
+    in each event loop, and defaults to the number of available CPUs.
+
+    Prose is laid out across pages `page_width` points wide (8.5in by default) and
+    LETTER height, which are then stitched together. If `exact_height` is enabled,
+    prose is instead measured and laid out on a single page sized to fit it exactly,
+    avoiding rasterizing and collating multiple pages.
+
+    The `engine` controls how prose is rasterized. By default, it is rendered to a PDF
+    which is then rasterized by poppler. The "pillow" engine instead draws prose
+    directly onto a bitmap using Pillow, reusing ReportLab's line breaking and font
+    metrics; it always lays out prose on a single page, as if `exact_height` were
+    enabled, and is considerably faster for short prose.
+
+    Google Fonts families are cached in `font_cache`, which defaults to the
+    `STYLED_PROSE_FONT_CACHE` environment variable or `~/.cache/styled_prose_fonts`. If
+    `offline` is enabled, fonts are never downloaded and must already be cached, such
+    as by `python -m styled_prose prefetch`.
+
+    Every configured font family is registered during initialization unless
+    `lazy_fonts` is enabled, in which case the configuration is only validated and
+    each family is registered (and downloaded, if necessary) the first time a style
+    using it is rendered; see `warmup`. Families only referenced from within prose
+    markup aren't registered lazily, and must be warmed up explicitly.
+
+    Edits to the configuration stylesheet are picked up by calling `reload`, or
+    automatically by `watch`ing it.
+
+    Rather than a path, the configuration can also be provided already loaded, such as
+    by `from_toml` or `from_dict`, in which case local font files are relative to
+    `root` (by default, the working directory). Stylesheets and font registrations of
+    loaded configurations are cached by their contents, so any number of generators
+    sharing the same configuration share one compiled copy of it.
+
+    Font families are registered with ReportLab globally, under their configured names,
+    unless a `FontRegistry` is provided. Families are then registered under names
+    unique to their definitions, so that different stylesheets can give different
+    fonts the same name, and are unregistered once no generator uses them and the
+    registry exceeds its budget; see `close`.
+
+    If an `OutputStore` is provided, every deterministic rendering is stored there, so
+    that repeating it skips rendering entirely, even across processes. Renderings with
+    a thumbnail are only deterministic given an integer `seed`.
     """
 
-    def __init__(self, config: Path) -> None:
-        register_fonts(config)
-        self.stylesheet: StyleSheet = load_stylesheet(config)
+    def __init__(
+        self,
+        config: Union[Path, Dict[str, Any]],
+        in_memory: bool = False,
+        cache: Optional[RenderCache] = None,
+        max_concurrency: Optional[int] = None,
+        page_width: float = LETTER[0],
+        exact_height: bool = False,
+        engine: Literal["pdf", "pillow"] = "pdf",
+        rasterizer: Optional[Rasterizer] = None,
+        font_cache: Optional[Path] = None,
+        offline: bool = False,
+        lazy_fonts: bool = False,
+        root: Optional[Path] = None,
+        font_registry: Optional[FontRegistry] = None,
+        store: Optional[OutputStore] = None,
+    ) -> None:
+        if engine not in {"pdf", "pillow"}:
+            raise ValueError(
+                f"Unknown rendering engine '{engine}'. It must be 'pdf' or 'pillow'."
+            )
+
+        # the configuration file, unless the configuration was provided already loaded
+        self.config: Optional[Path] = None
+        # the configuration the stylesheet was built from, and a digest of the file's
+        # contents once it's been reloaded, so that reloads only rebuild what changed
+        self._config: Dict[str, Any]
+        self._config_digest: Optional[str] = None
+        self.root: Path
+        self.font_registry: Optional[FontRegistry] = font_registry
+        # the names font families are registered under, if not their own, and the
+        # families referenced in the font registry, which are released once closed
+        self._font_names: Dict[str, str] = {}
+        self._acquired: List[str] = []
+        self._finalizer: Optional[Callable[[], Any]] = None
+        if font_registry:
+            self._finalizer = weakref.finalize(
+                self, font_registry.release, self._acquired
+            )
+
+        if isinstance(config, dict):
+            self.root = Path(root or Path.cwd())
+            self._config = config
+        else:
+            self.config = config
+            self.root = Path(config).parent
+            self._config = spconfig.load_config(config)
+
+        if font_registry:
+            font_families: List[FontFamily] = load_font_families(self._config)
+            self._font_names = self._registered_names(font_families)
+            if not lazy_fonts:
+                self._acquired.extend(
+                    font_registry.acquire(font_families, self.root, font_cache, offline)
+                )
+        elif self.config:
+            register_fonts(self.config, font_cache, offline, lazy_fonts)
+        else:
+            register_config_fonts(
+                self._config, self.root, font_cache, offline, lazy_fonts
+            )
+
+        # the stylesheet as configured, before renaming its font families
+        self._styles: StyleSheet = (
+            load_stylesheet(self.config)
+            if self.config
+            else compile_stylesheet(self._config)
+        )
+        self.stylesheet: StyleSheet = rename_fonts(self._styles, self._font_names)
+
+        self.in_memory: bool = in_memory
+        self.cache: Optional[RenderCache] = cache
+        self.store: Optional[OutputStore] = store
+        self.max_concurrency: int = max_concurrency or os.cpu_count() or 1
+        # asyncio primitives belong to the loop they're first used in, so every loop
+        # limits its own renderings
+        self._semaphores: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, asyncio.Semaphore
+        ] = weakref.WeakKeyDictionary()
+        self.page_width: float = page_width
+        self.exact_height: bool = exact_height
+        self.engine: Literal["pdf", "pillow"] = engine
+        self.rasterizer: Rasterizer = rasterizer or PopplerRasterizer(in_memory)
+        self.font_cache: Optional[Path] = font_cache
+        self.offline: bool = offline
+        self.lazy_fonts: bool = lazy_fonts
+        # the font families registered so far, if they're registered lazily
+        self._fonts: Set[str] = set()
+        self._fonts_lock: threading.Lock = threading.Lock()
+        self._watcher: Optional[threading.Event] = None
+
+    def _options(self) -> Dict[str, Any]:
+        """The options needed to construct an equivalent generator elsewhere."""
+        return {
+            "in_memory": self.in_memory,
+            "page_width": self.page_width,
+            "exact_height": self.exact_height,
+            "engine": self.engine,
+            "rasterizer": self.rasterizer,
+            "font_cache": self.font_cache,
+            "offline": self.offline,
+            "lazy_fonts": self.lazy_fonts,
+            "root": self.root,
+            "font_registry": self.font_registry,
+            "store": self.store,
+        }
+
+    @classmethod
+    def from_toml(
+        cls, toml: str, root: Optional[Path] = None, **options: Any
+    ) -> StyledProseGenerator:
+        """
+        Create a generator from the contents of a TOML configuration, rather than a
+        path to one. Parsed configurations are cached by their contents. Local font
+        files are relative to `root`, and `options` are passed to the constructor.
+        """
+        return cls(spconfig.load_config_text(toml), root=root, **options)
+
+    @classmethod
+    def from_dict(
+        cls, config: Dict[str, Any], root: Optional[Path] = None, **options: Any
+    ) -> StyledProseGenerator:
+        """
+        Create a generator from an already loaded configuration, structured exactly
+        like a TOML configuration, which mustn't be modified afterwards. Local font
+        files are relative to `root`, and `options` are passed to the constructor.
+        """
+        return cls(config, root=root, **options)
+
+    def warmup(
+        self, styles: Optional[Iterable[str]] = None, fonts: Iterable[str] = ()
+    ) -> None:
+        """
+        Register the font families used by the given styles (by default, every style)
+        ahead of time, alongside any additional font families named in `fonts`. This
+        is only useful when `lazy_fonts` is enabled.
+        """
+        names: Iterable[str] = self.stylesheet.byName if styles is None else styles
+
+        self._register_fonts([self._resolve_style(style) for style in names], fonts)
+
+    def reload(self) -> bool:
+        """
+        Re-read the configuration stylesheet, rebuilding only the paragraph styles and
+        font families whose definitions changed, and swap the new stylesheet in. Any
+        renderings already in progress finish using the styles they started with,
+        though without a `font_registry`, a font family that changed is re-registered
+        under the same name, replacing it for every generator in the process. If the
+        configuration is invalid, an exception is raised and the current stylesheet is
+        kept. Returns whether the configuration changed.
+
+        The configuration, stylesheet, and font registrations cached by path are
+        invalidated, so generators created from the same path afterwards use the
+        configuration as it is now.
+        """
+        if not self.config:
+            raise ValueError("Only configurations loaded from a file can be reloaded.")
+
+        data: bytes = Path(self.config).read_bytes()
+        digest: str = hashlib.sha256(data).hexdigest()
+
+        with self._fonts_lock:
+            if digest == self._config_digest:
+                return False
+
+            # build everything before swapping anything in, so that an invalid
+            # configuration leaves the generator untouched
+            config: Dict[str, Any] = spconfig.parse_config(data)
+            font_families: List[FontFamily] = load_font_families(config)
+            font_names: Dict[str, str] = self._registered_names(font_families)
+            styles: StyleSheet = build_stylesheet(config, (self._config, self._styles))
+
+            previous: List[FontFamily] = load_font_families(self._config)
+            changed: List[FontFamily] = [
+                ff for ff in font_families if ff not in previous
+            ]
+            if not self.font_registry:
+                # families that changed keep their names, which reportlab would keep
+                # resolving to the old fonts, so those are unregistered first
+                for ff in changed:
+                    _unregister(ff.font_name, _registered(ff.font_name).fonts)
+            if self.lazy_fonts:
+                # families already in use are registered again right away, and the
+                # rest the next time they're used, like any other family
+                changed = [
+                    ff
+                    for ff in changed
+                    if font_names.get(ff.font_name, ff.font_name) in self._fonts
+                ]
+            if changed:
+                self._register_families(changed)
+
+            if self.font_registry:
+                # families that changed were registered under new names, so the old
+                # ones are no longer needed
+                stale: List[str] = [
+                    name for name in self._acquired if name not in font_names.values()
+                ]
+                for name in stale:
+                    self._acquired.remove(name)
+                self.font_registry.release(stale)
+
+            updated: bool = config != self._config
+            self._config = config
+            self._config_digest = digest
+            self._font_names = font_names
+            self._styles = styles
+            self.stylesheet = rename_fonts(styles, font_names)
+
+            # lru caches can't evict a single path
+            spconfig.load_config.cache_clear()
+            load_stylesheet.cache_clear()
+            register_fonts.cache_clear()
+
+        return updated
+
+    def watch(self, interval: float = 1.0) -> None:
+        """
+        Watch the configuration stylesheet in a background thread, checking its
+        modification time and size every `interval` seconds and `reload`ing it
+        whenever they change. Edits that leave it invalid are reported as warnings,
+        and the current stylesheet is kept until they're fixed.
+        """
+        if not self.config:
+            raise ValueError("Only configurations loaded from a file can be watched.")
+
+        self.unwatch()
+
+        self._watcher = threading.Event()
+        threading.Thread(
+            target=_watch_config,
+            args=(weakref.ref(self), self.config, self._watcher, interval),
+            name=f"styled-prose-watch-{self.config}",
+            daemon=True,
+        ).start()
+
+    def unwatch(self) -> None:
+        """Stop watching the configuration stylesheet, if it's being watched."""
+        if self._watcher:
+            self._watcher.set()
+            self._watcher = None
+
+    def close(self) -> None:
+        """
+        Stop watching the configuration stylesheet, and release every font family
+        referenced in the `font_registry`. This happens automatically once the
+        generator is garbage collected, and it mustn't be used afterwards.
+        """
+        self.unwatch()
+        if self._finalizer:
+            self._finalizer()
+
+    def _registered_names(self, font_families: List[FontFamily]) -> Dict[str, str]:
+        """The names the given font families are registered under, if not their own."""
+        if not self.font_registry:
+            return {}
+
+        return {
+            ff.font_name: self.font_registry.font_name(ff, self.root)
+            for ff in font_families
+        }
+
+    def _register_families(self, font_families: List[FontFamily]) -> None:
+        """Register the given font families, using the font registry if there is one."""
+        if self.font_registry:
+            self._acquired.extend(
+                self.font_registry.acquire(
+                    font_families, self.root, self.font_cache, self.offline
+                )
+            )
+        else:
+            register_families(font_families, self.root, self.font_cache, self.offline)
+
+    def _register_fonts(
+        self, styles: Iterable[RLPStyle], fonts: Iterable[str] = ()
+    ) -> None:
+        """
+        Lazily register the font families used by the given styles, and any others
+        named, that haven't been registered yet.
+        """
+        if not self.lazy_fonts:
+            return
+
+        # styles refer to font families by the names they're registered under
+        names: Set[str] = {self._font_names.get(font, font) for font in fonts}
+        for style in styles:
+            names.update((style.fontName, style.bulletFontName))
+
+        # registration is rare, so it's fine to block other renderings on it
+        with self._fonts_lock:
+            missing: Set[str] = names - self._fonts
+            if missing:
+                self._register_families(
+                    [
+                        ff
+                        for ff in load_font_families(self._config)
+                        if self._font_names.get(ff.font_name, ff.font_name) in missing
+                    ]
+                )
+                self._fonts |= missing
+
+    def _rasterize(
+        self,
+        pdf: bytes,
+        first_page: int,
+        last_page: int,
+        dpi: int = DPI,
+        mode: Literal["RGB", "L"] = "RGB",
+    ) -> Iterable[Image.Image]:
+        """Rasterize the requested pages of the provided PDF, in order."""
+        return self.rasterizer.rasterize(pdf, first_page, last_page, dpi, mode)
+
+    def _bitmap_mode(
+        self, style: RLPStyle, mode: Literal["RGB", "L", "1"]
+    ) -> Literal["RGB", "L"]:
+        """
+        Determine the mode bitmaps are rasterized and processed in. Grayscale is only
+        faithful to prose whose style is colored a neutral gray, and bilevel images are
+        thresholded from it at the very end.
+        """
+        if mode != "RGB" and _is_neutral(style):
+            return "L"
+
+        return "RGB"
+
+    def _resolve_style(self, style: str) -> RLPStyle:
+        """Look up the paragraph style with the given name in the current stylesheet."""
+        stylesheet: StyleSheet = self.stylesheet
+        if style not in stylesheet:
+            raise ValueError(
+                f"Could not find a prose style named '{style}'. Does it exist?"
+            )
+
+        return stylesheet[style]
+
+    def _validate(
+        self,
+        style: str,
+        dpi: Union[int, Literal["auto"]],
+        mode: Literal["RGB", "L", "1"],
+    ) -> None:
+        """Validate the arguments of a rendering before starting it."""
+        self._resolve_style(style)
+
+        if dpi != "auto" and (not isinstance(dpi, int) or dpi <= 0):
+            raise ValueError(
+                f"Invalid resolution '{dpi}'. It must be a positive integer or 'auto'."
+            )
+
+        if mode not in {"RGB", "L", "1"}:
+            raise ValueError(
+                f"Unknown image mode '{mode}'. It must be 'RGB', 'L', or '1'."
+            )
 
     def create_jpg(
         self,
@@ -41,6 +1553,9 @@ class StyledProseGenerator:
         thumbnail: Optional[Tuple[int, int]] = None,
         prescale_thumbnail: bool = True,
         comparative_font_size: float = 6.0,
+        dpi: Union[int, Literal["auto"]] = DPI,
+        mode: Literal["RGB", "L", "1"] = "RGB",
+        seed: Optional[Union[int, random.Random]] = None,
     ) -> Image.Image:
         """
         Converts the provided prose into an stylized image.
@@ -51,7 +1566,9 @@ class StyledProseGenerator:
         If an angle is provided, that angle is applied to the stylized prose rendering.
 
         If thumbnail dimensions are provided, the rendering is cropped after the
-        previous steps.
+        previous steps. When no angle is provided, the thumbnail window of multi-page
+        prose is picked from the bounds of its laid out lines, rather than its trimmed
+        rendering, so that only the pages it overlaps are ever rasterized.
 
         The `prescale_thumbnail` and `comparative_font_size` parameters control the
         thumbnail cropping behavior; if enabled, to aesthetically accommodate various
@@ -59,96 +1576,635 @@ class StyledProseGenerator:
         of text in the same area if the prose were rendered using the provided
         `comparative_font_size`. The defaults produce a thumbnail with a text density
         similar to 6pt EB Garamond text inside a 210x210 square. The intermediate
-        thumbnail is always scaled to the requested thumbnail dimensions using the
-        Lanczos algorithm before being returned.
+        thumbnail is scaled to the requested thumbnail dimensions using the Lanczos
+        algorithm before being returned, unless it already matches them.
+
+        Prose is rasterized at `dpi`, 200 by default. If "auto", the lowest resolution
+        that still produces the requested thumbnail at the `comparative_font_size`
+        density is picked instead (never exceeding the default), so that less is
+        rasterized and little to no scaling is needed afterwards.
+
+        The `mode` of the returned image is RGB by default. If "L" (grayscale) or "1"
+        (bilevel), poppler is asked for grayscale output and every step works on a
+        single channel, as long as the style's font color is a neutral gray; otherwise,
+        prose is rendered in RGB regardless. Bilevel images are thresholded from
+        grayscale as the very last step.
+
+        Thumbnail windows are picked using the global random number generator, unless
+        a `seed` is provided, in which case they're picked using a `random.Random`
+        seeded with it (or the provided `random.Random` itself). Given the same integer
+        seed, the same prose always produces the same thumbnail.
         """
-        if style not in self.stylesheet:
-            raise ValueError(
-                f"Could not find a prose style named '{style}'. Does it exist?"
-            )
+        self._validate(style, dpi, mode)
 
-        with TemporaryDirectory() as tmpdir:
-            # construct the PDF
-            filename: Path = Path(tmpdir) / f"{uuid4()}.pdf"
-            document: SimpleDocTemplate = SimpleDocTemplate(
-                str(filename),
-                leftMargin=0,
-                topMargin=0,
-                rightMargin=0,
-                bottomMargin=0,
-                pagesize=LETTER,
-            )
-            raw_prose: str = prose.replace("\r", "").replace("\n", "<br />")
-            document.build([Paragraph(raw_prose, self.stylesheet[style])])
-
-            # convert the PDF to a series of images
-            images: List[Image.Image] = convert_from_path(
-                filename,
-                thread_count=min(4, os.cpu_count() or 1),
-                use_pdftocairo=True,
-                fmt="jpeg",
+        steps: Generator[
+            _PageRequest, Iterable[Image.Image], Image.Image
+        ] = self._render(
+            prose,
+            style,
+            angle,
+            thumbnail,
+            prescale_thumbnail,
+            comparative_font_size,
+            dpi,
+            mode,
+            seed,
+        )
+        request, output = _advance(steps, None)
+        while request:
+            request, output = _advance(steps, self._rasterize(*request))
+
+        assert output
+        return output
+
+    def render(
+        self,
+        prose: str,
+        style: str = "default",
+        dpi: Union[int, Literal["auto"]] = DPI,
+        mode: Literal["RGB", "L", "1"] = "RGB",
+    ) -> RenderedProse:
+        """
+        Render the provided prose once, returning a `RenderedProse` from which any
+        number of rotated images and thumbnails can be derived, rather than building
+        and rasterizing the document again for each of them. The `dpi` and `mode`
+        arguments behave like they do for `create_jpg`, though since thumbnails are
+        only derived afterwards, an "auto" resolution is picked as if there were none.
+
+        When using a `RenderCache`, the rendering is shared with `create_jpg` calls
+        for the same prose, style, and resolution.
+        """
+        self._validate(style, dpi, mode)
+        paragraph_style: RLPStyle = self._resolve_style(style)
+        self._register_fonts((paragraph_style,))
+        bitmap_mode: Literal["RGB", "L"] = self._bitmap_mode(paragraph_style, mode)
+        # without a thumbnail, automatically picked resolutions are the default one
+        resolution: int = dpi if isinstance(dpi, int) else DPI
+
+        key: str = ""
+        entry: Optional[Tuple[Image.Image, Any]] = None
+        if self.cache:
+            key = self._cache_key(prose, paragraph_style, str(resolution), bitmap_mode)
+            entry = self.cache.get(key)
+
+        collated: Image.Image
+        layout: _Layout
+        if entry:
+            collated = entry[0]
+            layout = _Layout.from_metadata(entry[1])
+        else:
+            if self.engine == "pillow":
+                paragraph, layout = _measure_document(
+                    prose, paragraph_style, self.page_width, resolution
+                )
+                collated = _draw_document(paragraph, layout, bitmap_mode)
+            else:
+                pdf, layout = _build_document(
+                    prose,
+                    paragraph_style,
+                    self.page_width,
+                    self.exact_height,
+                    resolution,
+                )
+                collated = _collate(
+                    self._rasterize(pdf, 1, layout.pages, resolution, bitmap_mode),
+                    layout.pages,
+                    bitmap_mode,
+                )
+
+            if self.cache:
+                self.cache.put(key, collated, layout)
+
+        return RenderedProse(
+            self,
+            collated,
+            paragraph_style,
+            resolution,
+            mode,
+            layout.line_pixels() if layout.pages > 1 else None,
+        )
+
+    def iter_pages(
+        self,
+        prose: str,
+        style: str = "default",
+        dpi: Union[int, Literal["auto"]] = DPI,
+        mode: Literal["RGB", "L", "1"] = "RGB",
+    ) -> Iterator[Image.Image]:
+        """
+        Render the provided prose, yielding each page as soon as it is rasterized
+        rather than collating them. Pages are neither trimmed nor rotated, and only a
+        handful are ever held in memory at once, which makes this suitable for
+        book-length prose. The `dpi` and `mode` arguments behave like they do for
+        `create_jpg` without a thumbnail, so an "auto" resolution is the default one.
+
+        With the "pillow" engine, prose is always drawn onto a single page.
+        """
+        self._validate(style, dpi, mode)
+        paragraph_style: RLPStyle = self._resolve_style(style)
+        self._register_fonts((paragraph_style,))
+        bitmap_mode: Literal["RGB", "L"] = self._bitmap_mode(paragraph_style, mode)
+        resolution: int = dpi if isinstance(dpi, int) else DPI
+
+        pages: Iterable[Image.Image]
+        if self.engine == "pillow":
+            paragraph, layout = _measure_document(
+                prose, paragraph_style, self.page_width, resolution
+            )
+            pages = [_draw_document(paragraph, layout, bitmap_mode)]
+        else:
+            pdf, layout = _build_document(
+                prose, paragraph_style, self.page_width, self.exact_height, resolution
             )
+            pages = self._rasterize(pdf, 1, layout.pages, resolution, bitmap_mode)
+
+        for page in pages:
+            if page.mode != bitmap_mode:
+                page = page.convert(bitmap_mode)
+            if mode == "1" and bitmap_mode == "L":
+                page = page.convert("1", dither=Image.Dither.NONE)
 
-        # collate the images into a single long one
-        width: int = images[0].size[0]
-        height: int = images[0].size[1]
-        total_height: int = height * len(images)
-        output: Image.Image = Image.new("RGB", (width, total_height))
-        for page, im in enumerate(images):
-            output.paste(im, (0, page * height))
+            yield page
 
-        white: Tuple[int, int, int] = (255, 255, 255)
-        if angle:
-            # if an angle is supplied, rotate the image while expanding the dimensions
-            # to accommodate
-            output = output.rotate(
+    async def acreate_jpg(
+        self,
+        prose: str,
+        style: str = "default",
+        angle: float = 0,
+        thumbnail: Optional[Tuple[int, int]] = None,
+        prescale_thumbnail: bool = True,
+        comparative_font_size: float = 6.0,
+        dpi: Union[int, Literal["auto"]] = DPI,
+        mode: Literal["RGB", "L", "1"] = "RGB",
+        seed: Optional[Union[int, random.Random]] = None,
+    ) -> Image.Image:
+        """
+        The asynchronous equivalent of `create_jpg`, accepting the same arguments.
+
+        Poppler is driven using asyncio subprocesses (always piping documents to it in
+        memory), while document layout and bitmap processing run in the event loop's
+        default executor. Any other `Rasterizer` runs in that executor as well. At most
+        `max_concurrency` renderings run at once per generator and event loop; any
+        others wait their turn.
+        """
+        import asyncio
+
+        self._validate(style, dpi, mode)
+
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        semaphore: Optional[asyncio.Semaphore] = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+
+        async with semaphore:
+            steps: Generator[
+                _PageRequest, Iterable[Image.Image], Image.Image
+            ] = self._render(
+                prose,
+                style,
                 angle,
-                resample=Image.Resampling.NEAREST,
-                fillcolor=white,
-                expand=True,
+                thumbnail,
+                prescale_thumbnail,
+                comparative_font_size,
+                dpi,
+                mode,
+                seed,
             )
+            request, output = await loop.run_in_executor(None, _advance, steps, None)
+            while request:
+                images: List[Image.Image]
+                if isinstance(self.rasterizer, PopplerRasterizer):
+                    images = await _arasterize_pdf_bytes(*request)
+                else:
+                    images = await loop.run_in_executor(
+                        None, _rasterize_all, self.rasterizer, request
+                    )
+                request, output = await loop.run_in_executor(
+                    None, _advance, steps, images
+                )
 
-        # trim the whitespace around the image
-        mask: Image.Image = Image.new(output.mode, output.size, white)
-        diff: Image.Image = ImageChops.difference(output, mask)
-        bbox: Optional[Tuple[int, int, int, int]] = diff.getbbox()
-        if bbox:
-            output = output.crop(bbox)
+        assert output
+        return output
 
-        if thumbnail:
-            # produce a thumbnail for the image
-            dims: Tuple[int, int] = output.size
-            scale: float = 1
+    async def acreate_jpg_many(
+        self, specs: Iterable[RenderSpec], ordered: bool = True
+    ) -> AsyncIterator[Tuple[int, Image.Image]]:
+        """
+        The asynchronous equivalent of `create_jpg_many`, rendering every `RenderSpec`
+        using `acreate_jpg` and yielding each rendering alongside the index of the spec
+        that produced it.
+
+        Specs are consumed lazily, with at most `max_concurrency` renderings in flight
+        at once. Renderings are yielded in the order of `specs` unless `ordered` is
+        disabled, in which case they are yielded as soon as they complete.
+        """
+        import asyncio
+
+        tasks: Dict[asyncio.Task[Image.Image], int] = {}
 
-            if prescale_thumbnail:
-                # to try and aesthetically accommodate various font sizes, we first
-                # calculate a scaling ratio to alter the image's final "text density";
-                # the optimal text density was subjectively picked to, visually, match
-                # 6pt EB Garamond font within a 210x210 square.
-                font_ratio: float = (
-                    self.stylesheet[style].fontSize / comparative_font_size
+        def submit(index: int, spec: RenderSpec) -> None:
+            tasks[asyncio.ensure_future(self.acreate_jpg(**spec._asdict()))] = index
+
+        async def collect() -> AsyncIterator[Tuple[int, Image.Image]]:
+            done: Set[asyncio.Task[Image.Image]]
+            if ordered:
+                done = {next(iter(tasks))}
+                await asyncio.wait(done)
+            else:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                yield tasks.pop(task), task.result()
+
+        try:
+            for index, spec in enumerate(specs):
+                submit(index, spec)
+                while len(tasks) >= self.max_concurrency:
+                    async for result in collect():
+                        yield result
+
+            while tasks:
+                async for result in collect():
+                    yield result
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _render(
+        self,
+        prose: str,
+        style: str,
+        angle: float,
+        thumbnail: Optional[Tuple[int, int]],
+        prescale_thumbnail: bool,
+        comparative_font_size: float,
+        dpi: Union[int, Literal["auto"]] = DPI,
+        mode: Literal["RGB", "L", "1"] = "RGB",
+        seed: Optional[Union[int, random.Random]] = None,
+    ) -> Generator[_PageRequest, Iterable[Image.Image], Image.Image]:
+        """
+        Render the provided prose, yielding a `_PageRequest` whenever pages need to be
+        rasterized and expecting the resulting images (in order, possibly lazily) to be
+        sent back. This keeps the rendering pipeline independent of how (or whether
+        synchronously) poppler is driven.
+        """
+        # the style is resolved once, so that a concurrent `reload` can't change it
+        # partway through rendering
+        paragraph_style: RLPStyle = self._resolve_style(style)
+        self._register_fonts((paragraph_style,))
+
+        pdf: bytes = b""
+        request: _PageRequest
+        layout: _Layout
+        collated: Optional[Image.Image] = None
+        output: Image.Image
+
+        # automatically picked resolutions never exceed the default one, so prose is
+        # laid out for it until the actual resolution is known
+        layout_dpi: int = dpi if isinstance(dpi, int) else DPI
+        bitmap_mode: Literal["RGB", "L"] = self._bitmap_mode(paragraph_style, mode)
+
+        rng: Optional[random.Random] = (
+            random.Random(seed) if isinstance(seed, int) else seed
+        )
+        output_key: Optional[str] = None
+        if self.store:
+            output_key = self._output_key(
+                prose,
+                paragraph_style,
+                angle,
+                thumbnail,
+                prescale_thumbnail,
+                comparative_font_size,
+                dpi,
+                mode,
+                seed,
+            )
+            stored: Optional[Image.Image] = (
+                self.store.get(output_key) if output_key else None
+            )
+            if stored is not None:
+                return stored
+
+        key: str = ""
+        entry: Optional[Tuple[Image.Image, Any]] = None
+        if self.cache:
+            # automatically picked resolutions depend on the thumbnail, so renderings
+            # at them can only be shared by calls with the same one
+            resolution: str = str(dpi)
+            if dpi == "auto":
+                resolution += f"{thumbnail}{prescale_thumbnail}{comparative_font_size}"
+            key = self._cache_key(prose, paragraph_style, resolution, bitmap_mode)
+            entry = self.cache.get(key)
+
+        if entry:
+            collated = entry[0]
+            layout = _Layout.from_metadata(entry[1])
+        else:
+            paragraph: Optional[Paragraph] = None
+            if self.engine == "pillow":
+                paragraph, layout = _measure_document(
+                    prose, paragraph_style, self.page_width, layout_dpi
                 )
-                scale = min(
-                    font_ratio,
-                    dims[0] / thumbnail[0],
-                    dims[1] / thumbnail[1],
+            else:
+                pdf, layout = _build_document(
+                    prose,
+                    paragraph_style,
+                    self.page_width,
+                    self.exact_height,
+                    layout_dpi,
+                )
+
+            if dpi == "auto":
+                layout = layout._replace(
+                    dpi=self._auto_dpi(
+                        layout,
+                        paragraph_style,
+                        thumbnail,
+                        prescale_thumbnail,
+                        comparative_font_size,
+                    )
                 )
 
-            # crop the image to match the desired thumbnail
-            scaled_tw, scaled_th = (
-                int(thumbnail[0] * scale),
-                int(thumbnail[1] * scale),
+            if paragraph:
+                collated = _draw_document(paragraph, layout, bitmap_mode)
+            elif self.cache:
+                request = _PageRequest(pdf, 1, layout.pages, layout.dpi, bitmap_mode)
+                collated = _collate((yield request), request.pages, bitmap_mode)
+
+            if self.cache:
+                assert collated is not None
+                self.cache.put(key, collated, layout)
+
+        lines: Optional[Tuple[int, int, int, int]] = (
+            layout.line_pixels() if layout.pages > 1 else None
+        )
+        if thumbnail and not angle and lines:
+            # if we only need an unrotated thumbnail of multi-page prose, choose its
+            # window from the laid out lines, and only rasterize the pages it overlaps
+            left, top, right, bottom = lines
+            x, y, w, h = self._thumbnail_window(
+                (right - left, bottom - top),
+                paragraph_style,
+                thumbnail,
+                prescale_thumbnail,
+                comparative_font_size,
+                layout.dpi,
+                rng,
             )
-            x: int = randint(0, dims[0] - scaled_tw)
-            y: int = randint(0, dims[1] - scaled_th)
-            output = output.crop((x, y, x + scaled_tw, y + scaled_th))
+            x, y = x + left, y + top
 
-            if prescale_thumbnail:
-                # if we scaled it before cropping, we need to scale it back to the
-                # dimensions that were requested
-                output = output.filter(ImageFilter.SHARPEN)
-                output = output.resize(
-                    thumbnail, resample=Image.Resampling.LANCZOS, reducing_gap=2.0
+            if collated is not None:
+                output = collated
+            else:
+                page_height: int = layout.to_pixels(layout.page_size[1])
+                first_page: int = y // page_height
+                last_page: int = (y + h - 1) // page_height
+                request = _PageRequest(
+                    pdf, first_page + 1, last_page + 1, layout.dpi, bitmap_mode
                 )
+                output = _collate((yield request), request.pages, bitmap_mode)
+                y -= first_page * page_height
+
+            output = _crop(output, (x, y, x + w, y + h))
+        else:
+            if collated is not None:
+                output = collated
+            else:
+                request = _PageRequest(pdf, 1, layout.pages, layout.dpi, bitmap_mode)
+                output = _collate((yield request), request.pages, bitmap_mode)
+
+            rotation: Optional[Tuple[List[float], Tuple[int, int]]] = None
+            bbox: Optional[Tuple[int, int, int, int]] = None
+            if thumbnail and angle:
+                rotation = _rotation(output.size, angle)
+                if rotation:
+                    bbox = _rotated_ink_bbox(output, *rotation)
+
+            if thumbnail and rotation and bbox:
+                # if both an angle and a thumbnail are supplied, choose the window from
+                # the rotated bounds of the prose, and only rotate what's inside it
+                left, top, right, bottom = bbox
+                x, y, w, h = self._thumbnail_window(
+                    (right - left, bottom - top),
+                    paragraph_style,
+                    thumbnail,
+                    prescale_thumbnail,
+                    comparative_font_size,
+                    layout.dpi,
+                    rng,
+                )
+                output = _rotate_region(
+                    output, rotation[0], (left + x, top + y, left + x + w, top + y + h)
+                )
+            else:
+                if angle:
+                    # if an angle is supplied, rotate the image while expanding the
+                    # dimensions to accommodate
+                    output = output.rotate(
+                        angle,
+                        resample=Image.Resampling.NEAREST,
+                        fillcolor="white",
+                        expand=True,
+                    )
+
+                # trim the whitespace around the image
+                bbox = _ink_bbox(output)
+                # never hand back the cached bitmap itself, even if there's nothing to
+                # trim
+                output = _crop(output, bbox) if bbox else output.copy()
+
+                if thumbnail:
+                    # crop the image to match the desired thumbnail
+                    x, y, w, h = self._thumbnail_window(
+                        output.size,
+                        paragraph_style,
+                        thumbnail,
+                        prescale_thumbnail,
+                        comparative_font_size,
+                        layout.dpi,
+                        rng,
+                    )
+                    output = _crop(output, (x, y, x + w, y + h))
+
+        # automatically picked resolutions usually produce a thumbnail window that's
+        # already the right size, so there's nothing to scale back
+        rescale: bool = bool(
+            thumbnail
+            and prescale_thumbnail
+            and not (dpi == "auto" and output.size == tuple(thumbnail))
+        )
+        output = _finish(output, thumbnail if rescale else None, mode)
+
+        if self.store and output_key:
+            self.store.put(output_key, output)
 
         return output
+
+    def _output_key(
+        self,
+        prose: str,
+        style: RLPStyle,
+        angle: float,
+        thumbnail: Optional[Tuple[int, int]],
+        prescale_thumbnail: bool,
+        comparative_font_size: float,
+        dpi: Union[int, Literal["auto"]],
+        mode: Literal["RGB", "L", "1"],
+        seed: Optional[Union[int, random.Random]],
+    ) -> Optional[str]:
+        """
+        The key the finished rendering of the given arguments is stored under, or None
+        if it isn't deterministic, which is the case for thumbnails without an integer
+        seed.
+        """
+        window: str = ""
+        if thumbnail:
+            if not isinstance(seed, int):
+                return None
+            window = (
+                f"{tuple(thumbnail)}\0{prescale_thumbnail}"
+                f"\0{comparative_font_size}\0{seed}"
+            )
+
+        # the mode that bitmaps are processed in follows from the style and the
+        # requested mode, so only the latter is part of the key
+        return hashlib.sha256(
+            f"{self._cache_key(prose, style, str(dpi), 'RGB')}\0{mode}"
+            f"\0{type(self.rasterizer).__name__}\0{float(angle)!r}\0{window}".encode()
+        ).hexdigest()
+
+    def _cache_key(
+        self,
+        prose: str,
+        style: RLPStyle,
+        resolution: str,
+        bitmap_mode: Literal["RGB", "L"],
+    ) -> str:
+        """
+        The key the collated rendering of the given prose is cached under. It only
+        depends on the prose, resolved style, and resolution, so it can be shared
+        across calls with different angles and thumbnails.
+        """
+        return hashlib.sha256(
+            f"{_style_digest(style, self._font_names)}\0{self.engine}"
+            f"\0{self.page_width}\0{self.exact_height}\0{resolution}"
+            f"\0{bitmap_mode}\0{prose}".encode()
+        ).hexdigest()
+
+    def _thumbnail_window(
+        self,
+        dims: Tuple[int, int],
+        style: RLPStyle,
+        thumbnail: Tuple[int, int],
+        prescale_thumbnail: bool,
+        comparative_font_size: float,
+        dpi: int = DPI,
+        rng: Optional[random.Random] = None,
+    ) -> Tuple[int, int, int, int]:
+        """
+        Pick a random (x, y, width, height) thumbnail window within an image of the
+        given dimensions, rasterized at the given resolution. The window is picked
+        using `rng` if provided, or the global random number generator otherwise.
+        """
+        scale: float = 1
+
+        if prescale_thumbnail:
+            # to try and aesthetically accommodate various font sizes, we first
+            # calculate a scaling ratio to alter the image's final "text density";
+            # the optimal text density was subjectively picked to, visually, match
+            # 6pt EB Garamond font within a 210x210 square.
+            font_ratio: float = style.fontSize / comparative_font_size * dpi / DPI
+            scale = min(
+                font_ratio,
+                dims[0] / thumbnail[0],
+                dims[1] / thumbnail[1],
+            )
+
+        scaled_tw, scaled_th = (
+            int(thumbnail[0] * scale),
+            int(thumbnail[1] * scale),
+        )
+        randint: Callable[[int, int], int] = rng.randint if rng else random.randint
+        x: int = randint(0, dims[0] - scaled_tw)
+        y: int = randint(0, dims[1] - scaled_th)
+        return x, y, scaled_tw, scaled_th
+
+    def _auto_dpi(
+        self,
+        layout: _Layout,
+        style: RLPStyle,
+        thumbnail: Optional[Tuple[int, int]],
+        prescale_thumbnail: bool,
+        comparative_font_size: float,
+    ) -> int:
+        """
+        Pick the lowest resolution at which a prescaled thumbnail window is no larger
+        than the thumbnail itself, while the laid out prose is still large enough to
+        contain it. It never exceeds the default resolution.
+        """
+        if not (thumbnail and prescale_thumbnail):
+            # thumbnails that aren't prescaled are cropped at a fixed size in pixels, so
+            # changing the resolution would change their text density
+            return DPI
+
+        left, top, right, bottom = layout.content_box
+        dpi: float = max(
+            DPI * comparative_font_size / style.fontSize,
+            thumbnail[0] * 72 / (right - left),
+            thumbnail[1] * 72 / (bottom - top),
+        )
+        return max(1, min(DPI, math.ceil(dpi)))
+
+    def create_jpg_many(
+        self,
+        specs: Iterable[RenderSpec],
+        max_workers: Optional[int] = None,
+        chunksize: int = 1,
+        max_in_flight: Optional[int] = None,
+        ordered: bool = True,
+    ) -> Iterator[Tuple[int, Image.Image]]:
+        """
+        Render many `RenderSpec`s across a pool of worker processes, yielding each
+        rendering alongside the index of the spec that produced it.
+
+        Every worker registers fonts and loads the stylesheet once on startup, and then
+        renders specs `chunksize` at a time. Specs are consumed lazily, and at most
+        `max_in_flight` chunks (by default, twice the number of workers) are submitted
+        or awaiting collection at once, keeping memory bounded regardless of the number
+        of specs. Renderings are yielded in the order of `specs` unless `ordered` is
+        disabled, in which case they are yielded as soon as they complete.
+
+        When using a `RenderCache`, workers only share its on-disk tier.
+        """
+        workers: int = max_workers or os.cpu_count() or 1
+        in_flight: int = max_in_flight or 2 * workers
+        cache_options: Optional[Dict[str, Any]] = None
+        if self.cache and self.cache.directory:
+            cache_options = {
+                "max_bytes": self.cache.max_bytes,
+                "directory": self.cache.directory,
+                "max_disk_bytes": self.cache.max_disk_bytes,
+            }
+
+        # futures are kept in submission order, so the oldest is always first
+        futures: Dict[Future[List[Image.Image]], int] = {}
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(self._config, self._options(), cache_options),
+        ) as pool:
+            try:
+                for start, chunk in _chunked(iter(specs), chunksize):
+                    futures[pool.submit(_render_chunk, chunk)] = start
+
+                    while len(futures) >= in_flight:
+                        yield from _collect(futures, ordered)
+
+                while futures:
+                    yield from _collect(futures, ordered)
+            finally:
+                # if the caller stops iterating early or a rendering fails, don't
+                # bother finishing whatever is still queued
+                for future in futures:
+                    future.cancel()
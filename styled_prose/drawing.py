@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import math
+import re
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+from PIL import Image, ImageDraw, ImageFont
+from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_RIGHT
+from reportlab.pdfbase import pdfmetrics
+from reportlab.platypus.paragraph import _usConv
+
+from . import config as spconfig
+
+if TYPE_CHECKING:
+    from typing import Any, Dict, Iterator, List, Literal, Optional, Tuple, Union
+
+    from reportlab.platypus import Paragraph
+
+
+def _load_font(font_name: str, size: float) -> ImageFont.FreeTypeFont:
+    """
+    Load the font file backing a font registered with ReportLab, at the given pixel
+    size. Registered TrueType fonts point to their files directly, while ReportLab's
+    standard fonts are backed by the Type 1 files it bundles.
+    """
+    face: Any = pdfmetrics.getFont(font_name).face
+    filename: Any = getattr(face, "filename", None)
+    # loaded fonts are cached by file rather than by name, since a name can be
+    # registered again using a different file
+    return _truetype(str(filename) if filename else _t1_file(face.name), size)
+
+
+@lru_cache(maxsize=spconfig.CACHE_SIZE)
+def _t1_file(face_name: str) -> str:
+    """Find the Type 1 file backing one of ReportLab's standard faces."""
+    path: str = pdfmetrics.getTypeFace(face_name).findT1File()
+    return path
+
+
+@lru_cache(maxsize=spconfig.CACHE_SIZE)
+def _truetype(filename: str, size: float) -> ImageFont.FreeTypeFont:
+    """Load a font file at the given pixel size."""
+    # fractional sizes are supported by Pillow, even though its annotations disagree
+    return ImageFont.truetype(filename, size)  # type: ignore[arg-type]
+
+
+def _color(color: Any, mode: Literal["RGB", "L"]) -> Union[int, Tuple[int, int, int]]:
+    """
+    Convert a ReportLab color into an RGB tuple, or its luminance if drawing in
+    grayscale (weighted the same way Pillow converts RGB images to grayscale).
+    """
+    red, green, blue = (int(round(channel * 255)) for channel in color.rgb())
+    if mode == "L":
+        return (red * 299 + green * 587 + blue * 114) // 1000
+
+    return red, green, blue
+
+
+def _lines(paragraph: Paragraph) -> Iterator[Tuple[List[Any], float, float, bool]]:
+    """
+    Iterate through the lines of a wrapped paragraph, yielding the fragments of text
+    on each alongside its font size, unused horizontal space, and whether the line
+    ends a paragraph (or an explicit line break).
+    """
+    bl_para: Any = paragraph.blPara
+    last: int = len(bl_para.lines) - 1
+
+    for i, line in enumerate(bl_para.lines):
+        if bl_para.kind == 0:
+            # simple paragraphs share a single style, and only track their words
+            extra_space, words = line
+            fragment: Any = bl_para.clone(text=" ".join(words))
+            yield [fragment], bl_para.fontSize, extra_space, i == last
+        else:
+            yield (
+                [word for word in line.words if getattr(word, "text", "")],
+                line.fontSize,
+                line.extraSpace,
+                i == last or bool(getattr(line, "lineBreak", False)),
+            )
+
+
+def line_bounds(
+    paragraph: Paragraph,
+) -> Optional[Tuple[float, float, float, float]]:
+    """
+    Measure the (left, top, right, bottom) bounds of the lines of a wrapped paragraph,
+    in points from its top left corner, or None if it has no text. Each line spans
+    from where it starts to the end of its last word, and from the ascent of its
+    fonts down to their descent, as positioned by ReportLab.
+    """
+    style: Any = paragraph.style
+    bounds: Optional[Tuple[float, float, float, float]] = None
+
+    baseline: float = 0
+    for i, (fragments, font_size, extra_space, last) in enumerate(_lines(paragraph)):
+        baseline += font_size if i == 0 else style.leading
+        if not any(fragment.text.strip() for fragment in fragments):
+            continue
+
+        left: float = style.leftIndent + (style.firstLineIndent if i == 0 else 0)
+        right: float = paragraph.width - style.rightIndent
+        if style.alignment == TA_CENTER:
+            left, right = left + extra_space / 2, right - extra_space / 2
+        elif style.alignment == TA_RIGHT:
+            left += extra_space
+        elif style.alignment != TA_JUSTIFY or last:
+            right -= extra_space
+
+        top: float = math.inf
+        bottom: float = -math.inf
+        for fragment in fragments:
+            ascent, descent = pdfmetrics.getAscentDescent(
+                fragment.fontName, fragment.fontSize
+            )
+            y: float = baseline - getattr(fragment, "rise", 0)
+            top, bottom = min(top, y - ascent), max(bottom, y - descent)
+
+        if bounds:
+            bounds = (
+                min(bounds[0], left),
+                bounds[1],
+                max(bounds[2], right),
+                bottom,
+            )
+        else:
+            bounds = (left, top, right, bottom)
+
+    return bounds
+
+
+def draw_paragraph(
+    paragraph: Paragraph,
+    page_size: Tuple[float, float],
+    padding: float,
+    dpi: int,
+    mode: Literal["RGB", "L"] = "RGB",
+) -> Image.Image:
+    """
+    Draw a paragraph, previously wrapped by ReportLab, directly onto a page-sized
+    bitmap using Pillow. Line breaking, alignment, and fragment positions all come from
+    ReportLab's own layout and metrics, so the result closely mirrors what poppler
+    would rasterize from the equivalent PDF. The bitmap is either RGB or grayscale,
+    depending on the `mode`.
+    """
+    scale: float = dpi / 72
+    image: Image.Image = Image.new(
+        mode,
+        (math.ceil(page_size[0] * scale), math.ceil(page_size[1] * scale)),
+        "white",
+    )
+    draw: ImageDraw.ImageDraw = ImageDraw.Draw(image)
+    style: Any = paragraph.style
+
+    baseline: float = padding
+    for i, (fragments, font_size, extra_space, last) in enumerate(_lines(paragraph)):
+        # the first baseline sits a font size below the top of the paragraph, and
+        # every subsequent one a leading below the one before it
+        baseline += font_size if i == 0 else style.leading
+
+        x: float = padding + style.leftIndent
+        if i == 0:
+            x += style.firstLineIndent
+
+        word_space: float = 0
+        if style.alignment == TA_CENTER:
+            x += extra_space / 2
+        elif style.alignment == TA_RIGHT:
+            x += extra_space
+        elif style.alignment == TA_JUSTIFY and not last and extra_space > 1e-8:
+            spaces: int = sum(fragment.text.count(" ") for fragment in fragments)
+            word_space = extra_space / spaces if spaces else 0
+
+        for fragment in fragments:
+            font: ImageFont.FreeTypeFont = _load_font(
+                fragment.fontName, fragment.fontSize * scale
+            )
+            color: Union[int, Tuple[int, int, int]] = _color(fragment.textColor, mode)
+            y: float = baseline - getattr(fragment, "rise", 0)
+            start: float = x
+
+            # draw word by word, using ReportLab's metrics to position each one so
+            # that the layout matches the PDF exactly
+            for word in re.split("( )", fragment.text):
+                if word == " ":
+                    x += word_space
+                elif word:
+                    draw.text(
+                        (x * scale, y * scale),
+                        word,
+                        font=font,
+                        fill=color,
+                        anchor="ls",
+                    )
+
+                x += pdfmetrics.stringWidth(word, fragment.fontName, fragment.fontSize)
+
+            for _, kind, line_color, width, offset, rise, count, gap in getattr(
+                fragment, "us_lines", []
+            ):
+                # underlines and strikethroughs, as ReportLab would draw them
+                underline: bool = kind == "underline"
+                values: Dict[str, float] = {
+                    "L": fragment.fontSize,
+                    "F": fragment.fontSize,
+                    "f": fragment.fontSize,
+                }
+                line_width: float = _usConv(width, values, default=1)
+                line_gap: float = _usConv(gap, values, default=1)
+                line_y: float = (
+                    y
+                    - rise
+                    - _usConv(offset or ("-0.125*L" if underline else "0.25*L"), values)
+                )
+                for _ in range(count):
+                    draw.line(
+                        (start * scale, line_y * scale, x * scale, line_y * scale),
+                        fill=_color(line_color, mode) if line_color else color,
+                        width=max(1, round(line_width * scale)),
+                    )
+                    line_y += (line_gap + line_width) * (1 if underline else -1)
+
+    return image
@@ -1,27 +1,64 @@
 from __future__ import annotations
 
+import hashlib
 import json
+import os
+import struct
+import sys
+from base64 import b64decode, b64encode
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from functools import lru_cache
-from importlib.metadata import version
 from pathlib import Path
 from typing import TYPE_CHECKING, Optional
 from urllib.parse import quote_plus
+from uuid import uuid4
+from weakref import WeakKeyDictionary
 
-from httpx import Client, HTTPError, Response
 from pydantic import BaseModel, ConfigDict, ValidationError, model_validator
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
 
 from . import config as spconfig
 from .exceptions import BadFontException
 from .util import get_valid_filename
 
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+# httpx and reportlab are only imported once fonts are actually downloaded or
+# registered, since importing them is comparatively slow
 if TYPE_CHECKING:
-    from typing import Any, Dict, Set, Tuple
+    from concurrent.futures import Executor, Future
+    from typing import (
+        Any,
+        Callable,
+        Collection,
+        Dict,
+        Iterator,
+        List,
+        Sequence,
+        Set,
+        Tuple,
+    )
+
+    from httpx import Client, Response
+    from reportlab.pdfbase.ttfonts import TTFont
 
-CURRENT_VERSION: str = version("styled-prose")
-FONT_CACHE: Path = Path.home() / ".cache" / "styled_prose_fonts"
+# where fonts downloaded from Google Fonts are cached, unless otherwise specified
+FONT_CACHE: Path = Path(
+    os.environ.get("STYLED_PROSE_FONT_CACHE")
+    or Path.home() / ".cache" / "styled_prose_fonts"
+)
+# whether to only ever use cached fonts, never downloading anything
+OFFLINE: bool = os.environ.get("STYLED_PROSE_OFFLINE", "") not in {"", "0"}
 GOOGLE_FONTS_URL: str = "https://fonts.google.com/download/list?family={}"
+# the directory, within the font cache, that parsed fonts are cached in
+PARSED_FONT_CACHE: str = ".parsed"
+# the shortest runs of numbers packed into binary in the parsed font cache
+PACKED_FONT_STATE_LENGTH: int = 16
+# the most manifests and font files downloaded from Google Fonts at once
+DOWNLOAD_THREAD_COUNT: int = 8
 FONT_FILE_SUFFIXES: Set[str] = {
     "-Regular.ttf",
     "-Bold.ttf",
@@ -42,7 +79,8 @@ class FontFamily(BaseModel):
     # if download from google
     from_google_fonts: bool = False
 
-    model_config = ConfigDict(extra="forbid")
+    # frozen, so that identical font families hash identically
+    model_config = ConfigDict(extra="forbid", frozen=True)
 
     @model_validator(mode="after")
     def check_remote_or_local(self: FontFamily) -> FontFamily:
@@ -65,80 +103,365 @@ class FontFamily(BaseModel):
         return self
 
 
+def _pdf_scale(units_per_em: int) -> Callable[[float], float]:
+    """
+    Rebuild the function a parsed font face uses to scale its glyph units into PDF
+    units, the same way reportlab does while parsing.
+    """
+    if units_per_em == 1000:
+        return lambda x: x
+
+    multiplier: float = 1000 / units_per_em
+    return lambda x: x * multiplier
+
+
+def _encode_font_state(state: Any) -> Any:
+    """
+    Convert the parsed state of a font into JSON-serializable data, tagging the types
+    JSON can't represent (tuples, bytes, font names, and dictionaries, whose keys
+    needn't be strings) so that `_decode_font_state` can restore them exactly.
+
+    Glyph tables run to tens of thousands of entries for CJK fonts, which JSON is slow
+    to parse number by number. Long runs of numbers are packed into base64 encoded
+    binary instead, dictionaries are stored as a column of keys and one of values,
+    and lists of tuples as a column per field.
+    """
+    from reportlab.pdfbase.ttfonts import TTFNameBytes
+
+    def pack(values: List[Any]) -> Optional[Dict[str, str]]:
+        if len(values) < PACKED_FONT_STATE_LENGTH:
+            return None
+        elif all(type(v) is int and -(2**63) <= v < 2**63 for v in values):
+            return {"q": b64encode(struct.pack(f"<{len(values)}q", *values)).decode()}
+        elif all(type(v) is float for v in values):
+            return {"f": b64encode(struct.pack(f"<{len(values)}d", *values)).decode()}
+
+        return None
+
+    def encode(value: Any) -> Any:
+        if isinstance(value, TTFNameBytes):
+            return {"n": value.ustr}
+        elif isinstance(value, bytes):
+            return {"b": value.decode("latin-1")}
+        elif isinstance(value, tuple):
+            return {"t": encode(list(value))}
+        elif isinstance(value, list):
+            if (
+                len(value) >= PACKED_FONT_STATE_LENGTH
+                and all(type(item) is tuple for item in value)
+                and len({len(item) for item in value}) == 1
+            ):
+                return {"z": [encode(list(column)) for column in zip(*value)]}
+
+            return pack(value) or [encode(item) for item in value]
+        elif isinstance(value, dict):
+            return {"d": [encode(list(value)), encode(list(value.values()))]}
+        elif value is None or isinstance(value, (bool, int, float, str)):
+            return value
+
+        raise TypeError(f"Can't cache parsed font data of type {type(value)}")
+
+    return encode(state)
+
+
+def _decode_font_state(tagged: Dict[str, Any]) -> Any:
+    """Restore a value tagged by `_encode_font_state`, as a JSON object hook."""
+    from reportlab.pdfbase.ttfonts import TTFNameBytes
+
+    ((tag, value),) = tagged.items()
+    if tag == "n":
+        return TTFNameBytes(value.encode())
+    elif tag == "b":
+        return value.encode("latin-1")
+    elif tag == "t":
+        return tuple(value)
+    elif tag == "z":
+        return list(zip(*value))
+    elif tag == "d":
+        return dict(zip(*value))
+    elif tag in {"q", "f"}:
+        # 64 bit integers and floats respectively
+        packed: bytes = b64decode(value, validate=True)
+        code: str = "q" if tag == "q" else "d"
+        return list(struct.unpack(f"<{len(packed) // 8}{code}", packed))
+
+    raise ValueError(f"Unknown parsed font data tag '{tag}'")
+
+
+def _load_font(name: str, file: Path, font_cache: Path) -> TTFont:
+    """
+    Load the TrueType font at the given path, reusing the parsed font data cached in
+    `font_cache` by a previous process whenever possible, and caching it otherwise.
+
+    Entries are keyed by the contents of the font file and reportlab's version, so
+    they're never restored into a font they weren't parsed from, though they may well
+    be restored from a different copy of the same file. They only ever hold plain
+    data, so restoring one can't run any code, however the cache was tampered with.
+    """
+    import reportlab
+    from reportlab.pdfbase.ttfonts import TTEncoding, TTFont, TTFontFace
+
+    data: bytes = file.read_bytes()
+    key: str = hashlib.sha256(data + f"\0{reportlab.Version}".encode()).hexdigest()
+    entry: Path = font_cache / PARSED_FONT_CACHE / f"{key}.json"
+
+    try:
+        state: Dict[str, Any]
+        face_state: Dict[str, Any]
+        state, face_state = json.loads(
+            entry.read_bytes(), object_hook=_decode_font_state
+        )
+        if not all(isinstance(k, str) for k in (*state, *face_state)):
+            raise ValueError("Parsed font data must be keyed by attribute names")
+    except Exception:
+        # either the entry doesn't exist or it's unusable; parse the font from scratch
+        font: TTFont = TTFont(name, file)
+
+        state = {
+            k: v
+            for k, v in vars(font).items()
+            if k not in {"face", "state", "encoding"}
+        }
+        face_state = {
+            k: v
+            for k, v in vars(font.face).items()
+            if k not in {"_ttf_data", "_pdfScale", "filename"}
+        }
+        try:
+            encoded: bytes = json.dumps(
+                _encode_font_state([state, face_state]), separators=(",", ":")
+            ).encode()
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            _write_atomic(entry, encoded)
+        except (OSError, TypeError):
+            # the font cache may well be read-only, and fonts holding data that can't
+            # be cached are simply parsed every time, both of which are fine
+            pass
+
+        return font
+
+    # rebuild the font exactly as reportlab would have, minus the parsing
+    face: TTFontFace = TTFontFace.__new__(TTFontFace)
+    face.__dict__.update(face_state)
+    face.filename = file
+    face._ttf_data = data
+    face._pdfScale = _pdf_scale(face.unitsPerEm)
+
+    restored: TTFont = TTFont.__new__(TTFont)
+    restored.__dict__.update(state)
+    restored.fontName = name
+    restored.face = face
+    restored.encoding = TTEncoding()
+    restored.state = WeakKeyDictionary()
+    return restored
+
+
 def _register_font_files(
     font_family: str,
     normal: Path,
     bold: Optional[Path] = None,
     italic: Optional[Path] = None,
     bold_italic: Optional[Path] = None,
+    font_cache: Optional[Path] = None,
+    face_suffix: str = "",
 ) -> None:
-    """Register the given font files, and combine them into a font family."""
+    """
+    Register the given font files, and combine them into a font family. Parsed fonts
+    are cached in `font_cache`, or `FONT_CACHE` by default.
+
+    ReportLab treats fonts whose faces share a name as one and the same, regardless of
+    the files they're from. If a `face_suffix` is given, it's appended to the name of
+    each face, so that they're never conflated with those of other font families.
+    """
+    from reportlab.pdfbase import pdfmetrics
+
+    cache: Path = Path(font_cache or FONT_CACHE)
     fonts: Dict[str, str] = {"normal": font_family}
 
-    pdfmetrics.registerFont(TTFont(fonts["normal"], normal))
+    def register(name: str, file: Path) -> None:
+        font: TTFont = _load_font(name, file, cache)
+        if face_suffix:
+            font.face.name += f"-{face_suffix}".encode()
+        pdfmetrics.registerFont(font)
+
+    register(fonts["normal"], normal)
 
     if bold and bold.exists():
         fonts["bold"] = f"{fonts['normal']}_bold"
-        pdfmetrics.registerFont(TTFont(fonts["bold"], bold))
+        register(fonts["bold"], bold)
     if italic and italic.exists():
         fonts["italic"] = f"{fonts['normal']}_italic"
-        pdfmetrics.registerFont(TTFont(fonts["italic"], italic))
+        register(fonts["italic"], italic)
     if bold_italic and bold_italic.exists():
         fonts["boldItalic"] = f"{fonts['normal']}_bold_italic"
-        pdfmetrics.registerFont(TTFont(fonts["boldItalic"], bold_italic))
+        register(fonts["boldItalic"], bold_italic)
 
     pdfmetrics.registerFontFamily(font_family, **fonts)
 
 
-def _download_font_family(
-    client: Client, font_family: str
-) -> Tuple[Path, Path, Path, Path]:
+@contextmanager
+def _lock_directory(directory: Path) -> Iterator[None]:
     """
-    Attempt to download the necessary TrueType font files for the provided font family
-    from Google Fonts.
+    Hold an exclusive lock on the given directory, shared across every thread and
+    process, blocking until it's available.
     """
-    font_dir: Path = FONT_CACHE / get_valid_filename(font_family)
-    font_dir.mkdir(parents=True, exist_ok=True)
+    with open(directory / ".lock", "a+b") as f:
+        if sys.platform == "win32":
+            f.seek(0)
+            while True:
+                try:
+                    # this only blocks for so long before giving up, so keep trying
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _write_atomic(file: Path, data: bytes) -> None:
+    """
+    Write the given data to a file such that readers never see a partial write,
+    regardless of whether it's interrupted.
+    """
+    # write to a temporary file first, then rename it over the original
+    tmp: Path = file.with_name(f".{file.name}.{uuid4()}.tmp")
+    try:
+        tmp.write_bytes(data)
+        os.replace(tmp, file)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def _checksum_file(file: Path) -> Path:
+    """The sidecar holding the checksum of a cached font file."""
+    return file.with_name(f"{file.name}.sha256")
+
+
+def _is_intact(file: Path) -> bool:
+    """
+    Determine whether a cached font file exists and still matches the checksum it was
+    downloaded with.
+    """
+    try:
+        expected: str = _checksum_file(file).read_text().strip()
+        return hashlib.sha256(file.read_bytes()).hexdigest() == expected
+    except OSError:
+        return False
 
+
+def _offline_error(font_family: str, font_dir: Path) -> BadFontException:
+    """The error raised when a font family isn't cached while offline."""
+    return BadFontException(
+        f"The font family {font_family} isn't cached in {font_dir}, and can't be"
+        " downloaded while offline. Prefetch it using `python -m styled_prose"
+        " prefetch`."
+    )
+
+
+def _download_manifest(
+    client: Optional[Client], font_dir: Path, font_family: str
+) -> Dict[str, Any]:
+    """
+    Attempt to download the manifest of the provided font family from Google Fonts,
+    caching it and the files bundled within it. Without a client, only a cached
+    manifest is used.
+    """
     manifest_file: Path = font_dir / "manifest.json"
-    manifest: Dict[str, Any]
+    manifest: Optional[Dict[str, Any]] = None
+
+    try:
+        # if the font file manifest exists, read it
+        manifest = json.loads(manifest_file.read_bytes())
+    except (OSError, ValueError):
+        # if it doesn't (or it's corrupt), download it
+        if not client:
+            raise _offline_error(font_family, font_dir) from None
 
-    # if the font file manifest doesn't exist, download it
-    if not manifest_file.exists():
         font_url: str = GOOGLE_FONTS_URL.format(quote_plus(font_family))
         resp: Response = client.get(font_url)
         resp.raise_for_status()
         body: bytes = resp.read()[5:]  # trim the beginning malformed `)]}'\n`
         manifest = json.loads(body)["manifest"]
+        _write_atomic(manifest_file, json.dumps(manifest).encode())
 
-        with open(manifest_file, "w") as f:
-            json.dump(manifest, f)
-    else:
-        # if it does exist, read it
-        with open(manifest_file, "r") as f:
-            manifest = json.load(f)
-
-    file: Path
+    assert manifest is not None
     for files in manifest["files"]:
         # write the all the bundled files, except the google readme, to the cache
         # this will include the license to the font
         if files["filename"] != "README.txt":
-            file = font_dir / files["filename"]
+            file: Path = font_dir / files["filename"]
             #  if the file is in the cache already, skip it
             if not file.exists():
-                file.write_text(files["contents"].replace("\r", ""))
-
-    for files in manifest["fileRefs"]:
-        # iterate through all the available fonts, downloading and caching
-        # the all ones we care about (ie. the ones RL can use)
-        font_style: str = files["filename"].split("-")[-1][:-4].lower()
-        if font_style in {"regular", "bold", "italic", "bolditalic"}:
-            file = font_dir / f"{font_style}.ttf"
-            if not file.exists():
-                # if the file doesn't exist, download it
-                file_resp: Response = client.get(files["url"])
-                file_resp.raise_for_status()
-                file.write_bytes(file_resp.read())
+                _write_atomic(file, files["contents"].replace("\r", "").encode())
+
+    return manifest
+
+
+def _download_font_file(client: Client, url: str, file: Path) -> None:
+    """
+    Download a single font file from Google Fonts into the cache, alongside a sidecar
+    containing its checksum.
+    """
+    resp: Response = client.get(url)
+    resp.raise_for_status()
+    data: bytes = resp.read()
+
+    _write_atomic(file, data)
+    _write_atomic(_checksum_file(file), hashlib.sha256(data).hexdigest().encode())
+
+
+def _download_font_family(
+    client: Optional[Client], font_family: str, pool: Executor, font_cache: Path
+) -> Tuple[Path, Path, Path, Path]:
+    """
+    Attempt to download the necessary TrueType font files for the provided font family
+    from Google Fonts into the given cache, fetching its font files concurrently using
+    the provided pool. Without a client, the family must already be cached.
+
+    The family's cache directory is locked throughout, so that when many processes
+    start at once only one of them downloads the family while the rest wait and reuse
+    it. Font files that are missing or don't match their checksum are (re)downloaded.
+    """
+    font_dir: Path = font_cache / get_valid_filename(font_family)
+    font_dir.mkdir(parents=True, exist_ok=True)
+
+    with _lock_directory(font_dir):
+        manifest: Dict[str, Any] = _download_manifest(client, font_dir, font_family)
+
+        downloads: List[Future[None]] = []
+        try:
+            for files in manifest["fileRefs"]:
+                # iterate through all the available fonts, downloading and caching
+                # the all ones we care about (ie. the ones RL can use)
+                font_style: str = files["filename"].split("-")[-1][:-4].lower()
+                if font_style in {"regular", "bold", "italic", "bolditalic"}:
+                    file: Path = font_dir / f"{font_style}.ttf"
+                    if not _is_intact(file):
+                        # if the file doesn't exist or is corrupt, download it
+                        if not client:
+                            raise _offline_error(font_family, font_dir)
+
+                        downloads.append(
+                            pool.submit(_download_font_file, client, files["url"], file)
+                        )
+
+            for download in downloads:
+                download.result()
+        finally:
+            # if anything failed, don't bother with whatever hasn't started yet
+            for download in downloads:
+                download.cancel()
 
     return (
         font_dir / "regular.ttf",
@@ -148,65 +471,237 @@ def _download_font_family(
     )
 
 
-@lru_cache(maxsize=None)
-def register_fonts(path: Path) -> None:
-    config: Dict[str, Any] = spconfig.load_config(path)
-    c_path: Path = Path(path).parent
-    client: Optional[Client] = None
+def _download_font_families(
+    client: Optional[Client],
+    font_families: List[str],
+    font_cache: Optional[Path] = None,
+) -> List[Tuple[Path, Path, Path, Path]]:
+    """
+    Attempt to download the necessary TrueType font files for each of the provided
+    font families from Google Fonts. Families, and the font files within them, are all
+    fetched concurrently over the shared client, with at most `DOWNLOAD_THREAD_COUNT`
+    of each in flight at once.
+
+    Results are returned in the order of the provided families. If any downloads
+    fail, the error of the earliest family to fail is raised.
+
+    Families are cached in `font_cache`, or `FONT_CACHE` by default. Without a client,
+    every family must already be cached.
+    """
+    cache: Path = Path(font_cache or FONT_CACHE)
+
+    # families wait on their font files, so they each need their own pool
+    families: ThreadPoolExecutor = ThreadPoolExecutor(
+        max_workers=max(1, min(DOWNLOAD_THREAD_COUNT, len(font_families)))
+    )
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_THREAD_COUNT) as files, families:
+        futures: List[Future[Tuple[Path, Path, Path, Path]]] = [
+            families.submit(_download_font_family, client, font_family, files, cache)
+            for font_family in font_families
+        ]
+
+        try:
+            return [future.result() for future in futures]
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def _load_font_families(path: Path) -> List[FontFamily]:
+    """Load and validate every font family in the provided configuration file."""
+    return load_font_families(spconfig.load_config(path))
 
+
+def load_font_families(config: Dict[str, Any]) -> List[FontFamily]:
+    """Validate every font family in the provided, already loaded, configuration."""
     try:
-        for ff in config.get("fonts", []):
-            # for each font family, register the provided fonts
-            font_family: FontFamily = FontFamily(**ff)
-            normal: Path
-            bold: Optional[Path] = None
-            italic: Optional[Path] = None
-            bold_italic: Optional[Path] = None
-
-            if font_family.from_google_fonts:
-                # if from google
-                if not client:
-                    # if not client is defined, create one. this lets us share a single
-                    # client instance across all remote fonts rather than create a new
-                    # one every time, which is more efficient / resource friendly.
-                    client = Client(
-                        http2=True,
-                        follow_redirects=True,
-                        headers={"User-Agent": f"styled-prose/{CURRENT_VERSION}"},
-                    )
-
-                normal, bold, italic, bold_italic = _download_font_family(
-                    client, font_family.font_name
-                )
-            else:
-                # if local
-                normal = c_path / font_family.regular  # type: ignore
-                bold = c_path / font_family.bold if font_family.bold else None
-                italic = (
-                    c_path / font_family.italicized if font_family.italicized else None
-                )
-                bold_italic = (
-                    c_path / font_family.bold_italicized
-                    if font_family.bold_italicized
-                    else None
-                )
-
-            _register_font_files(
-                font_family.font_name,
-                normal,  # pyright: ignore
-                bold=bold,
-                italic=italic,
-                bold_italic=bold_italic,
-            )
+        return [FontFamily(**ff) for ff in config.get("fonts", [])]
     except ValidationError as err:
         raise BadFontException(
             f"Invalid font family! Misconfigurations are listed below:\n" f"\n{err}"
         ) from None
+
+
+def _fetch_font_families(
+    font_families: List[str], font_cache: Optional[Path] = None, offline: bool = False
+) -> List[Tuple[Path, Path, Path, Path]]:
+    """
+    Resolve the font files of each of the provided Google Fonts families, downloading
+    them if they aren't already cached. If offline, an HTTP client is never created.
+    """
+    if offline or OFFLINE:
+        return _download_font_families(None, font_families, font_cache)
+
+    from importlib.metadata import version
+
+    from httpx import Client, HTTPError
+
+    # share a single client instance across all remote fonts rather than create a new
+    # one every time, which is more efficient / resource friendly
+    client: Client = Client(
+        http2=True,
+        follow_redirects=True,
+        headers={"User-Agent": f"styled-prose/{version('styled-prose')}"},
+    )
+
+    try:
+        return _download_font_families(client, font_families, font_cache)
     except HTTPError as err:
         raise BadFontException(
             "Failed to download the specified fonts from Google Fonts. Are you sure"
             " they're available?"
         ) from err
     finally:
-        if client:
-            client.close()
+        client.close()
+
+
+def prefetch_fonts(path: Path, font_cache: Optional[Path] = None) -> List[Path]:
+    """
+    Download every Google Fonts family in the provided configuration into the font
+    cache (by default `FONT_CACHE`) without registering any of them, returning the
+    directory of each family. This is intended to be run ahead of time, such as while
+    building a container image, so that fonts never need to be downloaded at runtime.
+    """
+    remote: List[str] = [
+        ff.font_name for ff in _load_font_families(path) if ff.from_google_fonts
+    ]
+    if not remote:
+        return []
+
+    return [files[0].parent for files in _fetch_font_families(remote, font_cache)]
+
+
+@lru_cache(maxsize=spconfig.CACHE_SIZE)
+def register_fonts(
+    path: Path,
+    font_cache: Optional[Path] = None,
+    offline: bool = False,
+    lazy: bool = False,
+) -> None:
+    """
+    Register every font family in the provided configuration, downloading Google Fonts
+    families into the font cache (by default `FONT_CACHE`) as needed. If `offline`,
+    or the `STYLED_PROSE_OFFLINE` environment variable is set, only cached families
+    are used and nothing is ever downloaded.
+
+    If `lazy`, the configuration is only validated, leaving families to be registered
+    as they're needed using `register_font_families`.
+    """
+    if lazy:
+        _load_font_families(path)
+        return
+
+    register_font_families(path, None, font_cache, offline)
+
+
+def register_font_families(
+    path: Path,
+    font_names: Optional[Collection[str]] = None,
+    font_cache: Optional[Path] = None,
+    offline: bool = False,
+) -> None:
+    """
+    Register the font families in the provided configuration with the given names, or
+    every one of them if no names are given, in the order they're configured. Names
+    that aren't configured, such as those of reportlab's standard fonts, are ignored.
+    Otherwise, this behaves exactly like `register_fonts`, but is never cached.
+    """
+    # validate every font family before fetching anything, so that misconfigurations
+    # are reported the same way regardless of the network
+    font_families: List[FontFamily] = [
+        ff
+        for ff in _load_font_families(path)
+        if font_names is None or ff.font_name in font_names
+    ]
+
+    register_families(font_families, Path(path).parent, font_cache, offline)
+
+
+def register_config_fonts(
+    config: Dict[str, Any],
+    root: Path,
+    font_cache: Optional[Path] = None,
+    offline: bool = False,
+    lazy: bool = False,
+) -> None:
+    """
+    Register every font family in the provided, already loaded, configuration, whose
+    local font files are relative to `root`. This otherwise behaves like
+    `register_fonts`, except that registrations are cached by the contents of the
+    font families rather than by path, so any number of configurations sharing the
+    same font families only register them once.
+    """
+    font_families: Tuple[FontFamily, ...] = tuple(load_font_families(config))
+    if lazy:
+        return
+
+    _register_shared_families(font_families, Path(root), font_cache, offline)
+
+
+@lru_cache(maxsize=spconfig.CACHE_SIZE)
+def _register_shared_families(
+    font_families: Tuple[FontFamily, ...],
+    root: Path,
+    font_cache: Optional[Path],
+    offline: bool,
+) -> None:
+    """Register the given font families once per distinct set of them."""
+    register_families(font_families, root, font_cache, offline)
+
+
+def register_families(
+    font_families: Sequence[FontFamily],
+    root: Path,
+    font_cache: Optional[Path] = None,
+    offline: bool = False,
+    font_names: Optional[Dict[str, str]] = None,
+) -> None:
+    """
+    Register the given, already validated, font families in order, resolving local
+    font files relative to `root`. Families named in `font_names` are registered under
+    the name they map to instead of their own, with faces distinct from those of any
+    other family. This is never cached.
+    """
+    font_names = font_names or {}
+    c_path: Path = Path(root)
+
+    remote: List[str] = [ff.font_name for ff in font_families if ff.from_google_fonts]
+    downloaded: Iterator[Tuple[Path, Path, Path, Path]] = iter([])
+    if remote:
+        downloaded = iter(_fetch_font_families(remote, font_cache, offline))
+
+    for font_family in font_families:
+        # for each font family, register the provided fonts in order
+        normal: Path
+        bold: Optional[Path] = None
+        italic: Optional[Path] = None
+        bold_italic: Optional[Path] = None
+
+        if font_family.from_google_fonts:
+            # if from google
+            normal, bold, italic, bold_italic = next(downloaded)
+        else:
+            # if local
+            normal = c_path / font_family.regular  # type: ignore
+            bold = c_path / font_family.bold if font_family.bold else None
+            italic = c_path / font_family.italicized if font_family.italicized else None
+            bold_italic = (
+                c_path / font_family.bold_italicized
+                if font_family.bold_italicized
+                else None
+            )
+
+        name: str = font_names.get(font_family.font_name, font_family.font_name)
+        _register_font_files(
+            name,
+            normal,  # pyright: ignore
+            bold=bold,
+            italic=italic,
+            bold_italic=bold_italic,
+            font_cache=font_cache,
+            face_suffix=(
+                hashlib.sha256(name.encode()).hexdigest()[:8]
+                if name != font_family.font_name
+                else ""
+            ),
+        )
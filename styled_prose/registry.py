@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, NamedTuple
+from uuid import uuid4
+
+from .config import config_digest
+from .fonts import register_families
+
+if TYPE_CHECKING:
+    from pathlib import Path
+    from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+    from .fonts import FontFamily
+
+# the suffixes `register_families` gives the name of each face of a font family
+FACE_SUFFIXES: Tuple[str, ...] = ("", "_bold", "_italic", "_bold_italic")
+
+
+class RegistryStats(NamedTuple):
+    """A snapshot of a `FontRegistry`'s contents and counters."""
+
+    families: int
+    """The number of font families currently registered."""
+    referenced: int
+    """The number of those font families in use by at least one generator."""
+    fonts: int
+    """The number of individual fonts (faces) currently registered."""
+    bytes: int
+    """The number of font file bytes the registered fonts hold in memory."""
+    evictions: int
+    """Font families unregistered to stay within `max_bytes`."""
+
+
+class _Family(NamedTuple):
+    fonts: List[str]
+    bytes: int
+
+
+class FontRegistry:
+    """
+    A bounded, reference counted registry of font families, to be shared with any
+    number of `StyledProseGenerator`s.
+
+    Every font family is registered with ReportLab under an internal name, namespaced
+    by the registry and the family's definition, so that stylesheets which give
+    different fonts the same name never collide, while those sharing a definition share
+    one registration. Generators hold a reference to each family they use until they're
+    closed or garbage collected. Once unreferenced, families are kept around for reuse
+    until the fonts of every registered family exceed `max_bytes`, at which point the
+    least recently used are unregistered; families in use are never unregistered.
+
+    Since the fonts are registered under internal names, prose markup can't refer to
+    font families by their configured names.
+    """
+
+    def __init__(
+        self, max_bytes: int = 128 * 1024 * 1024, namespace: Optional[str] = None
+    ) -> None:
+        self.max_bytes: int = max_bytes
+        self.namespace: str = namespace or uuid4().hex[:8]
+
+        # unreferenced families are kept in least recently used order
+        self._families: OrderedDict[str, _Family] = OrderedDict()
+        self._references: Dict[str, int] = {}
+        self._bytes: int = 0
+        self._evictions: int = 0
+        self._lock: threading.RLock = threading.RLock()
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # copies, such as those sent to batch rendering workers, start out empty but
+        # name font families identically
+        return (FontRegistry, (self.max_bytes, self.namespace))
+
+    @property
+    def stats(self) -> RegistryStats:
+        """The currently registered font families and eviction counter."""
+        with self._lock:
+            return RegistryStats(
+                len(self._families),
+                sum(1 for count in self._references.values() if count),
+                sum(len(family.fonts) for family in self._families.values()),
+                self._bytes,
+                self._evictions,
+            )
+
+    def font_name(self, font_family: FontFamily, root: Path) -> str:
+        """
+        The internal name the given font family, whose local font files are relative to
+        `root`, is registered under.
+        """
+        definition: Dict[str, Any] = font_family.model_dump(mode="json")
+        if not font_family.from_google_fonts:
+            definition["root"] = str(root.resolve())
+
+        digest: str = config_digest(definition)
+        return f"{font_family.font_name}@{self.namespace}:{digest[:12]}"
+
+    def acquire(
+        self,
+        font_families: Sequence[FontFamily],
+        root: Path,
+        font_cache: Optional[Path] = None,
+        offline: bool = False,
+    ) -> List[str]:
+        """
+        Register the given font families if they aren't already, and reference each of
+        them until `release`d. Returns their internal names, in order.
+        """
+        names: Dict[str, str] = {
+            ff.font_name: self.font_name(ff, root) for ff in font_families
+        }
+
+        # registration is rare, so it's fine to hold the lock while downloading
+        with self._lock:
+            missing: List[FontFamily] = [
+                ff for ff in font_families if names[ff.font_name] not in self._families
+            ]
+            if missing:
+                register_families(missing, root, font_cache, offline, names)
+
+            for ff in font_families:
+                name: str = names[ff.font_name]
+                if name not in self._families:
+                    self._families[name] = _registered(name)
+                    self._bytes += self._families[name].bytes
+
+                self._references[name] = self._references.get(name, 0) + 1
+                self._families.move_to_end(name)
+
+            self._evict()
+
+        return list(names.values())
+
+    def release(self, font_names: Iterable[str]) -> None:
+        """
+        Drop a reference to each of the font families with the given internal names,
+        unregistering unreferenced ones as needed to stay within `max_bytes`.
+        """
+        with self._lock:
+            for name in font_names:
+                if self._references.get(name):
+                    self._references[name] -= 1
+                    if name in self._families:
+                        self._families.move_to_end(name)
+
+            self._evict()
+
+    def _evict(self) -> None:
+        """Unregister unreferenced families, least recently used first, as needed."""
+        for name in list(self._families):
+            if self._bytes <= self.max_bytes:
+                break
+            if self._references.get(name):
+                continue
+
+            family: _Family = self._families.pop(name)
+            self._references.pop(name, None)
+            self._bytes -= family.bytes
+            self._evictions += 1
+            _unregister(name, family.fonts)
+
+
+def _registered(font_family: str) -> _Family:
+    """Collect the fonts registered for a font family, and the bytes they hold."""
+    from reportlab.pdfbase import pdfmetrics
+
+    fonts: List[str] = []
+    size: int = 0
+    for suffix in FACE_SUFFIXES:
+        # fonts sharing a face with one registered earlier are aliased to it, so they
+        # have to be tracked by the name they were registered under
+        font: Any = pdfmetrics._fonts.get(f"{font_family}{suffix}")
+        if font is not None:
+            fonts.append(f"{font_family}{suffix}")
+            size += len(getattr(font.face, "_ttf_data", b""))
+
+    return _Family(fonts, size)
+
+
+def _unregister(font_family: str, fonts: List[str]) -> None:
+    """
+    Remove a font family, and its fonts, from ReportLab's process-global registries.
+    ReportLab has no public API for this, so its internal mappings are edited directly.
+    """
+    from reportlab.lib import fonts as rlfonts
+    from reportlab.pdfbase import pdfmetrics
+
+    for name in fonts:
+        font: Any = pdfmetrics._fonts.pop(name, None)
+        face: Optional[str] = getattr(getattr(font, "face", None), "name", None)
+        if face and pdfmetrics._dynFaceNames.get(face) is font:
+            del pdfmetrics._dynFaceNames[face]
+        rlfonts._ps2tt_map.pop(name.lower(), None)
+
+    for bold in (0, 1):
+        for italic in (0, 1):
+            rlfonts._tt2ps_map.pop((font_family.lower(), bold, italic), None)
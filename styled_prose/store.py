@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import os
+import threading
+from io import BytesIO
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+from uuid import uuid4
+
+from PIL import Image
+
+from .cache import _DiskUsage, _open
+
+if TYPE_CHECKING:
+    from typing import Any, Dict, Optional, Tuple, Union
+
+
+class StoreStats(NamedTuple):
+    """A snapshot of an `OutputStore`'s counters."""
+
+    hits: int
+    """Lookups served from the store."""
+    misses: int
+    """Lookups that weren't in the store."""
+    evictions: int
+    """Entries evicted to stay within `max_bytes`."""
+
+
+class OutputStore:
+    """
+    A content-addressed, on-disk store of finished renderings, to be shared with
+    `StyledProseGenerator`. Every deterministic rendering is encoded and written to
+    `directory` under a digest of the prose, its resolved style and fonts, and every
+    argument that affects the output, so that repeating it (in this process or in any
+    other sharing the directory) skips rendering entirely.
+
+    Renderings are stored in the given Pillow `format`, which is lossless PNG by
+    default, using any additional `options` as save arguments. The least recently
+    used entries are evicted once they exceed `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        max_bytes: int = 1024 * 1024 * 1024,
+        format: str = "PNG",
+        **options: Any,
+    ) -> None:
+        self.directory: Path = Path(directory)
+        self.max_bytes: int = max_bytes
+        self.format: str = format.upper()
+        self.options: Dict[str, Any] = options
+        self.extension: str = self.format.lower()
+
+        self._lock: threading.Lock = threading.Lock()
+        self._hits: int = 0
+        self._misses: int = 0
+        self._evictions: int = 0
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._disk_usage: _DiskUsage = _DiskUsage(
+            self.directory, f"*.{self.extension}", max_bytes
+        )
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # copies, such as those sent to batch rendering workers, share the directory
+        # but keep their own counters
+        return (_restore, (self.directory, self.max_bytes, self.format, self.options))
+
+    @property
+    def stats(self) -> StoreStats:
+        """The current hit, miss, and eviction counters."""
+        with self._lock:
+            return StoreStats(self._hits, self._misses, self._evictions)
+
+    def path(self, key: str) -> Path:
+        """The file the rendering stored under the given key is, or would be, at."""
+        return self.directory / f"{key}.{self.extension}"
+
+    def read(self, key: str) -> Optional[bytes]:
+        """Read the encoded rendering stored under the given key, if it exists."""
+        file: Path = self.path(key)
+        try:
+            data: bytes = file.read_bytes()
+            # mark the file as recently used
+            os.utime(file)
+        except OSError:
+            data = b""
+
+        with self._lock:
+            if data:
+                self._hits += 1
+            else:
+                self._misses += 1
+
+        return data or None
+
+    def get(self, key: str) -> Optional[Image.Image]:
+        """Read and decode the rendering stored under the given key, if it exists."""
+        data: Optional[bytes] = self.read(key)
+        if not data:
+            return None
+
+        try:
+            return _open(BytesIO(data), self.format, self.max_bytes)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            # a corrupt entry is as good as a missing one
+            return None
+
+    def put(self, key: str, image: Image.Image) -> None:
+        """Atomically store the given rendering, evicting old ones as needed."""
+        buffer: BytesIO = BytesIO()
+        image.save(buffer, self.format, **self.options)
+
+        # write to a temporary file first so that readers never see a partial entry
+        tmp: Path = self.directory / f".{key}.{uuid4()}.tmp"
+        size: int = tmp.write_bytes(buffer.getvalue())
+        os.replace(tmp, self.path(key))
+
+        evicted: int = self._disk_usage.add(size)
+        with self._lock:
+            self._evictions += evicted
+
+
+def _restore(
+    directory: Path, max_bytes: int, format: str, options: Dict[str, Any]
+) -> OutputStore:
+    """Recreate a pickled `OutputStore`."""
+    return OutputStore(directory, max_bytes, format, **options)
@@ -13,12 +13,16 @@ from .exceptions import BadStyleException
 
 if TYPE_CHECKING:
     from pathlib import Path
-    from typing import Any, Dict
+    from typing import Any, Dict, Tuple
 
 from functools import lru_cache
 
 from . import config as spconfig
-from .util import to_camel_case
+from .util import BoundedCache, to_camel_case
+
+# stylesheets compiled from in-memory configurations, keyed by the digest of their
+# style definitions
+_compiled_stylesheets: BoundedCache[StyleSheet] = BoundedCache(spconfig.CACHE_SIZE)
 
 
 class Indent(BaseModel):
@@ -170,26 +174,51 @@ class ParagraphStyle(BaseModel):
         return RLPStyle(**properties)
 
 
-@lru_cache(maxsize=None)
-def load_stylesheet(path: Path) -> StyleSheet:
+def _style_definitions(config: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
     """
-    Given a path to a TOML stylesheet definition, load the paragraph
-    styles and construct a RL stylesheet to use when generating styled prose.
+    Map the name of every style in the provided configuration to the rest of its
+    definition, in order, including the builtin default style if it isn't overridden.
     """
-    config: Dict[str, Any] = spconfig.load_config(path)
-    stylesheet: StyleSheet = StyleSheet()
+    definitions: Dict[str, Dict[str, Any]] = {}
 
     for style in config.get("styles", []):
         # check to ensure the name of the style is unique
-        name = style.pop("name")
-        if name in stylesheet:
+        definition: Dict[str, Any] = dict(style)
+        name = definition.pop("name")
+        if name in definitions:
             raise BadStyleException(
                 f"All styles must be unique, but {name} was listed at least twice!"
             )
 
+        definitions[name] = definition
+
+    definitions.setdefault("default", {})
+    return definitions
+
+
+def build_stylesheet(
+    config: Dict[str, Any],
+    previous: Optional[Tuple[Dict[str, Any], StyleSheet]] = None,
+) -> StyleSheet:
+    """
+    Given a loaded configuration, construct a RL stylesheet from its paragraph styles.
+    If the `previous` configuration and the stylesheet built from it are provided,
+    styles whose definitions haven't changed are reused rather than rebuilt.
+    """
+    unchanged: Dict[str, Dict[str, Any]] = {}
+    if previous:
+        unchanged = _style_definitions(previous[0])
+
+    stylesheet: StyleSheet = StyleSheet()
+
+    for name, definition in _style_definitions(config).items():
+        if previous and unchanged.get(name) == definition:
+            stylesheet.add(previous[1][name])
+            continue
+
         # try to coerce the style to the proper format, adding it if successful
         try:
-            ps: ParagraphStyle = ParagraphStyle(name=name, **style)
+            ps: ParagraphStyle = ParagraphStyle(name=name, **definition)
             stylesheet.add(ps._to_reportlab())
         except ValidationError as err:
             raise BadStyleException(
@@ -197,8 +226,46 @@ def load_stylesheet(path: Path) -> StyleSheet:
                 f"\n{err}"
             ) from None
 
-    # add the default style is not overridden
-    if "default" not in stylesheet:
-        stylesheet.add(ParagraphStyle(name="default")._to_reportlab())
-
     return stylesheet
+
+
+def compile_stylesheet(config: Dict[str, Any]) -> StyleSheet:
+    """
+    Given a loaded configuration, construct a RL stylesheet from its paragraph styles
+    like `build_stylesheet`, but cache it by the digest of the styles' definitions, so
+    that any number of configurations with the same styles share one compiled copy.
+    """
+    return _compiled_stylesheets.get(
+        spconfig.config_digest(config.get("styles", [])),
+        lambda: build_stylesheet(config),
+    )
+
+
+@lru_cache(maxsize=spconfig.CACHE_SIZE)
+def load_stylesheet(path: Path) -> StyleSheet:
+    """
+    Given a path to a TOML stylesheet definition, load the paragraph
+    styles and construct a RL stylesheet to use when generating styled prose.
+    """
+    return build_stylesheet(spconfig.load_config(path))
+
+
+def rename_fonts(stylesheet: StyleSheet, font_names: Dict[str, str]) -> StyleSheet:
+    """
+    Construct a copy of the provided stylesheet in which every font family named in
+    `font_names` is replaced by the name it maps to. Styles that don't use any of those
+    font families are shared with the original, rather than copied.
+    """
+    if not font_names:
+        return stylesheet
+
+    renamed: StyleSheet = StyleSheet()
+    for style in stylesheet.byName.values():
+        fonts: Dict[str, str] = {
+            attr: font_names[getattr(style, attr)]
+            for attr in ("fontName", "bulletFontName")
+            if getattr(style, attr) in font_names
+        }
+        renamed.add(style.clone(style.name, **fonts) if fonts else style)
+
+    return renamed
@@ -2,10 +2,14 @@ from __future__ import annotations
 
 import platform
 import re
-from typing import TYPE_CHECKING
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Generic, TypeVar
 
 if TYPE_CHECKING:
-    from typing import Set
+    from typing import Callable, Set
+
+T = TypeVar("T")
 
 
 def get_valid_filename(name: str) -> str:
@@ -79,3 +83,43 @@ def to_camel_case(field: str, parent: str = "", swap: bool = False) -> str:
         parent, parts = parts[0], (parts[1:] + [parent])
 
     return parent + "".join(part.title() for part in parts)
+
+
+class BoundedCache(Generic[T]):
+    """
+    A thread-safe cache of values by key, evicting the least recently used values once
+    it holds more than `maxsize` of them.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize: int = maxsize
+        self._entries: OrderedDict[str, T] = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str, create: Callable[[], T]) -> T:
+        """
+        Retrieve the value cached under the given key, creating it using `create` (and
+        caching it) if it isn't cached. Values are created outside of the lock, so the
+        same one may be created more than once concurrently, but only one is kept.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        value: T = create()
+        with self._lock:
+            value = self._entries.setdefault(key, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+        return value
+
+    def clear(self) -> None:
+        """Drop every cached value."""
+        with self._lock:
+            self._entries.clear()
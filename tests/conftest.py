@@ -17,3 +17,11 @@ def mock_config(monkeypatch):
         )
 
     yield wrapper
+
+
+@pytest.fixture(autouse=True)
+def font_cache(monkeypatch, tmp_path_factory):
+    # never read or write the developer's own font cache
+    cache = tmp_path_factory.mktemp("font_cache")
+    monkeypatch.setattr("styled_prose.fonts.FONT_CACHE", cache)
+    yield cache
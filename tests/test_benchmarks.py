@@ -0,0 +1,40 @@
+from benchmarks.suite import Measurement, compare, load, prose, save, words
+
+MIB = 1024 * 1024
+
+
+def test_prose():
+    text = prose(250)
+
+    assert len(text.split()) == 250
+    assert text.count("\n") == 2
+    assert prose(250) == text
+    assert words("line", "display") == words("line", "default")
+    assert words("10-pages", "display") < words("10-pages", "default")
+
+
+def test_compare(tmp_path):
+    save(
+        {
+            "fast": Measurement(0.001, 50 * MIB),
+            "slow": Measurement(1.0, 100 * MIB),
+            "heavy": Measurement(1.0, 100 * MIB),
+        },
+        tmp_path / "baseline.json",
+    )
+    baseline = load(tmp_path / "baseline.json")
+
+    results = {
+        # tripled, but by less than the noise floor
+        "fast": Measurement(0.003, 50 * MIB),
+        "slow": Measurement(1.5, 100 * MIB),
+        "heavy": Measurement(1.1, 120 * MIB),
+        "new": Measurement(10.0, 1000 * MIB),
+    }
+    regressions = compare(results, baseline, tolerance=0.25, rss_tolerance=0.1)
+
+    assert [(r.stage, r.metric) for r in regressions] == [
+        ("heavy", "peak_rss"),
+        ("slow", "seconds"),
+    ]
+    assert not compare(baseline, baseline)
@@ -0,0 +1,95 @@
+import os
+
+from PIL import Image, ImageChops
+
+from styled_prose import cache as spcache
+from styled_prose.cache import RenderCache
+
+
+def test_memory_lru():
+    # each 10x10 RGB bitmap is 300 bytes, so only two fit
+    cache = RenderCache(max_bytes=600)
+    images = [Image.new("RGB", (10, 10), (i, i, i)) for i in range(3)]
+
+    cache.put("a", images[0], 1)
+    cache.put("b", images[1], 2)
+    assert cache.get("a") == (images[0], 1)
+
+    # "b" is the least recently used, so it's evicted first
+    cache.put("c", images[2], 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == (images[0], 1)
+    assert cache.get("c") == (images[2], 3)
+
+    stats = cache.stats
+    assert (stats.hits, stats.misses, stats.evictions) == (3, 1, 1)
+    assert stats.bytes == 600
+
+
+def test_disk_tier(tmp_path):
+    image = Image.new("RGB", (10, 10), (0, 128, 255))
+    RenderCache(directory=tmp_path).put("a", image, [1, [2.0, 3.0]])
+
+    # a fresh cache misses in memory, but finds the entry on disk
+    cache = RenderCache(directory=tmp_path)
+    cached, metadata = cache.get("a")
+    assert ImageChops.difference(cached, image).getbbox() is None
+    assert metadata == [1, [2.0, 3.0]]
+    assert cache.stats.disk_hits == 1
+
+    # which is then promoted into memory
+    assert cache.get("a") is not None
+    assert cache.stats.hits == 1
+
+
+def test_disk_eviction(tmp_path):
+    RenderCache(directory=tmp_path).put("size", Image.new("RGB", (10, 10)))
+    size = (tmp_path / "size.png").stat().st_size
+    (tmp_path / "size.png").unlink()
+
+    # only two entries fit on disk
+    cache = RenderCache(directory=tmp_path, max_disk_bytes=size * 2)
+    for key in "abc":
+        cache.put(key, Image.new("RGB", (10, 10)))
+        os.utime(tmp_path / f"{key}.png", (0, ord(key)))
+
+    assert sorted(file.name for file in tmp_path.iterdir()) == ["b.png", "c.png"]
+    assert cache.stats.disk_evictions == 1
+
+
+def test_disk_eviction_scans(tmp_path, mocker):
+    scans = mocker.spy(spcache, "_evict_files")
+    cache = RenderCache(directory=tmp_path)
+    cache._disk_usage.rescan = 4
+
+    # the directory is scanned on the first write, and then only periodically
+    for i in range(9):
+        cache.put(str(i), Image.new("RGB", (10, 10)))
+    assert scans.call_count == 3
+
+    # or as soon as the running total exceeds the limit
+    cache._disk_usage.max_bytes = 0
+    cache.put("9", Image.new("RGB", (10, 10)))
+    assert scans.call_count == 4
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_disk_tier_large(tmp_path, monkeypatch):
+    # entries larger than Pillow's decompression bomb limit are still read back
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 40)
+    RenderCache(directory=tmp_path).put("a", Image.new("RGB", (10, 10)), "metadata")
+
+    cache = RenderCache(directory=tmp_path)
+    image, metadata = cache.get("a")
+    assert image.size == (10, 10) and metadata == "metadata"
+    assert cache.stats.disk_hits == 1
+    assert Image.MAX_IMAGE_PIXELS == 40
+
+
+def test_disk_tier_bomb(tmp_path):
+    # entries that would decode to more than the disk tier holds are never loaded
+    cache = RenderCache(directory=tmp_path, max_disk_bytes=100_000)
+    cache.put("a", Image.new("L", (1000, 1000)))
+    assert (tmp_path / "a.png").stat().st_size < 100_000
+
+    assert RenderCache(directory=tmp_path, max_disk_bytes=100_000).get("a") is None
@@ -0,0 +1,924 @@
+import asyncio
+import math
+import random
+import shutil
+import subprocess
+import sys
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+import reportlab
+from PIL import Image, ImageChops, ImageDraw, ImageStat
+from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT
+from reportlab.lib.styles import ParagraphStyle as RLPStyle
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+from styled_prose import (
+    BadStyleException,
+    OutputStore,
+    ParagraphStyle,
+    PdfiumRasterizer,
+    RenderCache,
+    RenderSpec,
+    StyledProseGenerator,
+    Variant,
+    creation,
+)
+from styled_prose.config import _parsed_configs
+from styled_prose.creation import _build_document, _collate, _ink_bbox, _style_digest
+from styled_prose.drawing import _load_font
+from styled_prose.fonts import _register_shared_families, register_fonts
+from styled_prose.stylesheet import _compiled_stylesheets, load_stylesheet
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # clear the cache every run since each test mocks its own config
+    register_fonts.cache_clear()
+    load_stylesheet.cache_clear()
+    _register_shared_families.cache_clear()
+    _compiled_stylesheets.clear()
+    _parsed_configs.clear()
+
+
+@pytest.fixture
+def page():
+    # a fake rasterized page, with a black block of "text" in the middle of it
+    image = Image.new("RGB", (170, 220), (255, 255, 255))
+    ImageDraw.Draw(image).rectangle((20, 30, 150, 190), fill=(0, 0, 0))
+    yield image
+
+
+def test_create_jpg_in_memory(mock_config, mocker, page):
+    mock_config({})
+    buffer = BytesIO()
+    page.save(buffer, "PNG")
+    mock_run = mocker.patch(
+        "styled_prose.creation.subprocess.run",
+        return_value=subprocess.CompletedProcess([], 0, stdout=buffer.getvalue()),
+    )
+    mock_tmpdir = mocker.patch("styled_prose.creation.TemporaryDirectory")
+
+    generator = StyledProseGenerator("mock.toml", in_memory=True)
+    image = generator.create_jpg("hello world")
+
+    # the PDF should be piped straight to poppler, never hitting the disk
+    mock_tmpdir.assert_not_called()
+    mock_run.assert_called_once()
+    assert mock_run.call_args.kwargs["input"].startswith(b"%PDF")
+    assert mock_run.call_args.args[0][-2:] == ["-", "-"]
+    assert image.size == (131, 161)
+
+
+@pytest.mark.parametrize(
+    "color,mode,expected",
+    (
+        ("#333333", "L", "L"),
+        ("#333333", "1", "1"),
+        ("#aa0000", "L", "RGB"),
+        ("#aa0000", "1", "RGB"),
+    ),
+)
+def test_create_jpg_mode(mock_config, mocker, page, color, mode, expected):
+    mock_config({"styles": [{"name": "default", "font_color": color}]})
+    buffer = BytesIO()
+    page.convert(expected if expected == "RGB" else "L").save(buffer, "PNG")
+    mock_run = mocker.patch(
+        "styled_prose.creation.subprocess.run",
+        return_value=subprocess.CompletedProcess([], 0, stdout=buffer.getvalue()),
+    )
+
+    generator = StyledProseGenerator("mock.toml", in_memory=True)
+    image = generator.create_jpg("hello world", angle=5, mode=mode)
+    drawn = StyledProseGenerator("mock.toml", engine="pillow").create_jpg(
+        "hello world", mode=mode
+    )
+
+    # poppler is only asked for grayscale when the style's color is neutral
+    assert ("-gray" in mock_run.call_args.args[0]) == (expected != "RGB")
+    assert image.mode == drawn.mode == expected
+
+
+def test_create_jpg_thumbnail_partial(mock_config, monkeypatch):
+    mock_config({})
+
+    def rasterize(self, pdf, first_page, last_page, dpi, mode):
+        # fake letter-sized pages, each with a distinct gradient of "text" that's
+        # narrower on every page after the first
+        rasterized.append((first_page, last_page))
+        pages = []
+        for page in range(first_page, last_page + 1):
+            image = Image.new("RGB", (1700, 2200), (255, 255, 255))
+            draw = ImageDraw.Draw(image)
+            for row in range(40, 2160, 20):
+                draw.line(
+                    (17 + page, row, 1683 - page * 3, row),
+                    fill=(page * 40, row % 255, 0),
+                )
+            pages.append(image)
+        return pages
+
+    rasterized = []
+    monkeypatch.setattr(StyledProseGenerator, "_rasterize", rasterize)
+    monkeypatch.setattr("styled_prose.creation.random.randint", lambda a, b: b)
+
+    generator = StyledProseGenerator("mock.toml")
+    thumbnail = generator.create_jpg(
+        "hello world " * 5000, thumbnail=(210, 210), prescale_thumbnail=False
+    )
+
+    # the window is chosen from the laid out lines, so only the last page, which the
+    # bottom-right thumbnail overlaps, is ever rasterized
+    pdf, layout = _build_document(
+        "hello world " * 5000, generator.stylesheet["default"]
+    )
+    assert layout.pages > 1
+    assert rasterized == [(layout.pages, layout.pages)]
+
+    # and the thumbnail is identical to the same window of the collated pages
+    full = _collate(
+        rasterize(generator, pdf, 1, layout.pages, layout.dpi, "RGB"), layout.pages
+    )
+    _, _, right, bottom = layout.line_pixels()
+    expected = full.crop((right - 210, bottom - 210, right, bottom))
+    assert ImageChops.difference(thumbnail, expected).getbbox() is None
+
+    # which is also the window rendered prose picks
+    rendered = generator.render("hello world " * 5000).thumbnail(
+        (210, 210), prescale_thumbnail=False
+    )
+    assert ImageChops.difference(rendered, expected).getbbox() is None
+
+
+@pytest.mark.parametrize(
+    "markup",
+    (
+        "hello world " * 2000,
+        "<b>bold</b>, <i>italic</i>, and <font size=20>big</font> " * 400,
+        "hello world " * 300 + "\n\nend",
+    ),
+    ids=("plain", "markup", "short-last-line"),
+)
+@pytest.mark.parametrize("alignment", (TA_LEFT, TA_CENTER, TA_JUSTIFY))
+def test_build_document_line_box(markup, alignment):
+    pytest.importorskip("pypdfium2")
+    style = RLPStyle(
+        "style", fontSize=12, leading=15, alignment=alignment, firstLineIndent=20
+    )
+    pdf, layout = _build_document(markup, style)
+    full = _collate(
+        PdfiumRasterizer().rasterize(pdf, 1, layout.pages, layout.dpi, "L"),
+        layout.pages,
+        "L",
+    )
+
+    # the laid out lines match the prose's ink to within a few pixels
+    lines, ink = layout.line_pixels(), _ink_bbox(full)
+    assert lines == pytest.approx(ink, abs=12)
+
+
+def test_create_jpg_thumbnail_seeded(mock_config, mocker, page):
+    mock_config({})
+    mocker.patch.object(StyledProseGenerator, "_rasterize", return_value=[page])
+    draw = ImageDraw.Draw(page)
+    for row in range(30, 190, 4):
+        draw.line((20, row, 150, row), fill=(row, 255 - row, 0))
+
+    generator = StyledProseGenerator("mock.toml")
+    rendered = generator.render("hello world")
+
+    # seeded thumbnails are the same whichever API produced them
+    for seed in range(10):
+        thumbnail = generator.create_jpg("hello world", thumbnail=(32, 32), seed=seed)
+        expected = rendered.thumbnail((32, 32), rng=random.Random(seed))
+        assert ImageChops.difference(thumbnail, expected).getbbox() is None
+
+
+def test_create_jpg_cached(mock_config, mocker, page):
+    mock_config({})
+    mock_rasterize = mocker.patch.object(
+        StyledProseGenerator, "_rasterize", return_value=[page]
+    )
+    cache = RenderCache()
+    generator = StyledProseGenerator("mock.toml", cache=cache)
+
+    first = generator.create_jpg("hello world")
+    second = generator.create_jpg("hello world", angle=5)
+    generator.create_jpg("hello world", thumbnail=(16, 16))
+
+    # the document is only rasterized once, and the cached bitmap is never handed out
+    mock_rasterize.assert_called_once()
+    assert first.size == (131, 161)
+    assert second.size != first.size
+    assert cache.stats.hits == 2
+    assert cache.stats.misses == 1
+
+
+def test_render(mock_config, mocker, page):
+    mock_config({})
+    mock_rasterize = mocker.patch.object(
+        StyledProseGenerator, "_rasterize", return_value=[page]
+    )
+    mock_rotate = mocker.spy(Image.Image, "rotate")
+    generator = StyledProseGenerator("mock.toml", cache=RenderCache())
+
+    rendered = generator.render("hello world")
+    upright = rendered.rotated()
+    images = rendered.variants(
+        [
+            Variant(angle=5),
+            Variant(angle=5, thumbnail=(16, 16)),
+            Variant(thumbnail=(16, 16)),
+            Variant(angle=365, thumbnail=(16, 16), prescale_thumbnail=False),
+        ],
+        rng=random.Random(0),
+    )
+    # variants are derived grouped by angle, so the upright thumbnail is picked first
+    again = rendered.thumbnail((16, 16), rng=random.Random(0))
+
+    # the prose is rasterized once, and each angle is rotated once no matter how many
+    # images are derived from it
+    mock_rasterize.assert_called_once()
+    mock_rotate.assert_called_once()
+    assert upright.size == (131, 161)
+    assert [image.size for image in images] == [
+        generator.create_jpg("hello world", angle=5).size,
+        (16, 16),
+        (16, 16),
+        (16, 16),
+    ]
+    assert ImageChops.difference(images[2], again).getbbox() is None
+    assert mock_rasterize.call_count == 1
+
+
+def test_render_auto_dpi(mock_config, mocker, page):
+    mock_config({})
+    mock_rasterize = mocker.patch.object(
+        StyledProseGenerator, "_rasterize", return_value=[page]
+    )
+    generator = StyledProseGenerator("mock.toml", cache=RenderCache())
+
+    # without a thumbnail, an automatic resolution is the default one, and the
+    # rendering is shared with it
+    rendered = generator.render("hello world", dpi="auto")
+    generator.render("hello world")
+    assert mock_rasterize.call_args.args[3] == 200
+    assert rendered.rotated().size == (131, 161)
+    mock_rasterize.assert_called_once()
+
+
+def test_create_jpg_bomb_limit(mock_config, mocker, monkeypatch, page):
+    # renderings larger than Pillow's decompression bomb limit are still trimmed
+    mock_config({})
+    mocker.patch.object(StyledProseGenerator, "_rasterize", return_value=[page])
+    monkeypatch.setattr(creation, "TRIM_STRIP_HEIGHT", 16)
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 5000)
+
+    generator = StyledProseGenerator("mock.toml")
+    assert generator.create_jpg("hello world").size == (131, 161)
+    assert generator.render("hello world").rotated().size == (131, 161)
+
+
+def test_create_jpg_seeded_store(mock_config, mocker, tmp_path):
+    mock_config({})
+    page = Image.new("RGB", (1700, 2200), (255, 255, 255))
+    draw = ImageDraw.Draw(page)
+    for row in range(200, 2000, 40):
+        draw.line((150, row, 1550, row), fill=(row % 255, row // 10, 0), width=12)
+    mock_rasterize = mocker.patch.object(
+        StyledProseGenerator, "_rasterize", return_value=[page]
+    )
+    generator = StyledProseGenerator("mock.toml")
+
+    # the same seed always picks the same thumbnail window
+    first, second = (
+        generator.create_jpg("hello world", thumbnail=(64, 64), seed=seed)
+        for seed in (7, random.Random(7))
+    )
+    assert ImageChops.difference(first, second).getbbox() is None
+
+    store = OutputStore(tmp_path)
+    generator = StyledProseGenerator("mock.toml", store=store)
+    mock_rasterize.reset_mock()
+    generator.create_jpg("hello world", thumbnail=(64, 64), seed=7)
+    generator.create_jpg("hello world", thumbnail=(64, 64))
+    generator.create_jpg("hello world", angle=5)
+
+    # renderings are only stored if they're deterministic
+    assert mock_rasterize.call_count == 3
+    assert len(list(tmp_path.glob("*.png"))) == 2
+
+    # and are then never rendered again, even by other generators
+    generator = StyledProseGenerator("mock.toml", store=OutputStore(tmp_path))
+    stored = generator.create_jpg("hello world", thumbnail=(64, 64), seed=7)
+    generator.create_jpg("hello world", angle=5.0)
+    assert mock_rasterize.call_count == 3
+    assert generator.store.stats.hits == 2
+    assert ImageChops.difference(first, stored).getbbox() is None
+
+
+@pytest.mark.parametrize("ordered", (True, False), ids=("ordered", "unordered"))
+def test_create_jpg_many(mock_config, mocker, page, ordered):
+    mock_config({})
+    mocker.patch.object(StyledProseGenerator, "_rasterize", return_value=[page])
+    # run the "workers" as threads so that they share the mocks above
+    mocker.patch("styled_prose.creation.ProcessPoolExecutor", ThreadPoolExecutor)
+    init_worker = mocker.spy(creation, "_init_worker")
+
+    generator = StyledProseGenerator("mock.toml")
+    specs = [RenderSpec("hello world", angle=angle) for angle in range(10)]
+    results = list(
+        generator.create_jpg_many(
+            iter(specs), max_workers=2, chunksize=3, max_in_flight=2, ordered=ordered
+        )
+    )
+
+    assert init_worker.call_count <= 2
+    if ordered:
+        assert [index for index, _ in results] == list(range(10))
+    assert sorted(index for index, _ in results) == list(range(10))
+    for index, image in results:
+        assert image.size == generator.create_jpg(**specs[index]._asdict()).size
+
+
+def test_acreate_jpg(mock_config, mocker, page):
+    mock_config({})
+    buffer = BytesIO()
+    page.save(buffer, "PNG")
+    running, peak = 0, 0
+
+    class Process:
+        returncode = 0
+
+        async def communicate(self, pdf):
+            nonlocal running, peak
+            assert pdf.startswith(b"%PDF")
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return buffer.getvalue(), b""
+
+    mock_exec = mocker.patch(
+        "asyncio.create_subprocess_exec", side_effect=lambda *_, **__: Process()
+    )
+    mocker.patch.object(StyledProseGenerator, "_rasterize", return_value=[page])
+    generator = StyledProseGenerator("mock.toml", max_concurrency=2)
+
+    async def render():
+        single = await generator.acreate_jpg("hello world", angle=5)
+        many = [
+            result
+            async for result in generator.acreate_jpg_many(
+                RenderSpec("hello world", angle=angle) for angle in range(6)
+            )
+        ]
+        return single, many
+
+    single, many = asyncio.run(render())
+
+    # poppler is driven through asyncio, never blocking on it, and concurrency is
+    # capped by the generator
+    assert mock_exec.call_count == 7
+    assert peak == 2
+    assert single.size == generator.create_jpg("hello world", angle=5).size
+    assert [index for index, _ in many] == list(range(6))
+    assert many[5][1].size == single.size
+
+
+def test_acreate_jpg_cancelled(mock_config, mocker):
+    mock_config({})
+    started = []
+
+    class Process:
+        returncode = None
+
+        async def communicate(self, pdf):
+            started.append(self)
+            await asyncio.Event().wait()
+
+        def kill(self):
+            self.returncode = -9
+
+        async def wait(self):
+            return self.returncode
+
+    mocker.patch(
+        "asyncio.create_subprocess_exec", side_effect=lambda *_, **__: Process()
+    )
+    generator = StyledProseGenerator("mock.toml")
+
+    async def render():
+        task = asyncio.ensure_future(generator.acreate_jpg("hello world"))
+        while not started:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    # poppler is killed as soon as its output is no longer wanted
+    asyncio.run(render())
+    assert [process.returncode for process in started] == [-9]
+
+
+def test_acreate_jpg_event_loops(mock_config, page):
+    mock_config({})
+
+    class Rasterizer:
+        def rasterize(self, pdf, first_page, last_page, dpi, mode):
+            return [page]
+
+    generator = StyledProseGenerator(
+        "mock.toml", rasterizer=Rasterizer(), max_concurrency=1
+    )
+
+    async def render():
+        return await asyncio.gather(
+            generator.acreate_jpg("hello world"), generator.acreate_jpg("hello world")
+        )
+
+    # a generator can be shared by event loops, each limiting its own renderings
+    for _ in range(2):
+        assert len(asyncio.run(render())) == 2
+
+
+def test_create_jpg_lazy_fonts(mock_config, mocker, page):
+    mock_config(
+        {
+            "fonts": [
+                {"font_name": "lazy_a", "regular": "a.ttf"},
+                {"font_name": "lazy_b", "regular": "b.ttf"},
+                {"font_name": "lazy_c", "regular": "c.ttf"},
+            ],
+            "styles": [
+                {"name": "default", "font_name": "lazy_a"},
+                {"name": "other", "font_name": "lazy_b"},
+            ],
+        }
+    )
+    vera = Path(reportlab.__file__).parent / "fonts" / "Vera.ttf"
+
+    def register(font_family, normal, **_):
+        registered.append(font_family)
+        pdfmetrics.registerFont(TTFont(font_family, vera))
+
+    registered = []
+    mocker.patch("styled_prose.fonts._register_font_files", side_effect=register)
+    mocker.patch.object(StyledProseGenerator, "_rasterize", return_value=[page])
+
+    # nothing is registered up front
+    generator = StyledProseGenerator("mock.toml", lazy_fonts=True)
+    assert registered == []
+
+    # families are registered exactly once, the first time a style needs them, even
+    # when rendering concurrently
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(lambda _: generator.create_jpg("hello world"), range(8)))
+    assert registered == ["lazy_a"]
+
+    # and the rest can be registered ahead of time
+    generator.warmup(fonts=["lazy_c"])
+    assert registered == ["lazy_a", "lazy_b", "lazy_c"]
+    generator.create_jpg("hello world", style="other")
+    assert registered == ["lazy_a", "lazy_b", "lazy_c"]
+
+    with pytest.raises(ValueError, match=r".*Could not find a prose style.*"):
+        generator.warmup(["missing"])
+
+
+def test_create_jpg_rasterizer(mock_config, mocker, page):
+    mock_config({})
+    mock_exec = mocker.patch("asyncio.create_subprocess_exec")
+
+    class Rasterizer:
+        def rasterize(self, pdf, first_page, last_page, dpi, mode):
+            requests.append((first_page, last_page, dpi, mode))
+            return [page]
+
+    requests = []
+    generator = StyledProseGenerator("mock.toml", rasterizer=Rasterizer())
+    image = generator.create_jpg("hello world")
+    aimage = asyncio.run(generator.acreate_jpg("hello world"))
+
+    # every rendering goes through the provided rasterizer, even asynchronously
+    mock_exec.assert_not_called()
+    assert requests == [(1, 1, 200, "RGB")] * 2
+    assert image.size == aimage.size == (131, 161)
+
+
+@pytest.mark.parametrize("mode", ("RGB", "L"))
+def test_pdfium_rasterizer(mock_config, mode):
+    pytest.importorskip("pypdfium2")
+    mock_config({})
+
+    generator = StyledProseGenerator("mock.toml", rasterizer=PdfiumRasterizer())
+    pdf, layout = _build_document(
+        "hello world " * 2000, generator.stylesheet["default"], dpi=100
+    )
+    pages = list(generator.rasterizer.rasterize(pdf, 2, layout.pages, 100, mode))
+
+    # pages are sized the same way poppler sizes them
+    assert len(pages) == layout.pages - 1
+    assert all(p.mode == mode for p in pages)
+    assert all(p.size == tuple(map(layout.to_pixels, layout.page_size)) for p in pages)
+    assert _ink_bbox(generator.create_jpg("hello world", mode=mode))
+
+
+def test_collate_streaming():
+    refs = []
+
+    def track(page):
+        refs.append(weakref.ref(page))
+        return page
+
+    def pages():
+        for shade in range(0, 250, 50):
+            # every page before this one has already been written and released
+            assert all(ref() is None for ref in refs)
+            yield track(Image.new("RGB", (10, 20), (shade, shade, shade)))
+
+    output = _collate(pages(), 5, "L")
+    assert output.mode == "L"
+    assert output.size == (10, 100)
+    assert [output.getpixel((0, row)) for row in range(0, 100, 20)] == [
+        0,
+        50,
+        100,
+        150,
+        200,
+    ]
+
+
+def test_iter_pages(mock_config, mocker, page):
+    mock_config({})
+    mock_rasterize = mocker.patch.object(
+        StyledProseGenerator, "_rasterize", return_value=iter([page, page])
+    )
+
+    generator = StyledProseGenerator("mock.toml")
+    pages = list(generator.iter_pages("hello world", dpi=100, mode="L"))
+
+    # pages are passed through untouched, besides being converted to the right mode
+    assert mock_rasterize.call_args.args[1:] == (1, 1, 100, "L")
+    assert [p.mode for p in pages] == ["L", "L"]
+    assert pages[0].size == page.size
+
+
+def test_iter_pages_auto_dpi(mock_config, mocker, page):
+    mock_config({})
+    mock_rasterize = mocker.patch.object(
+        StyledProseGenerator, "_rasterize", return_value=iter([page])
+    )
+
+    # there's no thumbnail to pick a resolution for, so the default one is used
+    generator = StyledProseGenerator("mock.toml")
+    pages = list(generator.iter_pages("hello world", dpi="auto"))
+    assert mock_rasterize.call_args.args[1:] == (1, 1, 200, "RGB")
+    assert len(pages) == 1
+
+
+@pytest.mark.parametrize("words", (1, 500, 2000), ids=("line", "page", "pages"))
+def test_build_document_exact_height(words):
+    style = ParagraphStyle(name="default")._to_reportlab()
+    _, layout = _build_document(
+        "hello world " * words, style, page_width=300, exact_height=True
+    )
+
+    # the prose fits on a single page that's exactly as tall as it needs to be
+    assert layout.pages == 1
+    assert layout.page_size[0] == 300
+    assert layout.content_box == (6, 6, 294, layout.page_size[1] - 6)
+
+
+def test_create_jpg_auto_dpi(mock_config, mocker, monkeypatch):
+    mock_config({})
+
+    def rasterize(self, pdf, first_page, last_page, dpi, mode):
+        # fake pages, entirely covered in "text", at the requested resolution
+        requested.append(dpi)
+        size = (math.ceil(612 * dpi / 72), math.ceil(792 * dpi / 72))
+        return [Image.new("RGB", size, (0, 0, 0))] * (last_page - first_page + 1)
+
+    requested = []
+    monkeypatch.setattr(StyledProseGenerator, "_rasterize", rasterize)
+    mock_resize = mocker.spy(Image.Image, "resize")
+
+    generator = StyledProseGenerator("mock.toml")
+    font_size = generator.stylesheet["default"].fontSize
+    thumbnail = generator.create_jpg(
+        "hello world " * 5000, thumbnail=(210, 210), dpi="auto"
+    )
+
+    # the resolution matches the comparative font size, so the window needs no scaling,
+    # and only the pages it overlaps are rasterized at it, once
+    assert requested == [math.ceil(200 * 6 / font_size)]
+    assert thumbnail.size == (210, 210)
+    mock_resize.assert_not_called()
+
+    # but it's never lowered past what the prose needs to contain the thumbnail
+    generator.create_jpg("hello world", thumbnail=(210, 210), dpi="auto")
+    generator.create_jpg("hello world", dpi=72)
+    assert requested[1:] == [200, 72]
+
+    with pytest.raises(ValueError, match="resolution"):
+        generator.create_jpg("hello world", dpi=0)
+
+
+@pytest.mark.parametrize("angle", (5, -30, 359.5))
+def test_create_jpg_thumbnail_rotated(mock_config, mocker, angle):
+    mock_config({})
+    page = Image.new("RGB", (1700, 2200), (255, 255, 255))
+    draw = ImageDraw.Draw(page)
+    for row in range(200, 2000, 40):
+        draw.line((150, row, 1550 - row // 4, row), fill=(row % 255, 0, 0), width=12)
+    mocker.patch.object(StyledProseGenerator, "_rasterize", return_value=[page])
+    mocker.patch(
+        "styled_prose.creation.random.randint", side_effect=lambda a, b: b // 3
+    )
+    mock_rotate = mocker.spy(Image.Image, "rotate")
+
+    generator = StyledProseGenerator("mock.toml")
+    thumbnail = generator.create_jpg(
+        "hello world", angle=angle, thumbnail=(210, 210), prescale_thumbnail=False
+    )
+
+    # only the thumbnail's region is rotated, and it's identical to the same window of
+    # the whole rotated and trimmed page
+    mock_rotate.assert_not_called()
+    full = page.rotate(
+        angle,
+        resample=Image.Resampling.NEAREST,
+        fillcolor=(255, 255, 255),
+        expand=True,
+    )
+    full = full.crop(_ink_bbox(full))
+    x, y = (full.width - 210) // 3, (full.height - 210) // 3
+    expected = full.crop((x, y, x + 210, y + 210))
+    assert ImageChops.difference(thumbnail, expected).getbbox() is None
+
+
+@pytest.mark.parametrize(
+    "box",
+    (None, (0, 0, 1, 1), (3, 70, 4, 200), (17, 63, 150, 65), (0, 0, 170, 220)),
+    ids=("blank", "corner", "column", "strip-boundary", "full"),
+)
+def test_ink_bbox(box):
+    image = Image.new("RGB", (170, 220), (255, 255, 255))
+    if box:
+        # off-white ink in a single channel still counts
+        ImageDraw.Draw(image).rectangle(
+            (box[0], box[1], box[2] - 1, box[3] - 1), fill=(255, 254, 255)
+        )
+
+    assert _ink_bbox(image) == box
+    assert (
+        _ink_bbox(image.convert("L"))
+        == image.convert("L").point(lambda v: 255 - v).getbbox()
+    )
+
+
+def test_style_digest():
+    fonts = Path(reportlab.__file__).parent / "fonts"
+    pdfmetrics.registerFont(TTFont("digest_a", fonts / "Vera.ttf"))
+    pdfmetrics.registerFont(TTFont("digest_b", fonts / "VeraBd.ttf"))
+
+    # TrueType faces are digested by their contents, which differ between the fonts
+    digest = _style_digest(RLPStyle("style", fontName="digest_a"))
+    assert digest == _style_digest(RLPStyle("style", fontName="digest_a"))
+    assert digest != _style_digest(RLPStyle("style", fontName="digest_b"))
+
+
+MARKUP = """This is normal.
+
+<i>This is italicized.</i>
+
+<b>This is bold.</b>
+
+<u>This is underlined.</u>
+
+<strike>This is struck from the record.</strike>"""
+
+
+def test_create_jpg_pillow(mock_config, mocker):
+    mock_config({})
+    mock_rasterize = mocker.patch.object(StyledProseGenerator, "_rasterize")
+
+    generator = StyledProseGenerator("mock.toml", engine="pillow")
+    plain = generator.create_jpg("This is normal.")
+    bold = generator.create_jpg("<b>This is normal.</b>")
+    underlined = generator.create_jpg("<u>This is normal.</u>")
+
+    # poppler is never involved, and markup changes what's drawn
+    mock_rasterize.assert_not_called()
+    assert (
+        ImageStat.Stat(bold.convert("L")).mean[0]
+        < (ImageStat.Stat(plain.convert("L")).mean[0])
+    )
+    assert underlined.height > plain.height
+
+
+@pytest.mark.parametrize(
+    "rasterizer",
+    (
+        pytest.param(
+            "poppler",
+            marks=pytest.mark.skipif(
+                not shutil.which("pdftocairo"), reason="requires poppler"
+            ),
+        ),
+        "pdfium",
+    ),
+)
+def test_create_jpg_pillow_parity(mock_config, rasterizer):
+    mock_config({})
+    options = {}
+    if rasterizer == "pdfium":
+        pytest.importorskip("pypdfium2")
+        options["rasterizer"] = PdfiumRasterizer()
+
+    generator = StyledProseGenerator("mock.toml", exact_height=True, **options)
+    pdf = generator.create_jpg(MARKUP)
+    pillow = StyledProseGenerator("mock.toml", engine="pillow").create_jpg(MARKUP)
+
+    # antialiasing differs between the engines, and poppler's JPEG artifacts can grow
+    # the trimmed rendering by up to a block on each side, so compare them loosely;
+    # pdfium rasterizes losslessly, so its rendering is trimmed to the same ink
+    tolerance = 2 if rasterizer == "pdfium" else 16
+    assert pillow.size == pytest.approx(pdf.size, abs=tolerance)
+    pdf, pillow = pdf.convert("L"), pillow.convert("L").resize(pdf.size)
+    diff = ImageChops.difference(pdf.reduce(8), pillow.reduce(8))
+    assert ImageStat.Stat(diff).mean[0] < 12
+
+
+def test_reload(tmp_path, mocker):
+    config = tmp_path / "styles.toml"
+    config.write_text(
+        '[[fonts]]\nfont_name = "a"\nregular = "a.ttf"\n'
+        '[[fonts]]\nfont_name = "b"\nregular = "b.ttf"\n'
+        '[[styles]]\nname = "default"\nfont_size = 12\n'
+        '[[styles]]\nname = "other"\nfont_size = 12\n'
+    )
+    mock_register = mocker.patch("styled_prose.fonts._register_font_files")
+
+    generator = StyledProseGenerator(config)
+    stylesheet = generator.stylesheet
+    assert [c.args[0] for c in mock_register.call_args_list] == ["a", "b"]
+
+    # nothing changed, so nothing is rebuilt
+    mock_register.reset_mock()
+    assert not generator.reload()
+    assert generator.stylesheet["default"] is stylesheet["default"]
+    mock_register.assert_not_called()
+
+    # only the styles and font families that changed are rebuilt
+    config.write_text(
+        '[[fonts]]\nfont_name = "a"\nregular = "a.ttf"\n'
+        '[[fonts]]\nfont_name = "b"\nregular = "c.ttf"\n'
+        '[[styles]]\nname = "default"\nfont_size = 12\n'
+        '[[styles]]\nname = "other"\nfont_size = 16\n'
+        '[[styles]]\nname = "new"\n'
+    )
+    assert generator.reload()
+    assert generator.stylesheet is not stylesheet
+    assert generator.stylesheet["default"] is stylesheet["default"]
+    assert generator.stylesheet["other"].fontSize == 16
+    assert stylesheet["other"].fontSize == 12
+    assert "new" in generator.stylesheet
+    assert [c.args[:2] for c in mock_register.call_args_list] == [
+        ("b", tmp_path / "c.ttf")
+    ]
+
+    # invalid configurations leave the current stylesheet in place
+    swapped = generator.stylesheet
+    config.write_text('[[styles]]\nname = "default"\nfont_size = "big"\n')
+    with pytest.raises(BadStyleException):
+        generator.reload()
+    assert generator.stylesheet is swapped
+
+
+@pytest.mark.parametrize("lazy_fonts", (False, True), ids=("eager", "lazy"))
+def test_reload_fonts(tmp_path, lazy_fonts):
+    fonts = Path(reportlab.__file__).parent / "fonts"
+    shutil.copy(fonts / "Vera.ttf", tmp_path / "regular.ttf")
+    shutil.copy(fonts / "VeraBd.ttf", tmp_path / "bold.ttf")
+    family = f"reload_{'lazy' if lazy_fonts else 'eager'}"
+    config = tmp_path / "styles.toml"
+    config.write_text(
+        f'[[fonts]]\nfont_name = "{family}"\nregular = "regular.ttf"\n'
+        f'[[styles]]\nname = "default"\nfont_name = "{family}"\n'
+    )
+
+    generator = StyledProseGenerator(config, lazy_fonts=lazy_fonts)
+    generator.warmup()
+    assert pdfmetrics.getFont(family).face.name == b"BitstreamVeraSans-Roman"
+    regular = _load_font(family, 12)
+
+    # the family is registered again under the same name, using the edited font
+    config.write_text(
+        config.read_text().replace("regular.ttf", "bold.ttf") + "font_size = 20\n"
+    )
+    assert generator.reload()
+    assert pdfmetrics.getFont(family).face.name == b"BitstreamVeraSans-Bold"
+    # which the pillow engine draws with, too
+    bold = _load_font(family, 12)
+    assert bold.path != regular.path
+    assert bold.path == str(pdfmetrics.getFont(family).face.filename)
+
+    # and generators created from the same path afterwards see the edits too
+    assert StyledProseGenerator(config).stylesheet["default"].fontSize == 20
+
+
+def test_watch(tmp_path, mocker):
+    config = tmp_path / "styles.toml"
+    config.write_text('[[styles]]\nname = "default"\nfont_size = 9\n')
+
+    generator = StyledProseGenerator(config)
+    generator.watch(interval=0.01)
+    try:
+        config.write_text('[[styles]]\nname = "default"\nfont_size = 16\n')
+        deadline = time.monotonic() + 5
+        while generator.stylesheet["default"].fontSize != 16:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+
+        # broken edits are reported, keeping the current stylesheet
+        with pytest.warns(RuntimeWarning, match=r".*Failed to reload.*") as record:
+            config.write_text("[[styles]\n")
+            deadline = time.monotonic() + 5
+            while not record:
+                assert time.monotonic() < deadline
+                time.sleep(0.01)
+        assert generator.stylesheet["default"].fontSize == 16
+    finally:
+        generator.unwatch()
+
+
+def test_from_toml(tmp_path, mocker, page):
+    toml = (
+        '[[fonts]]\nfont_name = "a"\nregular = "a.ttf"\n'
+        '[[styles]]\nname = "default"\nfont_size = 14\n'
+    )
+    mock_register = mocker.patch("styled_prose.fonts._register_font_files")
+    mocker.patch.object(StyledProseGenerator, "_rasterize", return_value=[page])
+
+    # tenants sharing a stylesheet share its parsed configuration, compiled styles, and
+    # font registrations
+    generators = [StyledProseGenerator.from_toml(toml, root=tmp_path) for _ in range(3)]
+    assert generators[0]._config is generators[1]._config
+    assert all(g.stylesheet is generators[0].stylesheet for g in generators)
+    assert generators[0].stylesheet["default"].fontSize == 14
+    mock_register.assert_called_once()
+    assert mock_register.call_args.args == ("a", tmp_path / "a.ttf")
+
+    # regardless of how the configuration was loaded
+    generator = StyledProseGenerator.from_dict(
+        {
+            "styles": [{"font_size": 14, "name": "default"}],
+            "fonts": [{"regular": "a.ttf", "font_name": "a"}],
+        },
+        root=tmp_path,
+    )
+    assert generator.stylesheet is generators[0].stylesheet
+    mock_register.assert_called_once()
+
+    assert generator.create_jpg("hello world").size == (131, 161)
+    with pytest.raises(ValueError, match=r".*loaded from a file.*"):
+        generator.reload()
+    with pytest.raises(ValueError, match=r".*loaded from a file.*"):
+        generator.watch()
+
+
+@pytest.mark.parametrize(
+    ("module", "deferred"),
+    [
+        ("styled_prose", ["httpx", "pdf2image", "PIL", "pydantic", "reportlab"]),
+        ("styled_prose.creation", ["httpx", "pdf2image", "reportlab.platypus"]),
+    ],
+)
+def test_import_deferred(module, deferred):
+    # run in a fresh interpreter, since this one already imported everything
+    code = (
+        f"import sys, {module}; "
+        f"print(','.join(m for m in {deferred!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert result.stdout.strip() == ""
+
+    # -X importtime reports cumulative microseconds in its second column
+    times = [
+        int(line.split("|")[1])
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:") and line.endswith(f" {module}")
+    ]
+    assert times and times[0] < 500_000
@@ -1,6 +1,28 @@
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+import httpx
 import pytest
+import reportlab
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFontFile
+from reportlab.pdfgen import canvas
 
-from styled_prose.fonts import GOOGLE_FONTS_URL, register_fonts
+from styled_prose.__main__ import main
+from styled_prose.exceptions import BadFontException
+from styled_prose.fonts import (
+    DOWNLOAD_THREAD_COUNT,
+    GOOGLE_FONTS_URL,
+    PARSED_FONT_CACHE,
+    _download_font_families,
+    _load_font,
+    register_fonts,
+)
 
 
 @pytest.fixture(autouse=True)
@@ -71,7 +93,7 @@ def test_register_fonts_local(mock_config, monkeypatch, fonts, mocker):
 
     # mock font registration
     monkeypatch.setattr("pathlib.Path.exists", lambda _: True)
-    monkeypatch.setattr("styled_prose.fonts.TTFont", lambda a, b: (a, str(b)))
+    monkeypatch.setattr("styled_prose.fonts._load_font", lambda a, b, _: (a, str(b)))
     mock_register_font = mocker.patch("reportlab.pdfbase.pdfmetrics.registerFont")
     mock_register_family = mocker.patch(
         "reportlab.pdfbase.pdfmetrics.registerFontFamily"
@@ -109,7 +131,7 @@ def test_register_fonts_remote(
     respx_mock.get("https://mock/bold_italic.ttf").respond(text="true")
 
     # mock font registration
-    monkeypatch.setattr("styled_prose.fonts.TTFont", lambda a, b: (a, b))
+    monkeypatch.setattr("styled_prose.fonts._load_font", lambda a, b, _: (a, b))
     mock_register_font = mocker.patch("reportlab.pdfbase.pdfmetrics.registerFont")
     mock_register_family = mocker.patch(
         "reportlab.pdfbase.pdfmetrics.registerFontFamily"
@@ -141,3 +163,283 @@ def test_register_fonts_remote(
         italic="mock_italic",
         boldItalic="mock_bold_italic",
     )
+
+
+def test_register_fonts_remote_concurrent(
+    mock_config, monkeypatch, tmp_path, mocker, respx_mock, data_dir
+):
+    # mock loaded config, with remote families interleaved with a local one
+    families = ["mock1", "mock2", "mock3"]
+    mock_config(
+        {
+            "fonts": [
+                {"font_name": "mock1", "from_google_fonts": True},
+                {"font_name": "local", "regular": "local.ttf"},
+                {"font_name": "mock2", "from_google_fonts": True},
+                {"font_name": "mock3", "from_google_fonts": True},
+            ]
+        }
+    )
+
+    # mock font downloads, tracking how many are in flight at once
+    in_flight, peak = 0, 0
+    lock = threading.Lock()
+    # each manifest waits for the others, which only succeeds if they overlap
+    manifests = threading.Barrier(len(families), timeout=10)
+
+    def fetch(response, barrier=None):
+        def side_effect(request):
+            nonlocal in_flight, peak
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            try:
+                if barrier:
+                    barrier.wait()
+                return response
+            finally:
+                with lock:
+                    in_flight -= 1
+
+        return side_effect
+
+    monkeypatch.setattr("styled_prose.fonts.FONT_CACHE", tmp_path)
+    manifest = (data_dir / "remote_manifest.txt").read_text()
+    for family in families:
+        respx_mock.get(GOOGLE_FONTS_URL.format(family)).mock(
+            side_effect=fetch(httpx.Response(200, text=manifest), manifests)
+        )
+    respx_mock.get(url__startswith="https://mock/").mock(
+        side_effect=fetch(httpx.Response(200, text="true"))
+    )
+
+    # mock font registration
+    monkeypatch.setattr("styled_prose.fonts._load_font", lambda a, b, _: (a, b))
+    mocker.patch("reportlab.pdfbase.pdfmetrics.registerFont")
+    mock_register_family = mocker.patch(
+        "reportlab.pdfbase.pdfmetrics.registerFontFamily"
+    )
+
+    register_fonts("mock.toml")
+
+    # every manifest and font file is fetched, with every family's manifest fetched
+    # at once, and no more files than the download threads allow on top of them
+    assert respx_mock.calls.call_count == 15
+    assert not manifests.broken
+    assert len(families) <= peak <= len(families) + DOWNLOAD_THREAD_COUNT
+
+    # families are still registered in the configured order
+    assert [call.args[0] for call in mock_register_family.call_args_list] == [
+        "mock1",
+        "local",
+        "mock2",
+        "mock3",
+    ]
+
+
+def test_register_fonts_remote_error(
+    mock_config, monkeypatch, tmp_path, mocker, respx_mock, data_dir
+):
+    # mock loaded config
+    mock_config(
+        {
+            "fonts": [
+                {"font_name": "mock1", "from_google_fonts": True},
+                {"font_name": "mock2", "from_google_fonts": True},
+            ]
+        }
+    )
+
+    # mock a family that doesn't exist
+    monkeypatch.setattr("styled_prose.fonts.FONT_CACHE", tmp_path)
+    respx_mock.get(GOOGLE_FONTS_URL.format("mock1")).respond(
+        text=(data_dir / "remote_manifest.txt").read_text()
+    )
+    respx_mock.get(GOOGLE_FONTS_URL.format("mock2")).respond(404)
+    respx_mock.get(url__startswith="https://mock/").respond(text="true")
+    mock_register_family = mocker.patch(
+        "reportlab.pdfbase.pdfmetrics.registerFontFamily"
+    )
+
+    with pytest.raises(BadFontException, match=r".*Failed to download.*"):
+        register_fonts("mock.toml")
+
+    # nothing is registered if any family fails to download
+    mock_register_family.assert_not_called()
+
+
+def test_register_fonts_remote_repair(
+    mock_config, monkeypatch, tmp_path, mocker, respx_mock, data_dir
+):
+    # mock loaded config
+    mock_config({"fonts": [{"font_name": "mock", "from_google_fonts": True}]})
+
+    # mock a cache with an intact manifest and bold font, a corrupted regular font, and
+    # an italic font missing its checksum
+    monkeypatch.setattr("styled_prose.fonts.FONT_CACHE", tmp_path)
+    manifest = (data_dir / "remote_manifest.txt").read_text()
+    font_dir = tmp_path / "mock"
+    font_dir.mkdir()
+    (font_dir / "manifest.json").write_text(
+        json.dumps(json.loads(manifest[5:])["manifest"])
+    )
+    checksum = hashlib.sha256(b"true").hexdigest()
+    for style, contents in (("regular", "tru"), ("bold", "true"), ("italic", "true")):
+        (font_dir / f"{style}.ttf").write_text(contents)
+    (font_dir / "regular.ttf.sha256").write_text(checksum)
+    (font_dir / "bold.ttf.sha256").write_text(checksum)
+
+    manifest_route = respx_mock.get(GOOGLE_FONTS_URL.format("mock"))
+    routes = {
+        style: respx_mock.get(f"https://mock/{style}.ttf").respond(text="true")
+        for style in ("regular", "bold", "italic", "bold_italic")
+    }
+
+    # mock font registration
+    monkeypatch.setattr("styled_prose.fonts._load_font", lambda a, b, _: (a, b))
+    mocker.patch("reportlab.pdfbase.pdfmetrics.registerFont")
+    mocker.patch("reportlab.pdfbase.pdfmetrics.registerFontFamily")
+
+    register_fonts("mock.toml")
+
+    # only the fonts that don't match their checksum are downloaded again
+    assert not manifest_route.called
+    assert {style for style, route in routes.items() if route.called} == {
+        "regular",
+        "italic",
+        "bold_italic",
+    }
+    for file in {"regular", "bold", "italic", "bolditalic"}:
+        assert (font_dir / f"{file}.ttf").read_bytes() == b"true"
+        assert (font_dir / f"{file}.ttf.sha256").read_text() == checksum
+
+    # and no temporary files are left behind
+    assert not list(font_dir.glob("*.tmp"))
+
+
+def test_download_font_families_locked(tmp_path, monkeypatch, respx_mock, data_dir):
+    # mock slow font downloads
+    def slow(response):
+        def side_effect(request):
+            time.sleep(0.05)
+            return response
+
+        return side_effect
+
+    monkeypatch.setattr("styled_prose.fonts.FONT_CACHE", tmp_path)
+    manifest_route = respx_mock.get(GOOGLE_FONTS_URL.format("mock")).mock(
+        side_effect=slow(
+            httpx.Response(200, text=(data_dir / "remote_manifest.txt").read_text())
+        )
+    )
+    font_route = respx_mock.get(url__startswith="https://mock/").mock(
+        side_effect=slow(httpx.Response(200, text="true"))
+    )
+
+    # several "workers" start against an empty cache at once
+    with httpx.Client() as client, ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(
+            pool.map(lambda _: _download_font_families(client, ["mock"]), range(4))
+        )
+
+    # only one of them downloads the family, and the rest reuse it
+    assert manifest_route.call_count == 1
+    assert font_route.call_count == 4
+    assert all(result == results[0] for result in results)
+    assert (tmp_path / "mock/regular.ttf").read_bytes() == b"true"
+
+
+def test_prefetch_offline(
+    mock_config, monkeypatch, tmp_path, mocker, respx_mock, data_dir, capsys
+):
+    # mock loaded config
+    mock_config(
+        {
+            "fonts": [
+                {"font_name": "mock", "from_google_fonts": True},
+                {"font_name": "local", "regular": "local.ttf"},
+            ]
+        }
+    )
+
+    # mock font downloads
+    respx_mock.get(GOOGLE_FONTS_URL.format("mock")).respond(
+        text=(data_dir / "remote_manifest.txt").read_text()
+    )
+    respx_mock.get(url__startswith="https://mock/").respond(text="true")
+
+    # mock font registration
+    monkeypatch.setattr("styled_prose.fonts._load_font", lambda a, b, _: (a, b))
+    mocker.patch("reportlab.pdfbase.pdfmetrics.registerFont")
+    mock_register_family = mocker.patch(
+        "reportlab.pdfbase.pdfmetrics.registerFontFamily"
+    )
+
+    # nothing is cached yet, so offline registration fails
+    cache = tmp_path / "fonts"
+    with pytest.raises(
+        BadFontException, match=r".*can't be downloaded while offline.*"
+    ):
+        register_fonts("mock.toml", cache, offline=True)
+
+    # until the fonts are prefetched into the cache
+    assert main(["prefetch", "mock.toml", "--font-cache", str(cache)]) == 0
+    assert capsys.readouterr().out == f"cached {cache / 'mock'}\n"
+    assert (cache / "mock/regular.ttf").read_bytes() == b"true"
+
+    # after which registration never creates an HTTP client
+    mock_client = mocker.patch("httpx.Client")
+    register_fonts("mock.toml", cache, offline=True)
+    mock_client.assert_not_called()
+    assert [call.args[0] for call in mock_register_family.call_args_list] == [
+        "mock",
+        "local",
+    ]
+
+
+def test_load_font_cached(tmp_path, mocker):
+    vera = Path(reportlab.__file__).parent / "fonts" / "Vera.ttf"
+    parse = mocker.spy(TTFontFile, "extractInfo")
+    parsed = _load_font("Vera", vera, tmp_path)
+
+    # later loads restore the parsed font rather than parsing the file again
+    restored = _load_font("VeraCached", vera, tmp_path)
+    assert parse.call_count == 1
+    assert len(list((tmp_path / PARSED_FONT_CACHE).glob("*.json"))) == 1
+    assert restored.fontName == "VeraCached"
+    # every parsed attribute is restored exactly, down to its type, from plain data
+    for attribute, value in vars(parsed.face).items():
+        if attribute != "_pdfScale":
+            assert getattr(restored.face, attribute) == value
+            assert type(getattr(restored.face, attribute)) is type(value)
+    assert restored.stringWidth("hello world", 12) == parsed.stringWidth(
+        "hello world", 12
+    )
+
+    # and the restored font can still be embedded into documents
+    pdfmetrics.registerFont(restored)
+    document = canvas.Canvas(BytesIO())
+    document.setFont("VeraCached", 12)
+    document.drawString(10, 10, "hello world")
+    document.save()
+
+    # corrupted entries are replaced by parsing the file again
+    next((tmp_path / PARSED_FONT_CACHE).glob("*.json")).write_bytes(b"corrupt")
+    repaired = _load_font("VeraRepaired", vera, tmp_path)
+    assert parse.call_count == 2
+    assert repaired.face.charWidths == parsed.face.charWidths
+
+
+def test_load_font_cached_moved(tmp_path, mocker):
+    vera = Path(reportlab.__file__).parent / "fonts" / "Vera.ttf"
+    first, second = tmp_path / "first.ttf", tmp_path / "second.ttf"
+    first.write_bytes(vera.read_bytes())
+    _load_font("VeraFirst", first, tmp_path)
+    first.unlink()
+
+    # a copy of the same font elsewhere is restored, but with its own path
+    parse = mocker.spy(TTFontFile, "extractInfo")
+    second.write_bytes(vera.read_bytes())
+    restored = _load_font("VeraSecond", second, tmp_path)
+    assert parse.call_count == 0
+    assert restored.face.filename == second
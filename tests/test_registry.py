@@ -0,0 +1,173 @@
+import gc
+import pickle
+from pathlib import Path
+
+import pytest
+import reportlab
+from reportlab.pdfbase import pdfmetrics
+
+from styled_prose import FontRegistry, StyledProseGenerator
+from styled_prose.creation import _build_document
+
+FONTS = Path(reportlab.__file__).parent / "fonts"
+
+
+def brand(regular, **style):
+    # a stylesheet with a "Brand" font family backed by the given font file
+    return {
+        "fonts": [{"font_name": "Brand", "regular": regular}],
+        "styles": [{"name": "default", "font_name": "Brand", **style}],
+    }
+
+
+@pytest.fixture
+def registry():
+    registry = FontRegistry(max_bytes=10 * 1024 * 1024)
+    yield registry
+    # don't leak fonts into other tests
+    gc.collect()
+    registry.max_bytes = 0
+    registry.release([])
+
+
+def generator(config, registry, tmp_path, **options):
+    return StyledProseGenerator(
+        config, root=FONTS, font_registry=registry, font_cache=tmp_path, **options
+    )
+
+
+def face(gen):
+    return pdfmetrics.getFont(gen.stylesheet["default"].fontName).face
+
+
+def test_namespaced(registry, tmp_path):
+    vera = generator(brand("Vera.ttf"), registry, tmp_path)
+    bold = generator(brand("VeraBd.ttf"), registry, tmp_path)
+
+    # the same family name can refer to different fonts without colliding
+    assert vera.stylesheet["default"].fontName.startswith("Brand@")
+    assert vera.stylesheet["default"].fontName != bold.stylesheet["default"].fontName
+    assert face(vera).filename.name == "Vera.ttf"
+    assert face(bold).filename.name == "VeraBd.ttf"
+    assert face(vera).name != face(bold).name
+    for gen, font in ((vera, b"VeraSans-Roman-"), (bold, b"VeraSans-Bold-")):
+        pdf, _ = _build_document("hello", gen.stylesheet["default"], 612, False, 200)
+        assert font in pdf
+
+    # while identical definitions share a registration, even across styles
+    shared = generator(brand("Vera.ttf", font_size=20), registry, tmp_path)
+    assert shared.stylesheet["default"].fontName == vera.stylesheet["default"].fontName
+    assert registry.stats.families == 2
+    assert registry.stats.referenced == 2
+    assert registry.stats.fonts == 2
+    assert registry.stats.bytes == (
+        (FONTS / "Vera.ttf").stat().st_size + (FONTS / "VeraBd.ttf").stat().st_size
+    )
+
+    # and since a namespace is per registry, so are registrations
+    other = generator(brand("Vera.ttf"), FontRegistry(), tmp_path)
+    assert other.stylesheet["default"].fontName != vera.stylesheet["default"].fontName
+
+    # without a registry, families are registered under their own names
+    plain = StyledProseGenerator(brand("Vera.ttf"), root=FONTS, font_cache=tmp_path)
+    assert plain.stylesheet["default"].fontName == "Brand"
+    other.close()
+
+
+def test_eviction(registry, tmp_path):
+    registry.max_bytes = 0
+    vera = generator(brand("Vera.ttf"), registry, tmp_path)
+    bold = generator(brand("VeraBd.ttf"), registry, tmp_path)
+    name = vera.stylesheet["default"].fontName
+
+    # families in use are never evicted, regardless of the budget
+    assert registry.stats.families == 2
+    assert registry.stats.evictions == 0
+
+    # but are once unreferenced, whether explicitly or by garbage collection
+    vera.close()
+    vera.close()
+    assert registry.stats.families == 1
+    assert registry.stats.evictions == 1
+    with pytest.raises(KeyError):
+        pdfmetrics.getFont(name)
+
+    del bold
+    gc.collect()
+    assert registry.stats == (0, 0, 0, 0, 2)
+
+
+def test_lru(registry, tmp_path):
+    registry.max_bytes = sum(
+        (FONTS / regular).stat().st_size for regular in ("VeraBd.ttf", "VeraIt.ttf")
+    )
+    for regular in ("Vera.ttf", "VeraBd.ttf", "VeraIt.ttf"):
+        generator(brand(regular), registry, tmp_path).close()
+
+    # unreferenced families are kept for reuse until they exceed the budget, evicting
+    # the least recently used first
+    assert registry.stats.families == 2
+    assert registry.stats.referenced == 0
+    assert registry.stats.evictions == 1
+    reused = generator(brand("VeraBd.ttf"), registry, tmp_path)
+    assert registry.stats.evictions == 1
+    reused.close()
+
+
+def test_lazy(registry, tmp_path, mocker):
+    lazy = generator(brand("Vera.ttf"), registry, tmp_path, lazy_fonts=True)
+    assert registry.stats.families == 0
+
+    lazy.warmup()
+    assert registry.stats.families == 1
+    assert face(lazy).filename.name == "Vera.ttf"
+
+    # only missing families are registered
+    acquire = mocker.spy(registry, "acquire")
+    lazy.warmup(fonts=["Brand"])
+    acquire.assert_not_called()
+    lazy.close()
+
+
+def test_reload(registry, tmp_path):
+    config = tmp_path / "styles.toml"
+    config.write_text(
+        f'[[fonts]]\nfont_name = "Brand"\nregular = "{FONTS / "Vera.ttf"}"\n'
+        '[[styles]]\nname = "default"\nfont_name = "Brand"\n'
+    )
+    gen = StyledProseGenerator(config, font_registry=registry, font_cache=tmp_path)
+    name = gen.stylesheet["default"].fontName
+
+    # changed families are registered under a new name, and the old one is released
+    config.write_text(
+        f'[[fonts]]\nfont_name = "Brand"\nregular = "{FONTS / "VeraBd.ttf"}"\n'
+        '[[styles]]\nname = "default"\nfont_name = "Brand"\n'
+    )
+    assert gen.reload()
+    assert gen.stylesheet["default"].fontName != name
+    assert face(gen).filename.name == "VeraBd.ttf"
+    assert registry.stats.referenced == 1
+    gen.close()
+
+
+def test_pickle(registry):
+    copy = pickle.loads(pickle.dumps(registry))
+    assert copy.namespace == registry.namespace
+    assert copy.max_bytes == registry.max_bytes
+    assert copy.stats == (0, 0, 0, 0, 0)
+
+
+def test_content_addressed(registry, tmp_path):
+    vera = generator(brand("Vera.ttf"), registry, tmp_path)
+    other = generator(brand("Vera.ttf"), FontRegistry(), tmp_path)
+    plain = StyledProseGenerator(brand("Vera.ttf"), root=FONTS, font_cache=tmp_path)
+    bold = generator(brand("VeraBd.ttf"), registry, tmp_path)
+
+    # renderings are keyed by the configured family and its files, so generators in
+    # other processes share cached and stored renderings however fonts are registered
+    def key(gen):
+        return gen._cache_key("hello", gen.stylesheet["default"], "200", "RGB")
+
+    assert key(vera) == key(other) == key(plain)
+    assert key(vera) != key(bold)
+    other.close()
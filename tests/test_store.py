@@ -0,0 +1,86 @@
+import os
+import pickle
+
+from PIL import Image, ImageChops
+
+from styled_prose import cache as spcache
+from styled_prose.store import OutputStore
+
+
+def test_round_trip(tmp_path):
+    image = Image.new("L", (10, 10), 128)
+    OutputStore(tmp_path).put("a", image)
+
+    # a fresh store, such as one in another process, finds the entry on disk
+    store = OutputStore(tmp_path)
+    stored = store.get("a")
+    assert stored.mode == "L"
+    assert ImageChops.difference(stored, image).getbbox() is None
+    assert store.read("a") == (tmp_path / "a.png").read_bytes()
+    assert store.get("b") is None
+    assert store.stats.hits == 2
+    assert store.stats.misses == 1
+
+
+def test_large(tmp_path, monkeypatch):
+    # entries larger than Pillow's decompression bomb limit are still decoded
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 40)
+    store = OutputStore(tmp_path)
+    store.put("a", Image.new("L", (10, 10)))
+
+    assert store.get("a").size == (10, 10)
+    assert Image.MAX_IMAGE_PIXELS == 40
+
+
+def test_format(tmp_path):
+    store = OutputStore(tmp_path, format="jpeg", quality=50)
+    store.put("a", Image.new("RGB", (10, 10)))
+
+    assert store.path("a") == tmp_path / "a.jpeg"
+    assert store.read("a").startswith(b"\xff\xd8")
+    assert store.get("a").size == (10, 10)
+
+
+def test_bomb(tmp_path):
+    # entries that would decode to more than the store holds are never loaded
+    store = OutputStore(tmp_path, max_bytes=100_000)
+    store.put("a", Image.new("L", (1000, 1000)))
+
+    assert store.read("a") is not None
+    assert store.get("a") is None
+
+
+def test_eviction(tmp_path):
+    OutputStore(tmp_path).put("size", Image.new("RGB", (10, 10)))
+    size = (tmp_path / "size.png").stat().st_size
+    (tmp_path / "size.png").unlink()
+
+    # only two entries fit on disk
+    store = OutputStore(tmp_path, max_bytes=size * 2)
+    for key in "abc":
+        store.put(key, Image.new("RGB", (10, 10)))
+        os.utime(tmp_path / f"{key}.png", (0, ord(key)))
+
+    assert sorted(file.name for file in tmp_path.iterdir()) == ["b.png", "c.png"]
+    assert store.stats.evictions == 1
+
+
+def test_eviction_scans(tmp_path, mocker):
+    scans = mocker.spy(spcache, "_evict_files")
+    store = OutputStore(tmp_path)
+
+    # the directory isn't scanned again until it's time to rescan it
+    for key in "abc":
+        store.put(key, Image.new("RGB", (10, 10)))
+    assert scans.call_count == 1
+
+
+def test_pickle(tmp_path):
+    store = OutputStore(tmp_path, max_bytes=1024, format="JPEG", quality=50)
+    store.get("a")
+
+    # copies share the directory and options, but not the counters
+    copy = pickle.loads(pickle.dumps(store))
+    assert (copy.directory, copy.max_bytes, copy.format) == (tmp_path, 1024, "JPEG")
+    assert copy.options == {"quality": 50}
+    assert copy.stats.misses == 0
@@ -1,6 +1,6 @@
 import pytest
 
-from styled_prose.util import get_valid_filename
+from styled_prose.util import BoundedCache, get_valid_filename
 
 
 @pytest.mark.parametrize(
@@ -36,3 +36,25 @@ def test_valid_filename(input, output):
 def test_invalid_filename(input):
     with pytest.raises(ValueError, match=r"Unable to convert.*"):
         get_valid_filename(input)
+
+
+def test_bounded_cache():
+    cache = BoundedCache(2)
+    created = []
+
+    def create(value):
+        def wrapper():
+            created.append(value)
+            return value
+
+        return wrapper
+
+    assert cache.get("a", create(1)) == 1
+    assert cache.get("b", create(2)) == 2
+    assert cache.get("a", create(3)) == 1
+
+    # the least recently used value is evicted, and created again if needed
+    assert cache.get("c", create(4)) == 4
+    assert len(cache) == 2
+    assert cache.get("b", create(5)) == 5
+    assert created == [1, 2, 4, 5]